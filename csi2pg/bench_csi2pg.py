@@ -0,0 +1,450 @@
+"""Benchmark the TOB decoders, and diff them against the per-record decoders
+
+Each engine runs in its own process, on the examples/*.bdat files and on
+copies scaled up to hours of data, and reports MB/s (of the .bdat file),
+records/s and peak RSS.  The output of every engine goes through the same
+COPY formatting as the database load, and is compared with decode_TOB3() or
+decode_TOB1() followed by parse_TOA5_sql(), so that speed work can not
+silently change values; binary PGCOPY output is read back into rows first.
+
+Run from this directory, like csi2pg.py:
+
+    python bench_csi2pg.py [--hours 1] [--workers 4] [files ...]
+
+The exit status is 1, if any engine's output differs.
+"""
+
+import argparse
+import glob
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import csi2pg
+
+EXAMPLES = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "examples"
+)
+
+
+def engine_decode_TOB3(ctx):
+    csi2pg.decode_TOB3(ctx["ffn"], ctx["toa5"])
+    return ctx["toa5"]
+
+
+def engine_decode_TOB1(ctx):
+    csi2pg.decode_TOB1(ctx["ffn"], ctx["toa5"])
+    return ctx["toa5"]
+
+
+def engine_parse_TOA5_sql(ctx):
+    sql_ffn, _, _ = csi2pg.parse_TOA5_sql(ctx["ref_toa5"], ctx["workdir"])
+    return sql_ffn
+
+
+def engine_decode_columns(ctx):
+    return csi2pg.decode_columns(ctx["ffn"])[1]
+
+
+def engine_decode_TOB3_parallel(ctx):
+    return csi2pg.decode_TOB3_parallel(ctx["ffn"], ctx["workers"])[1]
+
+
+def engine_iter_batches(ctx):
+    batches = list(csi2pg.iter_batches(ctx["ffn"]))
+    return {
+        name: np.concatenate([batch[name] for batch in batches])
+        for name in batches[0]
+    }
+
+
+def engine_write_TOA5(ctx):
+    csi2pg.write_TOA5(ctx["ffn"], ctx["toa5"])
+    return ctx["toa5"]
+
+
+def engine_parse_columns_sql(ctx):
+    columns = csi2pg.decode_columns(ctx["ffn"])[1]
+    return csi2pg.parse_columns_sql(columns, field_names(columns), ctx["tag"])[
+        0
+    ]
+
+
+def engine_parse_columns_pgcopy(ctx):
+    columns = csi2pg.decode_columns(ctx["ffn"])[1]
+    return csi2pg.parse_columns_pgcopy(
+        columns, field_names(columns), ctx["tag"]
+    )[0].getvalue()
+
+
+# engine name --> (function, file types); the per-record reference first
+ENGINES = {
+    "decode_TOB3": (engine_decode_TOB3, ("TOB3",)),
+    "decode_TOB1": (engine_decode_TOB1, ("TOB1",)),
+    "parse_TOA5_sql": (engine_parse_TOA5_sql, ("TOB1", "TOB3")),
+    "decode_columns": (engine_decode_columns, ("TOB1", "TOB2", "TOB3")),
+    "decode_TOB3_parallel": (engine_decode_TOB3_parallel, ("TOB2", "TOB3")),
+    "iter_batches": (engine_iter_batches, ("TOB1", "TOB2", "TOB3")),
+    "write_TOA5": (engine_write_TOA5, ("TOB1", "TOB2", "TOB3")),
+    "parse_columns_sql": (engine_parse_columns_sql, ("TOB1", "TOB2", "TOB3")),
+    "parse_columns_pgcopy": (
+        engine_parse_columns_pgcopy,
+        ("TOB1", "TOB2", "TOB3"),
+    ),
+}
+REFERENCE = {"TOB1": "decode_TOB1", "TOB3": "decode_TOB3"}
+
+
+def field_names(columns):
+    """Field names of decoded columns, as parse_columns_sql() wants them."""
+    return [name for name in columns if name not in ("TIMESTAMP", "RECORD")]
+
+
+def pgcopy_frame(data):
+    """
+    Read PostgreSQL's binary COPY format back into rows.
+
+    Parameters
+    ----------
+    data: bytes
+        from parse_columns_pgcopy(), header & trailer included
+
+    Returns
+    -------
+    pandas.DataFrame
+        one row per tuple; fields are told apart by their length, as
+        parse_columns_pgcopy() writes them:  2 bytes smallint, 4 real, and
+        8 the timestamptz "valid", in microseconds since 2000-01-01 UTC.
+        A length of -1 is NULL, read as NaN.
+    """
+    header = csi2pg.PGCOPY_HEADER
+    if data[: len(header)] != header:
+        raise ValueError("no PGCOPY header")
+    epoch = pd.Timestamp(csi2pg.PG_EPOCH64)
+    formats = {2: ">h", 4: ">f", 8: ">q"}
+    pos, rows = len(header), []
+    while True:
+        (nfields,) = struct.unpack_from(">h", data, pos)
+        pos += 2
+        if nfields == -1:
+            break
+        row = []
+        for _ in range(nfields):
+            (size,) = struct.unpack_from(">i", data, pos)
+            pos += 4
+            if size == -1:
+                row.append(np.nan)
+                continue
+            (value,) = struct.unpack_from(formats[size], data, pos)
+            pos += size
+            if size == 8:
+                value = epoch + pd.Timedelta(microseconds=value)
+            row.append(value)
+        rows.append(row)
+    if pos != len(data):
+        raise ValueError(
+            "%s bytes after the PGCOPY trailer" % (len(data) - pos)
+        )
+    return pd.DataFrame(rows)
+
+
+def sql_frame(result, ctx):
+    """
+    Bring an engine's output into the form of the database load.
+
+    Parameters
+    ----------
+    result: string, io.StringIO, bytes, dictionary or integer
+        TOA5 .dat file, .sql file, COPY stream, PGCOPY data or decoded
+        columns; or just the number of records, for output that is not
+        diffed
+    ctx: dictionary
+        see run_engine()
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        the COPY rows, as read back from their tab separated text
+    """
+    if isinstance(result, int):
+        return None
+    if isinstance(result, bytes):
+        return pgcopy_frame(result)
+    if isinstance(result, dict):
+        result = csi2pg.parse_columns_sql(
+            result, field_names(result), ctx["tag"]
+        )[0]
+    elif isinstance(result, str) and result.endswith(".dat"):
+        result = csi2pg.parse_TOA5_sql(result, ctx["workdir"])[0]
+    return pd.read_csv(result, sep="\t", header=None, na_values=r"\N")
+
+
+def peak_rss():
+    """Peak resident set size of this process, or its children, in MB."""
+    return (
+        max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+        / 1024.0
+    )
+
+
+def run_engine(name, ctx, queue):
+    """
+    Time one engine, then diff its output; in a process of its own.
+
+    Parameters
+    ----------
+    name: string
+        key of ENGINES
+    ctx: dictionary
+        ffn: the .bdat file
+        workdir: directory for TOA5 & .sql files
+        workers: number of processes for decode_TOB3_parallel()
+        tag: "site_table_label", for the file names parse_*_sql() want
+        toa5: TOA5 file to write
+        ref_toa5: TOA5 file of the reference engine
+        ref_sql: .sql file of the reference engine, or None
+    queue: multiprocessing.Queue
+        gets (seconds, records, peak RSS in MB, diff)
+    """
+    logging.disable(logging.INFO)
+    rss_start = peak_rss()
+    time_start = time.perf_counter()
+    result = ENGINES[name][0](ctx)
+    seconds = time.perf_counter() - time_start
+    rss = peak_rss()
+    try:
+        df = sql_frame(result, ctx)
+        if df is None:
+            diff, records = "-", result
+        elif ctx["ref_sql"] is None:
+            diff, records = "reference", len(df)
+        else:
+            expected = pd.read_csv(
+                ctx["ref_sql"], sep="\t", header=None, na_values=r"\N"
+            )
+            if isinstance(result, bytes):
+                # real, not "%.7g" text; and valid as a timestamp
+                valid = expected.columns[-1]
+                expected[valid] = pd.to_datetime(expected[valid])
+                pd.testing.assert_frame_equal(
+                    df, expected, check_dtype=False, rtol=1e-6
+                )
+            else:
+                pd.testing.assert_frame_equal(df, expected)
+            diff, records = "ok", len(df)
+    except Exception as exc:  # report, and carry on with the next engine
+        diff, records = "DIFF: " + str(exc).strip().split("\n")[0], None
+    queue.put((seconds, records, rss, rss_start, diff))
+
+
+def scale_file(ffn, out_ffn, copies):
+    """
+    Write a copy of a TOB1 or TOB3 file, with its records repeated.
+
+    Parameters
+    ----------
+    ffn: string
+        the .bdat file to scale
+    out_ffn: string
+        the scaled file to write
+    copies: integer
+        number of times the records are written
+
+    Returns
+    -------
+    rec_cnt: integer
+        number of records in the scaled file
+
+    Notes
+    -----
+    Each copy continues the timestamps and record numbers of the previous
+        one, by the span of the original file rounded up to whole seconds,
+        so the scaled file looks like one long recording.  TOB3 files keep
+        only their valid frames (in file order), TOB1 files their whole
+        records.
+    """
+    with open(ffn, "rb") as rf:
+        nlines = 5 if rf.read(6) == b'"TOB1"' else 6
+        rf.seek(0)
+        header = csi2pg.read_header(rf, nlines)
+        pos = rf.tell()
+        rf.seek(0)
+        raw = rf.read()
+    schema = csi2pg.get_schema(header)
+    if header[0][0] == "TOB1":
+        recs = np.frombuffer(
+            raw,
+            schema["rec_dtype"],
+            count=(len(raw) - pos) // schema["trs"],
+            offset=pos,
+        )
+        nrec = len(recs)
+        seconds = int(recs["SECONDS"][-1]) - int(recs["SECONDS"][0])
+        span = math.ceil(seconds * nrec / max(nrec - 1, 1))
+        body = []
+        for ii in range(copies):
+            copy = recs.copy()
+            copy["SECONDS"] += ii * span
+            copy["RECORD"] += ii * nrec
+            body.append(copy.tobytes())
+    elif header[0][0] == "TOB3":
+        fs = schema["fs"]
+        index = csi2pg.frame_index(raw, pos, schema, int(header[1][4]))
+        majors = np.unique((index["offset"] - pos) // fs)
+        frames = np.frombuffer(
+            raw, np.uint8, count=(len(raw) - pos) // fs * fs, offset=pos
+        ).reshape(-1, fs)[majors]
+        nrec = int(index["nrec"].sum())
+        span = math.ceil(nrec * schema["interval_ns"] / 1e9)
+        body = []
+        for ii in range(copies):
+            copy = frames.copy()
+            # TOB3 frame header:  seconds, sub-seconds, record number
+            heads = copy[:, :12].copy().view("<u4")
+            heads[:, 0] += ii * span
+            heads[:, 2] += ii * nrec
+            copy[:, :12] = heads.view(np.uint8)
+            body.append(copy.tobytes())
+    else:
+        raise Exception("can not scale %s files" % (header[0][0],))
+    with open(out_ffn, "wb") as wf:
+        wf.write(raw[:pos])
+        for block in body:
+            wf.write(block)
+    return nrec * copies
+
+
+def bench_file(ffn, workdir, workers):
+    """
+    Run all engines, which handle its file type, on one file.
+
+    Returns
+    -------
+    list of tuples
+        (engine, MB/s, records/s, peak RSS MB, diff) per engine
+    """
+    file_type = csi2pg.read_file_header(ffn)[0][0]
+    workdir = tempfile.mkdtemp(dir=workdir)
+    fn = os.path.basename(ffn)
+    tag = "{}_{}_".format(fn[:3], csi2pg.table_code[fn[3]])
+    mbytes = os.path.getsize(ffn) / 1e6
+    reference = REFERENCE.get(file_type)
+    ref_toa5 = os.path.join(workdir, tag + "reference.dat")
+    ctx = {
+        "ffn": ffn,
+        "workdir": workdir,
+        "workers": workers,
+        "ref_toa5": ref_toa5,
+        "ref_sql": None,
+    }
+    names = [reference] if reference else []
+    names += [
+        name
+        for name, (_, types) in ENGINES.items()
+        if file_type in types and name not in REFERENCE.values()
+    ]
+    # spawn: each engine starts from a fresh interpreter, for its peak RSS
+    mp = multiprocessing.get_context("spawn")
+    rows = []
+    for name in names:
+        label = "reference" if name == reference else name.replace("_", "-")
+        ctx.update(
+            tag=tag + label, toa5=os.path.join(workdir, tag + label + ".dat")
+        )
+        if name == "parse_TOA5_sql" and reference is None:
+            continue
+        queue = mp.Queue()
+        proc = mp.Process(target=run_engine, args=(name, dict(ctx), queue))
+        proc.start()
+        seconds, records, rss, rss_start, diff = queue.get()
+        proc.join()
+        if name == reference:
+            ctx["ref_sql"] = os.path.join(workdir, tag + "reference.sql")
+        rows.append(
+            (
+                name,
+                mbytes / seconds,
+                records / seconds if records else float("nan"),
+                rss,
+                rss - rss_start,
+                diff,
+            )
+        )
+    return rows
+
+
+def main(argv):
+    """Benchmark the example files, and their scaled copies."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="TOB files to benchmark.  Default examples/*.bdat",
+    )
+    parser.add_argument(
+        "--hours",
+        type=float,
+        default=1.0,
+        help="length of the scaled copy of each file; 0 for none.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(os.cpu_count() or 1, 4),
+        help="processes of decode_TOB3_parallel()",
+    )
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    fnames = args.files or sorted(glob.glob(os.path.join(EXAMPLES, "*.bdat")))
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        for ffn in fnames:
+            inputs = [ffn]
+            if args.hours > 0:
+                ts = csi2pg.decode_columns(ffn)[1]["TIMESTAMP"]
+                span = (ts[-1] - ts[0]) / np.timedelta64(1, "s")
+                span *= len(ts) / max(len(ts) - 1, 1)
+                copies = max(math.ceil(args.hours * 3600 / span), 1)
+                scaled = os.path.join(workdir, os.path.basename(ffn))
+                scale_file(ffn, scaled, copies)
+                inputs.append(scaled)
+            for ii, bench_ffn in enumerate(inputs):
+                print(
+                    "\n%s  (%s, %.1f MB)"
+                    % (
+                        os.path.basename(ffn),
+                        "as is" if ii == 0 else "%.1f hours" % args.hours,
+                        os.path.getsize(bench_ffn) / 1e6,
+                    )
+                )
+                print(
+                    "%-22s %9s %12s %9s %9s  %s"
+                    % (
+                        "engine",
+                        "MB/s",
+                        "records/s",
+                        "RSS MB",
+                        "+RSS MB",
+                        "diff",
+                    )
+                )
+                for row in bench_file(bench_ffn, workdir, args.workers):
+                    print("%-22s %9.1f %12.0f %9.1f %9.1f  %s" % row)
+                    failed |= row[-1].startswith("DIFF")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -8,20 +8,33 @@ See `README.md` for more details on this code
 # pylint: disable=too-many-lines
 
 import argparse  # use command line arguments
+import collections  # archive_batches()
+import concurrent.futures  # bin2pg_pool()
+import contextlib
 import datetime  # datetime & timedelta
 import ftplib  # deleting file from datalogger
+import glob  # archive_files()
+import io
 import json
 
 # logging
 import logging.config
+import logging.handlers
+import mmap  # memory-mapped, zero-copy reading of binary files
+import multiprocessing
+import multiprocessing.shared_memory  # decode_TOB3_parallel()
+import multiprocessing.util  # bin2pg_worker_init()
 import os  # os.path.join()  &  os.listdir()
 import re
+import signal  # daemon()
 
 # email
 import smtplib
 import struct  # unpacking binary
 import subprocess
 import sys  # sys.exit() & email (tail -5) & sys.path.append
+import time
+import zlib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
@@ -30,8 +43,20 @@ import numpy as np
 # third party
 import pandas as pd
 import psycopg2
+import psycopg2.sql
 import pytz
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional; only for write_parquet()
+    pyarrow = None
+
+try:
+    import inotify_simple
+except ImportError:  # optional; daemon() polls dataroot without it
+    inotify_simple = None
+
 # local directory stuff
 from log_conf import logger_configurator  # @UnresolvedImport
 
@@ -45,6 +70,7 @@ logging.config.dictConfig(logger_config.log_conf_dict)
 
 # CSI datalogger timestamps are based on seconds since midnight, 1-Jan-1990
 CSI_EPOCH = datetime.datetime(1990, 1, 1)
+CSI_EPOCH64 = np.datetime64("1990-01-01", "ns")
 
 data_type_dict = {
     # primary dictionary for decoding bytes and formatting output stirngs
@@ -108,6 +134,30 @@ INTERVAL_DICT = {
     "DAY": 86400,
 }
 
+NP_TYPE_DICT = {
+    # numpy equivalents of data_type_dict's struct formats, used to build a
+    # structured dtype so a whole block of records is decoded with one
+    # np.frombuffer() call.
+    # BOOL2 & BOOL4 only use their first Byte, same as decode_data_bin()
+    # FP2 is kept as the raw 2-Byte integer, and converted afterwards
+    # ASCII(n) is handled in record_dtype(), because its size varies
+    "BOOL8": "u1",
+    "BOOL4": "u1",
+    "BOOL2": "u1",
+    "BOOL": "u1",
+    "UINT2": ">u2",
+    "UINT4": ">u4",
+    "INT4": ">i4",
+    "ULONG": "<u4",
+    "LONG": "<i4",
+    "FP2": ">u2",
+    "IEEE4": "<f4",
+    "IEEE4L": "<f4",
+    "IEEE4B": ">f4",
+    "SecNano": ("<u4", (2,)),
+    "NSec": (">u4", (2,)),
+}
+
 resolution_dict = {
     # for TOB2 & TOB3
     # used to decode the TOB3 headers timestamp (sub-second value).
@@ -300,7 +350,9 @@ def decode_data_bin(rec, dtl, bl):
             # ...based on a very few (!) observations, if there is one "\x00"
             # value, ignore everything after it within that string's remaining
             # byte allocation.
-            value = string.split("\x00", 1)[0]
+            value = (
+                bytes(string).split(b"\x00", 1)[0].decode("ascii", "ignore")
+            )
         elif dtype == "SecNano" or dtype == "NSec":
             ts_list = struct.unpack(fmt, rec[offset : offset + size])
             # ts_list[seconds since CSI epoch, NANOseconds into second]
@@ -394,8 +446,9 @@ def footer_parse(footer, validation_int):
     Notes
     -----
     Length of footer is 4 bytes.
+    This is called for every frame, so it does no logging; see frame_index()
+        for parsing all of a file's footers at once.
     """
-    logger = logging.getLogger(__name__)
     # CSI documentation says "read as a 4-Byte unsigned integer with least
     # significant byte stored first".
     # ...that is, with little-Endian encoding, and then operate on the
@@ -406,15 +459,14 @@ def footer_parse(footer, validation_int):
     # HOWEVER the bits are all reversed from the documentation!!!  --
     # Not a big/little endian issue.
     # That means the 32 bits of the 4-Byte are as follows:
-    #   validation  = footer[0:16]
-    #   flags       = footer[16:20]
-    #   offset/size = footer[20:32]
-    footer_bits = "{0:032b}".format(struct.unpack("<I", footer)[0])
-    logger.debug("footer_bits: %s", footer_bits)
+    #   validation  = footer[0:16]   --> footer_int >> 16
+    #   flags       = footer[16:20]  --> footer_int >> 12 & 0xF
+    #   offset/size = footer[20:32]  --> footer_int & 0xFFF
+    footer_int = struct.unpack("<I", footer)[0]
     # validation
     #  the second/last 2-Byte interger, must match (or be the ones compliment)
     # the validation stamp from the header
-    V = int(footer_bits[:16], base=2)
+    V = footer_int >> 16
     if V == validation_int:
         valid_frame = True
     # ones compliment, i.e. switch the bit values
@@ -426,7 +478,7 @@ def footer_parse(footer, validation_int):
     # for a minor frame, ignore the validation; unless the minor frame is also
     # a Major frame boundary, i.e. the last minor frame in the major frame.
     # frame flags
-    FREM = int(footer_bits[16:20], base=2)
+    FREM = footer_int >> 12 & 0xF
     (F, R, E, M) = (0, 0, 0, 0)  # reset all flags
     if FREM != 0:
         if FREM & 0b0001:
@@ -446,13 +498,7 @@ def footer_parse(footer, validation_int):
             # frame is a MINOR or Dirty frame,
             M = 1
     # minor frame size:
-    minor_frame_size = int(footer_bits[20:], base=2)
-    logger.debug(
-        "V: %s validation_int: %s minor_frame_size: %s",
-        V,
-        validation_int,
-        minor_frame_size,
-    )
+    minor_frame_size = footer_int & 0xFFF
     # size includes the minor frame header.
     # This is 0 for a TOB3 Major frame, but if there are minor frames, the
     # major frames footer
@@ -501,6 +547,68 @@ def header_parse(header, ts_resolution):
     return ts, header_tuple[2]
 
 
+def header_parse_np(heads, ts_resolution):
+    """
+    parses many TOB2 or TOB3 frame headers at once; see header_parse().
+
+    Parameters
+    ----------
+    heads: numpy.ndarray
+        uint8 array of shape (number of frames, 12), or (number of frames, 8)
+        for TOB2
+    ts_resolution:
+        frame time resolution.  from header[1][5]
+
+    Returns
+    -------
+    frame_ts: numpy.ndarray of datetime64[ns]
+    frame_rec: numpy.ndarray of int64, or None
+        TOB2 frame headers have no record number.
+    """
+    header_ints = np.ascontiguousarray(heads).view("<u4").astype(np.int64)
+    nsec = header_ints[:, 0] * 1000000000 + header_ints[:, 1] * (
+        ts_resolution * 1000
+    )
+    frame_rec = header_ints[:, 2] if header_ints.shape[1] > 2 else None
+    return CSI_EPOCH64 + nsec.astype("timedelta64[ns]"), frame_rec
+
+
+def record_timestamps(frame_ts, frame_rec, nrec, interval_ns):
+    """
+    TIMESTAMP & RECORD of every record, from those of each frame's first
+    record.
+
+    Parameters
+    ----------
+    frame_ts: numpy.ndarray of datetime64
+        timestamp of each frame's first record, e.g. from header_parse_np()
+    frame_rec: numpy.ndarray of integers
+        record number of each frame's first record
+    nrec: numpy.ndarray of integers
+        number of records in each frame
+    interval_ns: integer
+        non-timestamped record interval, in nanoseconds
+
+    Returns
+    -------
+    timestamps: numpy.ndarray of datetime64[ns]
+    records: numpy.ndarray of int64
+
+    Notes
+    -----
+    Counterpart of the per-row datetime.timedelta additions in
+        decode_frameTOB3(); all arithmetic is in integer nanoseconds, so
+        there is no per-row datetime object, nor float rounding.
+    """
+    nrec = np.asarray(nrec, dtype=np.int64)
+    # index of each record within its frame
+    within = np.arange(nrec.sum()) - np.repeat(np.cumsum(nrec) - nrec, nrec)
+    start_ns = np.asarray(frame_ts, dtype="datetime64[ns]").view(np.int64)
+    timestamps = np.repeat(start_ns, nrec) + within * interval_ns
+    records = np.repeat(np.asarray(frame_rec, dtype=np.int64), nrec) + within
+    return timestamps.view("datetime64[ns]"), records
+
+
 def decode_frameTOB3(
     head_and_data, fhs, trs, dtl, bl, rfs, rec_interval, ts_resolution
 ):
@@ -578,476 +686,3088 @@ def decode_frameTOB3(
     return records
 
 
-def decode_TOB3(ffn, toa5_file):
+def record_dtype(names, dtl, bl):
     """
-    Decode TOB3 binary file (written to CRD) to TOA5 formatted ASCII (the
-        standard CSI file type).
+    Build the numpy structured dtype of one record (aka. row).
 
     Parameters
     ----------
-    ffn : string
-        full file name, including path and extention.
-    toa5_file: string
-        full file name of output file.
+    names: list of strings
+        field names, from the header
+    dtl: list of strings
+        Data Type List; "ASCII" instead of "ASCII(#)" variants
+    bl: list of integers
+        the number of bytes, for each value in record
 
     Returns
     -------
-    none
-        this just writes a new file.
+    numpy.dtype
+        structured dtype, with explicit offsets and an itemsize of the Table
+        Record Size, so it can be used directly with np.frombuffer()
+    """
+    formats, offsets = [], []
+    offset = 0
+    for size, dtype in zip(bl, dtl):
+        if dtype == "ASCII":
+            # the null terminator is included in the allocation
+            formats.append("S{}".format(max(size - 1, 1)))
+        else:
+            formats.append(NP_TYPE_DICT[dtype])
+        offsets.append(offset)
+        offset += size
+    return np.dtype(
+        {
+            "names": list(names),
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": offset,
+        }
+    )
+
+
+def fp2_table():
+    """
+    Build the look-up table of every possible FP2 value.
+
+    Returns
+    -------
+    numpy.ndarray
+        65,536 float32 values, indexed by the raw 2-Byte FP2 integer.
 
     Notes
     -----
-    TOB3 files are written in major and minor frames, from top to bottom.  Each
-        frame's footer must be check first.  If the frame if valid, it is
-        decoded.
+    Same bit layout & special cases as decode_data_bin():
+        mantissa is in bits 1-13, exponent in bits 14-15, sign in bit 16;
+        with exponent 0, a mantissa of 8190 is NaN and 8191 is +/-Inf.
     """
-    logger = logging.getLogger(__name__)
-    fn = os.path.basename(ffn)
-    logger.info("starting to decode TOB3 file:  %s", fn)
-    rec_cnt = 0
-    header = []
-    valid_frame_cnt, not_valid_frame_cnt = 0, 0
-    rf = open(ffn, "rb")
-    for _ in range(6):
-        header.append(
-            (
-                rf.readline()
-                .decode("ascii", "ignore")
-                .replace('"', "")
-                .replace("\r\n", "")
-                .replace("\n", "")
-                .split(",")
-            )
-        )
-    # extract header information
-    #  bl := Byte Length; list of bytes length per measurment for each
-    # record.
-    # dtl := Data Type List; datatypes, but with "ASCII" instead of
-    # "ASCII(?+)", necessicary for dictionary lookup
-    # rfs := Record Format String; the string to use with .format(),
-    # for each record
-    # trs := Table Record Size; number of Bytes per record
-    # remove trailing spaces from last data type definition from header,
-    # which may be padded with spaces, so that the table header ends as
-    # a sector boundary.
-    dtypes = [ss.replace(" ", "") for ss in header[5]]
-    dtl = [xx.split("(")[0] for xx in dtypes]
-    rfs = ",".join([data_type_dict[xx]["refmt"] for xx in dtl]) + "\n"
-    bl = [
-        int(xx.split("(")[1][:-1])
-        if ("ASCII" in xx)
-        else data_type_dict[xx]["size"]
-        for xx in dtypes
-    ]
-    trs = sum(bl)
-    # -- look-up header & footer size --
-    # fs := data Frame Size
-    # tbl := table size; intendes number of records in file
-    fs = int(header[1][2])
-    tbl = int(header[1][3])
-    # fft := file format type
-    # fhs := frame header size
-    # ffs := frame footer size
-    # check file's format
-    if header[0][0] != "TOB3":
-        logger.critical("File (%s) is not TOB3 type!", ffn)
-        email_exit()
-    fhs = FILE_TYPE_DICT["TOB3"]["fhs"]
-    ffs = FILE_TYPE_DICT["TOB3"]["ffs"]
-
-    # interval := non-timestamped record interval; for intra-frame
-    # timestamps; in seconds
-    interval_str = header[1][1].split(" ")
-    interval = int(interval_str[0]) * INTERVAL_DICT[interval_str[1]]
-    # resolution := frame time resolution;  multiplier for sub-second
-    # part of frame timestamp to acheive microsecond resolution.
-    ts_resolution = resolution_dict[header[1][5]]
-    # validation := 2-Byte unsigned integer, this or its compliment, are
-    # compared with footer for validating frame integrity
-    validation_int = int(header[1][4])
-    # validation_bits = "{:016b}".format(int(header[1][4]))
-    # reformat header for output
-    ho = [header[xx] for xx in [0, 2, 3, 4]]
-    ho[0][0] = "TOA5"
-    ho[0][-1] = header[1][0]
-    ho[0].append(fn)  # add origional file name to header.
-    ho[1] = ["TIMESTAMP", "RECORD"] + ho[1]
-    ho[2] = ["TS", "RN"] + ho[2]
-    ho[3] = ["", ""] + ho[3]
-    # open output file for writing
-    outfile = open(toa5_file, "w")
-    # outfile = open(output,"w")
-    # write header
-    for hh in ho:
-        outfile.write('"' + '","'.join(hh) + '"\n')
-    # examine contents
-    # loop though file's Major Frames
-    major_cnt = 0  # used only for debugging
-    frame = rf.read(fs)
-    while len(frame) == fs:
-        # read frame footer
-        (valid_frame, F, R, E, M, minor_frame_size) = footer_parse(
-            frame[-ffs:], validation_int
-        )
-        logger.debug(
-            "MajorFrame: %s len(frame): %s fs: %s valid_frame: %s "
-            "F: %s R: %s E: %s M: %s",
-            major_cnt,
-            len(frame),
-            fs,
-            valid_frame,
-            F,
-            R,
-            E,
-            M,
-        )
-        major_cnt += 1  # used only for above
-        if valid_frame:
-            valid_frame_cnt += 1
-            # initialize list to hold formatted strings, which will
-            # be written to out file, after processing
-            # each Major frame.
-            records = []
-            if not (E == 1 or M == 1):
-                # standard Major Frame processing
-                records = decode_frameTOB3(
-                    frame[:-ffs],
-                    fhs,
-                    trs,
-                    dtl,
-                    bl,
-                    rfs,
-                    interval,
-                    ts_resolution,
-                )
-            else:
-                subframe_cnt = 0  # ### for debug only ####
-                skip_sub_frame, cnt_sub_frame = 0, 0  # debugging only
-                # enter sub-frame loop
-                # this processes the unknown number of sub-frames
-                # within the Major frame
-                # start from the back of the major frame, and based
-                # on the footer,
-                #   identify the size of the sub-frame; analyze; then
-                # move forward
-                #   in the major frame by the size of the sub-frame.
-                logger.debug("MINOR Frame processing!!!!")
-                # initialize sub-frame loop (only 1 recursion deep, so
-                # an "if" control works fine)
-                # Byte count from the *END* of the Major Frame; when
-                # this == fs, the sub-frame while loop breaks.
-                subframe_offset = 0
-                # the location of the end for the current sub-frame;
-                # byte count from the front of the file.
-                subframe_end_ptr = fs
-                sub_frame = frame[
-                    (subframe_end_ptr - minor_frame_size) : subframe_end_ptr
-                ]
-                while True:
-                    # sub-frame at a Major frame boundary may be listed
-                    # as empty, but the other sub-frames may have data
-                    if E != 1:
-                        # append sub-frame records to records, i.e.
-                        # make a list (i.e. major frame) of lists
-                        # (i.e. minor frames).
-                        records.append(
-                            decode_frameTOB3(
-                                sub_frame[:-ffs],
-                                fhs,
-                                trs,
-                                dtl,
-                                bl,
-                                rfs,
-                                interval,
-                                ts_resolution,
-                            )
-                        )
-                    # identify location of next sub-frame
-                    subframe_offset += minor_frame_size
-                    subframe_end_ptr = fs - subframe_offset
-                    if skip_sub_frame == cnt_sub_frame:
-                        # int(raw_input("**-Paused for
-                        # debugging-**\n**Enter number of MINOR
-                        # frames to skip over; 0 (zero) is
-                        # default.**\n"))
-                        skip_sub_frame = 0
-                        cnt_sub_frame = -1
-                    cnt_sub_frame += 1  # used for skip subframes
-                    subframe_cnt += 1  # only used for debugging
-                    if subframe_offset >= fs:
-                        # the total lenght of sub-frames has exhausted
-                        # the length of the Major frame
-                        #   exit the while loop, and return to the main
-                        # loop to write records to output.
-                        # A slice of major frame with a negative first
-                        # index results in an empty set,
-                        #   and processing that empty set in the footer
-                        # parse results in an index error.
-                        #   read next (actaull previous in memory)
-                        # frame's footer
-                        break
-                    # read next subframe' footer
-                    (valid_frame, F, R, E, M, minor_frame_size) = footer_parse(
-                        frame[-(subframe_offset + ffs) : -subframe_offset],
-                        validation_int,
-                    )
-                    # read next subframe
-                    sub_frame = frame[
-                        (
-                            subframe_end_ptr - minor_frame_size
-                        ) : subframe_end_ptr
-                    ]
-            # record list of valid frame has been assembled.
-            # check if sub-frames exist; if yes, reorder sub-frames,
-            # and prepare for writing
-            if records:
-                # have a list of lists, which needs to be reveresed
-                # (becaue sub-frames are
-                #   read from bottom to top of major frame).
-                # Then flatten, so that record is
-                #   a list of strings, and not a list of lists of
-                # strings.
-                records.reverse()
-                records = [jj for ii in records for jj in ii]
-            rec_cnt += len(records)
-            # write to output file
-            outfile.writelines(records)
-        else:
-            not_valid_frame_cnt += 1
-            if not_valid_frame_cnt > 5:
-                # ### 5 is arbitrary, because
-                # after 1 it is probably done.
-                logger.info(
-                    (
-                        "breaking out of major frame parse loop, "
-                        "becaue not_valid_frame_cnt > 5"
-                    )
-                )
-                break
-        # move to next MAJOR frame
-        frame = rf.read(fs)
-        logger.debug("read() got %s bytes", len(frame))
-    logger.debug("TOB3 file (%s);  rec_cnt = %s", fn, rec_cnt)
-    return rec_cnt, tbl
+    fp2 = np.arange(65536, dtype=np.uint32)
+    mant = (fp2 & 0x1FFF).astype(np.float64)
+    exp = fp2 >> 13 & 0x3
+    sign = fp2 >> 15
+    table = np.where(sign == 1, -mant, mant) / 10.0**exp
+    special = exp == 0
+    table[special & (mant == 8190)] = np.nan
+    table[special & (mant == 8191) & (sign == 0)] = np.inf
+    table[special & (mant == 8191) & (sign == 1)] = -np.inf
+    return table.astype(np.float32)
 
 
-def decode_TOB1(ffn, toa5_file):
+FP2_TABLE = fp2_table()
+
+
+def decode_fp2(values):
     """
-    Decode TOB1 binary file to TOA5 formatted ASCII
-    (the standard CSI file type).
+    Decode a column of raw FP2 values.
 
     Parameters
     ----------
-    ffn : string
-             full file name, including path and extention.
-    toa5_file: string
-        full file name of output file.
+    values: numpy.ndarray
+        raw 2-Byte FP2 integers, of any byte order
 
     Returns
     -------
-    none
-        this just writes a new file.
-
-    Notes
-    -----
-    TOB1 files are written from top to bottom, without frames; each row is
-        self containted.  This function calls many other supporting functions.
-    This function was written as the main(), but has since been incorporated as
-        a function of its own.
+    numpy.ndarray
+        float32 values, same shape as values
     """
-    logger = logging.getLogger(__name__)
-    fn = os.path.basename(ffn)
-    logger.info("starting to decode TOB1 file %s", fn)
-    rec_cnt = 0
-    header = []
-    with open(ffn, "rb") as rf:
-        # read the 5 header lines into variable and then parse it.
-        for _ in range(5):
-            header.append(
-                (
-                    rf.readline()
-                    .decode("ascii", "ignore")
-                    .replace('"', "")
-                    .replace("\r\n", "")
-                    .replace("\n", "")
-                    .split(",")
-                )
-            )
-        # extract header information
-        #  bl := Byte Length; list of bytes length per measurment for each
-        #        record.
-        # dtl := Data Type List; datatypes, but with "ASCII" instead of
-        #        "ASCII(?+)", necessicary for dictionary lookup
-        # rfs := Record Format String; the string to use with .format(),
-        #        for each record
-        # trs := Table Record Size; number of Bytes per record
-        dtypes = header[4]
-        dtl = [xx.split("(")[0] for xx in dtypes]
-        rfs = ",".join([data_type_dict[xx]["refmt"] for xx in dtl]) + "\n"
-        bl = [
-            int(xx.split("(")[1][:-1])
-            if ("ASCII" in xx)
-            else data_type_dict[xx]["size"]
-            for xx in dtypes
-        ]
-        trs = sum(bl)
-        if (
-            header[1][0] == "SECONDS"
-            and header[1][1] == "NANOSECONDS"
-            and dtypes[0] == "ULONG"
-            and dtypes[1] == "ULONG"
-        ):
-            # assume the record's first value is TIMESTAMP
-            TIMESTAMP = True
-            rfs = '"{}",' + rfs.split(",", 2)[-1]
-            logger.debug("file has 'TIMESTAMP'")
-        else:
-            TIMESTAMP = False
-        # write to output file
-        # format output file's header
-        if TIMESTAMP:
-            ho = [xx[1:] for xx in header[:4]]
-            ho[0].insert(0, "TOA5")
-            ho[1][0] = "TIMESTAMP"
-            ho[2][0] = "TS"
-        else:
-            ho = header[:4]
-            ho[0][0] = "TOA5"
-        ho[0].append(fn)  # add origional file name to header.
-        # write output
-        with open(toa5_file, "w") as outfile:
-            for hh in ho:
-                outfile.write('"' + '","'.join(hh) + '"\n')
-            logger.debug("header written")
-            # -----------------------------------
-            # increment though file one record at a time, write each to file
-            rec = rf.read(trs)
-            while len(rec) == trs:
-                values = decode_data_bin(rec, dtl, bl)
-                if TIMESTAMP:
-                    # remove the first two ULONG values from list, and
-                    # convert to timestamp
-                    ts_list = values[:2]
-                    values = values[2:]
-                    ts = CSI_EPOCH + datetime.timedelta(
-                        0, ts_list[0], ts_list[1] / 1000
-                    )
-                    values.insert(0, ts_formatter(ts))
-                values = ['"NAN"' if xx == "nan" else xx for xx in values]
-                outfile.write(rfs.format(*values))
-                rec = rf.read(trs)
-                rec_cnt += 1
-    logger.debug("TOB1 file (%s); rec_cnt = %s", fn, rec_cnt)
-    return rec_cnt
+    return FP2_TABLE[values.astype(np.uint16)]
 
 
-def b38(xx):
+def decode_column_np(values, dtype):
     """
-    convert base 38 character into its equavalent decimal value.
+    Convert one raw column, from np.frombuffer(), into its decoded values.
 
     Parameters
     ----------
-    xx: string
-        lenght must be 1!!
+    values: numpy.ndarray
+        raw values of one field, for many records
+    dtype: string
+        datatype from data_type_dict, "ASCII" instead of "ASCII(#)"
 
     Returns
     -------
-    yy: integer
-        number in decimal
-
-    Notes
-    -----
-    This is a custom code for CSI dataloggers, and is probably not used
-    anywhere else.
+    numpy.ndarray
+        native-endian column; same values as decode_data_bin(), but
+        timestamps are numpy.datetime64[ns] and BOOL8 is left as uint8.
     """
-    logger = logging.getLogger(__name__)
-    value = ord(xx)
-    if value == 45:  # - (dash)
-        yy = 36
-    elif value < 58:  # [0-9]
-        yy = value - 48
-    elif value > 96:  # [a-z]
-        yy = value - 87
-    elif value == 95:  # _ (underscore)
-        yy = 37
-    else:
-        logger.error("character is not in custom Base 38 encoding.  Abort!")
-        email_exit()
-    return yy
+    if dtype == "FP2":
+        return decode_fp2(values)
+    if dtype == "ASCII":
+        # ignore everything after the first null, like decode_data_bin()
+        return np.char.partition(values, b"\x00")[:, 0]
+    if dtype in ("SecNano", "NSec"):
+        # [seconds since CSI epoch, NANOseconds into second]
+        nsec = values[:, 0].astype(np.int64) * 1000000000 + values[:, 1]
+        return CSI_EPOCH64 + nsec.astype("timedelta64[ns]")
+    if dtype == "BOOL":
+        # -1 for True, and 0 for False
+        return np.where(values != 0, -1, 0).astype(np.int8)
+    if dtype in ("BOOL2", "BOOL4"):
+        # 1 for True, and 0 for False
+        return (values != 0).astype(np.int8)
+    return values.astype(values.dtype.newbyteorder("="))
 
 
-def decode_filename(fn, dirpath):
+def decode_data_np(data, rec_dtype, dtl):
     """
-    decodes the file name from the logger
+    Decode a block of binary records with one np.frombuffer() call.
 
     Parameters
     ----------
-    fn: string
-        filename
-    dirpath: string
-        directory path to root of storage, in which directories
-            of year/month/day will be built and data stored.
+    data: bytes-like
+        binary data of any number of whole records
+    rec_dtype: numpy.dtype
+        from record_dtype()
+    dtl: list of strings
+        Data Type List, in the same order as rec_dtype's fields
 
     Returns
     -------
-    newffn: string
-        new full-filename, without extention (extention added
-        after file closes)
-    valid: datetime
-        the timestamp this file is valid for
+    columns: dictionary
+        field name --> numpy.ndarray of decoded values
 
     Notes
     -----
-    the file format is as follows
-        sto|ham :: site name
-        [SAM] :: Sonic, Analog (CR3000), Monitor
-            (CSAT3Bs' health & orientation)
-        [0-9a-z_-]{5} :: YYYY-2000, MM, DD, minutes since midnight --
-            all in base 38 the order is 0-9 a-z - _
-        .bdat :: binary data file
-    this also cals mkdir so that the output path is valid.
+    This is the vectorized counterpart of decode_data_bin().
     """
-    logger = logging.getLogger(__name__)
-    decode = [b38(xx) for xx in fn[4:9]]
-    yyyy = str(decode[0] + 2000)
-    mm = "{:02}".format(decode[1])
-    dd = "{:02}".format(decode[2])
-    hhtt = "{:02}{:02}".format(*divmod(decode[3] * 38 + decode[4], 60))
-    valid = datetime.datetime.strptime(
-        "%s%s%s%s" % (yyyy, mm, dd, hhtt), "%Y%m%d%H%M"
-    )
-    valid = valid.replace(tzinfo=pytz.utc)
-    filepath = os.path.join(dirpath, yyyy, mm, dd)
-    chkmkdir(filepath)
-    newfn = (
-        fn[:3]
-        + "_"
-        + table_code[fn[3]]
-        + "_"
-        + yyyy[2:]
-        + mm
-        + dd
-        + "-"
-        + hhtt
+    raw = np.frombuffer(
+        data,
+        dtype=rec_dtype,
+        count=memoryview(data).nbytes // rec_dtype.itemsize,
     )
-    newffn = os.path.join(filepath, newfn)
-    logger.info("filename decoded: %s = %s", fn, newfn)
-    return newffn, valid
+    return {
+        name: decode_column_np(raw[name], dtype)
+        for name, dtype in zip(rec_dtype.names, dtl)
+    }
 
 
-def directory_traverse(dirpath, dates):
+def minor_frames_TOB3(frame, ffs, validation_int, flags, minor_frame_size):
     """
-    relative directories which contain data within the date range of dates
-        variable. This traverses the driectory tree as built by
-        decode_filename().
+    Locate the minor frames within a Major frame.
 
     Parameters
     ----------
-    dirpath: string
-        the root of the ASCII files, i.e. the dirctory containing the YYYY
-            directory(s)
-    dates: datetime.date
-        the object is created based on command line (argparse) input, and is
+    frame: bytes-like
+        the whole Major frame
+    ffs: integer
+        Frame Footer Size, in bytes
+    validation_int: integer
+        the validation code from header[1][4]
+    flags: integer
+        F, R, E, M bits, from the Major frame's footer
+    minor_frame_size: integer
+        from the Major frame's footer
+
+    Returns
+    -------
+    list of tuples
+        (start, stop, flags) of each minor frame's header and data, i.e.
+        without its footer, relative to the start of the Major frame; in the
+        order the records were written, i.e. reversed from the walk.
+        flags are the minor frame footer's F, R, E, M bits.
+
+    Notes
+    -----
+    Minor frames are walked from the back of the Major frame, based on each
+    minor frame's footer.  Empty minor frames are skipped.
+    """
+    fs = len(frame)
+    sub_frames = []
+    subframe_offset = 0
+    while True:
+        subframe_end_ptr = fs - subframe_offset
+        if subframe_end_ptr - minor_frame_size < 0:
+            # corrupt size, which would run past the Major frame's start
+            break
+        if not flags & 0b0100 and minor_frame_size > 0:
+            sub_frames.append(
+                (
+                    subframe_end_ptr - minor_frame_size,
+                    subframe_end_ptr - ffs,
+                    flags,
+                )
+            )
+        subframe_offset += minor_frame_size
+        if subframe_offset >= fs or minor_frame_size == 0:
+            break
+        (_, F, R, E, M, minor_frame_size) = footer_parse(
+            frame[(fs - subframe_offset - ffs) : (fs - subframe_offset)],
+            validation_int,
+        )
+        flags = F | R << 1 | E << 2 | M << 3
+    sub_frames.reverse()
+    return sub_frames
+
+
+FRAME_INDEX_DTYPE = np.dtype(
+    [
+        # file offset of the (Major or minor) frame's header
+        ("offset", np.int64),
+        # F, R, E, M bits of the frame's footer
+        ("flags", np.uint8),
+        # number of records in the frame
+        ("nrec", np.int32),
+        # TIMESTAMP & RECORD of the frame's first record
+        ("ts", "datetime64[ns]"),
+        ("rec", np.int64),
+    ]
+)
+
+# default number of records per batch of iter_batches()
+BATCH_SIZE = 65536
+
+
+def frame_index(buf, pos, schema, validation_int):
+    """
+    Index the frames of a TOB2 or TOB3 file, by parsing all footers at once.
+
+    Parameters
+    ----------
+    buf: bytes-like
+        the whole file, e.g. from map_file()
+    pos: integer
+        offset of the first Major frame, i.e. the end of the ASCII header
+    schema: dictionary
+        from get_schema()
+    validation_int: integer
+        the validation code from header[1][4]
+
+    Returns
+    -------
+    index: numpy.ndarray of FRAME_INDEX_DTYPE
+        one entry per frame holding records, in record order.
+
+    Notes
+    -----
+    Every Major frame's footer is viewed as a uint32, at a stride of the
+        data Frame Size, and split into validation, flags and minor frame
+        size with vector operations; the same rules as footer_parse().
+    Like decode_TOB3(), the file is considered done at its 6th invalid Major
+        frame.  Major frames holding minor frames are walked one by one with
+        minor_frames_TOB3(), which is rare.
+    """
+    fs, fhs, ffs, trs = (schema[xx] for xx in ("fs", "fhs", "ffs", "trs"))
+    nframes = max(len(buf) - pos, 0) // fs
+    frames = np.frombuffer(
+        buf, np.uint8, count=nframes * fs, offset=pos
+    ).reshape(nframes, fs)
+    footers = frames[:, fs - ffs :].copy().view("<u4")[:, 0]
+    V = footers >> 16
+    valid = (V == validation_int) | (V == (validation_int ^ 0xFFFF))
+    stop = np.flatnonzero(np.cumsum(~valid) > 5)
+    if stop.size:
+        valid[stop[0] :] = False
+    flags = (footers >> 12 & 0xF).astype(np.uint8)
+    has_minor = (flags & 0b1100) != 0
+
+    # standard Major frames
+    sel = np.flatnonzero(valid & ~has_minor)
+    offsets = [pos + sel * fs]
+    entry_flags = [flags[sel]]
+    nrec = [np.full(len(sel), (fs - fhs - ffs) // trs)]
+    # Major frames holding minor frames
+    for ii in np.flatnonzero(valid & has_minor):
+        for start, stop, sub_flags in minor_frames_TOB3(
+            frames[ii],
+            ffs,
+            validation_int,
+            int(flags[ii]),
+            int(footers[ii] & 0xFFF),
+        ):
+            offsets.append([pos + ii * fs + start])
+            entry_flags.append([sub_flags])
+            nrec.append([(stop - start - fhs) // trs])
+    index = np.empty(sum(len(xx) for xx in offsets), FRAME_INDEX_DTYPE)
+    index["offset"] = np.concatenate(offsets)
+    index["flags"] = np.concatenate(entry_flags)
+    index["nrec"] = np.concatenate(nrec)
+    index.sort(order="offset", kind="stable")
+    # all frame headers at once
+    heads = np.frombuffer(buf, np.uint8)[
+        index["offset"][:, None] + np.arange(fhs)
+    ]
+    index["ts"], frame_rec = header_parse_np(heads, schema["ts_resolution"])
+    if frame_rec is None:
+        # TOB2 frames have no record number; count from the file's first
+        # record
+        frame_rec = np.cumsum(index["nrec"], dtype=np.int64) - index["nrec"]
+    index["rec"] = frame_rec
+    return index
+
+
+def record_ranges(schema):
+    """
+    The byte ranges of a record, which hold the schema's fields.
+
+    Parameters
+    ----------
+    schema: dictionary
+        from get_schema(), or project_schema()
+
+    Returns
+    -------
+    ranges: list of tuples
+        (start, stop) within the record, in file order; adjacent fields are
+        merged, so a whole schema is [(0, Table Record Size)].
+    packed: numpy.dtype
+        rec_dtype with the ranges back to back, i.e. of the records from
+        gather_records()
+    """
+    rec_dtype = schema["rec_dtype"]
+    ranges, offsets, width = [], [], 0
+    for name, size in zip(rec_dtype.names, schema["bl"]):
+        offset = rec_dtype.fields[name][1]
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1] = (ranges[-1][0], offset + size)
+        else:
+            if ranges:
+                width += ranges[-1][1] - ranges[-1][0]
+            ranges.append((offset, offset + size))
+        offsets.append(width + offset - ranges[-1][0])
+    width += ranges[-1][1] - ranges[-1][0] if ranges else 0
+    packed = np.dtype(
+        {
+            "names": list(rec_dtype.names),
+            "formats": [rec_dtype.fields[name][0] for name in rec_dtype.names],
+            "offsets": offsets,
+            "itemsize": width,
+        }
+    )
+    return ranges, packed
+
+
+def gather_records(buf, index, schema):
+    """
+    Copy the records of indexed frames into one contiguous block.
+
+    Parameters
+    ----------
+    buf: bytes-like
+        the whole file, e.g. from map_file()
+    index: numpy.ndarray of FRAME_INDEX_DTYPE
+        from frame_index()
+    schema: dictionary
+        from get_schema(), or project_schema()
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 array of shape (number of records, record width), in record
+        order; ready for decode_data_np() with the packed dtype of
+        record_ranges().  Only the byte ranges of record_ranges() are
+        copied, so a projected schema skips the bytes of the other fields.
+    """
+    fs, fhs, trs = schema["fs"], schema["fhs"], schema["trs"]
+    ranges, packed = record_ranges(schema)
+    # (start, stop) of each range, within a record & within the output
+    spans = []
+    for start, stop in ranges:
+        out_start = spans[-1][3] if spans else 0
+        spans.append((start, stop, out_start, out_start + stop - start))
+    nrec = index["nrec"].astype(np.int64)
+    out_pos = np.cumsum(nrec) - nrec
+    out = np.empty((int(nrec.sum()), packed.itemsize), np.uint8)
+    # Major frames sit at a stride of the frame size, so those of equal
+    # record counts are copied with one 2-D selection per range
+    aligned = (index["offset"] - index["offset"][:1]) % fs == 0
+    for cnt in np.unique(nrec[aligned]):
+        sel = np.flatnonzero(aligned & (nrec == cnt))
+        if cnt == 0:
+            continue
+        base = int(index["offset"][sel[0]])
+        rows = (index["offset"][sel] - base) // fs
+        frames = np.frombuffer(
+            buf, np.uint8, count=(int(rows[-1]) + 1) * fs, offset=base
+        ).reshape(-1, fs)
+        records = frames[:, fhs : fhs + cnt * trs].reshape(-1, cnt, trs)
+        dest = (out_pos[sel][:, None] + np.arange(cnt)).ravel()
+        for start, stop, out_start, out_stop in spans:
+            out[dest, out_start:out_stop] = records[
+                rows, :, start:stop
+            ].reshape(-1, stop - start)
+    for ii in np.flatnonzero(~aligned):
+        records = np.frombuffer(
+            buf,
+            np.uint8,
+            count=nrec[ii] * trs,
+            offset=int(index["offset"][ii]) + fhs,
+        ).reshape(-1, trs)
+        for start, stop, out_start, out_stop in spans:
+            out[out_pos[ii] : out_pos[ii] + nrec[ii], out_start:out_stop] = (
+                records[:, start:stop]
+            )
+    return out
+
+
+def decode_TOB3(ffn, toa5_file):
+    """
+    Decode TOB3 binary file (written to CRD) to TOA5 formatted ASCII (the
+        standard CSI file type).
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    toa5_file: string
+        full file name of output file.
+
+    Returns
+    -------
+    none
+        this just writes a new file.
+
+    Notes
+    -----
+    TOB3 files are written in major and minor frames, from top to bottom.  Each
+        frame's footer must be check first.  If the frame if valid, it is
+        decoded.
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    logger.info("starting to decode TOB3 file:  %s", fn)
+    rec_cnt = 0
+    with contextlib.ExitStack() as stack:
+        valid_frame_cnt, not_valid_frame_cnt = 0, 0
+        # memory-map the file, so frames are memoryview windows into the file,
+        # rather than copies
+        mm = stack.enter_context(map_file(ffn))
+        header = read_header(mm, 6)
+        # check file's format
+        if header[0][0] != "TOB3":
+            logger.critical("File (%s) is not TOB3 type!", ffn)
+            email_exit()
+        # extract header information, compiled once per logger program
+        #  bl := Byte Length; list of bytes length per measurment for each
+        # record.
+        # dtl := Data Type List; datatypes, but with "ASCII" instead of
+        # "ASCII(?+)", necessicary for dictionary lookup
+        # rfs := Record Format String; the string to use with .format(),
+        # for each record
+        # trs := Table Record Size; number of Bytes per record
+        schema = get_schema(header)
+        dtl, bl, rfs, trs = (schema[xx] for xx in ("dtl", "bl", "rfs", "trs"))
+        # fs := data Frame Size
+        # tbl := table size; intendes number of records in file
+        # fhs := frame header size
+        # ffs := frame footer size
+        fs, tbl, fhs, ffs = (schema[xx] for xx in ("fs", "tbl", "fhs", "ffs"))
+        # interval := non-timestamped record interval; for intra-frame
+        # timestamps; in seconds
+        interval = schema["interval"]
+        # resolution := frame time resolution;  multiplier for sub-second
+        # part of frame timestamp to acheive microsecond resolution.
+        ts_resolution = schema["ts_resolution"]
+        # validation := 2-Byte unsigned integer, this or its compliment, are
+        # compared with footer for validating frame integrity
+        validation_int = int(header[1][4])
+        # validation_bits = "{:016b}".format(int(header[1][4]))
+        # reformat header for output
+        ho = toa5_header(header, fn)
+        # open output file for writing
+        outfile = stack.enter_context(open(toa5_file, "w"))
+        # write header
+        for hh in ho:
+            outfile.write('"' + '","'.join(hh) + '"\n')
+        # examine contents
+        # loop though file's Major Frames
+        major_cnt = 0  # used only for debugging
+        view = memoryview(mm)
+        pos = mm.tell()
+        frame = view[pos : pos + fs]
+        while len(frame) == fs:
+            # read frame footer
+            (valid_frame, F, R, E, M, minor_frame_size) = footer_parse(
+                frame[-ffs:], validation_int
+            )
+            logger.debug(
+                "MajorFrame: %s len(frame): %s fs: %s valid_frame: %s "
+                "F: %s R: %s E: %s M: %s",
+                major_cnt,
+                len(frame),
+                fs,
+                valid_frame,
+                F,
+                R,
+                E,
+                M,
+            )
+            major_cnt += 1  # used only for above
+            if valid_frame:
+                valid_frame_cnt += 1
+                # initialize list to hold formatted strings, which will
+                # be written to out file, after processing
+                # each Major frame.
+                records = []
+                if not (E == 1 or M == 1):
+                    # standard Major Frame processing
+                    records = decode_frameTOB3(
+                        frame[:-ffs],
+                        fhs,
+                        trs,
+                        dtl,
+                        bl,
+                        rfs,
+                        interval,
+                        ts_resolution,
+                    )
+                else:
+                    subframe_cnt = 0  # ### for debug only ####
+                    skip_sub_frame, cnt_sub_frame = 0, 0  # debugging only
+                    # enter sub-frame loop
+                    # this processes the unknown number of sub-frames
+                    # within the Major frame
+                    # start from the back of the major frame, and based
+                    # on the footer,
+                    #   identify the size of the sub-frame; analyze; then
+                    # move forward
+                    #   in the major frame by the size of the sub-frame.
+                    logger.debug("MINOR Frame processing!!!!")
+                    # initialize sub-frame loop (only 1 recursion deep, so
+                    # an "if" control works fine)
+                    # Byte count from the *END* of the Major Frame; when
+                    # this == fs, the sub-frame while loop breaks.
+                    subframe_offset = 0
+                    # the location of the end for the current sub-frame;
+                    # byte count from the front of the file.
+                    subframe_end_ptr = fs
+                    sub_frame = frame[
+                        (
+                            subframe_end_ptr - minor_frame_size
+                        ) : subframe_end_ptr
+                    ]
+                    while True:
+                        # sub-frame at a Major frame boundary may be listed
+                        # as empty, but the other sub-frames may have data
+                        if E != 1:
+                            # append sub-frame records to records, i.e.
+                            # make a list (i.e. major frame) of lists
+                            # (i.e. minor frames).
+                            records.append(
+                                decode_frameTOB3(
+                                    sub_frame[:-ffs],
+                                    fhs,
+                                    trs,
+                                    dtl,
+                                    bl,
+                                    rfs,
+                                    interval,
+                                    ts_resolution,
+                                )
+                            )
+                        # identify location of next sub-frame
+                        subframe_offset += minor_frame_size
+                        subframe_end_ptr = fs - subframe_offset
+                        if skip_sub_frame == cnt_sub_frame:
+                            # int(raw_input("**-Paused for
+                            # debugging-**\n**Enter number of MINOR
+                            # frames to skip over; 0 (zero) is
+                            # default.**\n"))
+                            skip_sub_frame = 0
+                            cnt_sub_frame = -1
+                        cnt_sub_frame += 1  # used for skip subframes
+                        subframe_cnt += 1  # only used for debugging
+                        if subframe_offset >= fs:
+                            # the total lenght of sub-frames has exhausted
+                            # the length of the Major frame
+                            #   exit the while loop, and return to the main
+                            # loop to write records to output.
+                            # A slice of major frame with a negative first
+                            # index results in an empty set,
+                            #   and processing that empty set in the footer
+                            # parse results in an index error.
+                            #   read next (actaull previous in memory)
+                            # frame's footer
+                            break
+                        # read next subframe' footer
+                        (valid_frame, F, R, E, M, minor_frame_size) = (
+                            footer_parse(
+                                frame[
+                                    -(subframe_offset + ffs) : -subframe_offset
+                                ],
+                                validation_int,
+                            )
+                        )
+                        # read next subframe
+                        sub_frame = frame[
+                            (
+                                subframe_end_ptr - minor_frame_size
+                            ) : subframe_end_ptr
+                        ]
+                # record list of valid frame has been assembled.
+                # check if sub-frames exist; if yes, reorder sub-frames,
+                # and prepare for writing
+                if records:
+                    # have a list of lists, which needs to be reveresed
+                    # (becaue sub-frames are
+                    #   read from bottom to top of major frame).
+                    # Then flatten, so that record is
+                    #   a list of strings, and not a list of lists of
+                    # strings.
+                    records.reverse()
+                    records = [jj for ii in records for jj in ii]
+                rec_cnt += len(records)
+                # write to output file
+                outfile.writelines(records)
+            else:
+                not_valid_frame_cnt += 1
+                if not_valid_frame_cnt > 5:
+                    # ### 5 is arbitrary, because
+                    # after 1 it is probably done.
+                    logger.info(
+                        (
+                            "breaking out of major frame parse loop, "
+                            "becaue not_valid_frame_cnt > 5"
+                        )
+                    )
+                    break
+            # move to next MAJOR frame
+            pos += fs
+            frame = view[pos : pos + fs]
+            logger.debug("read() got %s bytes", len(frame))
+    logger.debug("TOB3 file (%s);  rec_cnt = %s", fn, rec_cnt)
+    return rec_cnt, tbl
+
+
+@contextlib.contextmanager
+def map_file(ffn):
+    """
+    Memory-map a file, read only.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+
+    Yields
+    ------
+    mm: mmap.mmap
+        supports readline() for the ASCII header, and memoryview(mm) for
+        zero-copy windows into the binary frames.
+
+    Notes
+    -----
+    The map can not be closed while a memoryview window, or a numpy array
+        built on one, is still referenced; it is then left for the garbage
+        collector to unmap.
+    """
+    with open(ffn, "rb") as rf:
+        mm = mmap.mmap(rf.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mm
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            pass
+
+
+def read_header(rf, nlines):
+    """
+    Read the ASCII header lines of a TOB file.
+
+    Parameters
+    ----------
+    rf: file object
+        opened in binary mode, positioned at the start of the file
+    nlines: integer
+        number of header lines; 5 for TOB1, 6 for TOB2 & TOB3
+
+    Returns
+    -------
+    header: list of lists of strings
+    """
+    header = []
+    for _ in range(nlines):
+        header.append(
+            (
+                rf.readline()
+                .decode("ascii", "ignore")
+                .replace('"', "")
+                .replace("\r\n", "")
+                .replace("\n", "")
+                .split(",")
+            )
+        )
+    return header
+
+
+def schema_key(header):
+    """
+    Identify the logger program & table, which a file's header describes.
+
+    Parameters
+    ----------
+    header: list of lists of strings
+        the file's header lines, from read_header()
+
+    Returns
+    -------
+    key: string
+        "file type:DLD signature:table name:Internal Table CRC"; TOB1 & TOB2
+        files have no table CRC, so the Field Data Types line is used
+        instead.
+    """
+    if header[0][0] == "TOB1":
+        crc = zlib.crc32(",".join(header[4]).encode("ascii"))
+        return ":".join([header[0][0], header[0][6], header[0][7], str(crc)])
+    if header[0][0] == "TOB2":
+        crc = zlib.crc32(",".join(header[5]).encode("ascii"))
+        return ":".join([header[0][0], header[0][6], header[1][0], str(crc)])
+    return ":".join(
+        [header[0][0], header[0][6], header[1][0], header[1][8].strip()]
+    )
+
+
+def compile_schema(header):
+    """
+    Compile everything needed to decode records, from a file's header.
+
+    Parameters
+    ----------
+    header: list of lists of strings
+        the file's header lines, from read_header()
+
+    Returns
+    -------
+    schema: dictionary
+        header: copy of the header lines it was compiled from
+        file_type: "TOB1", "TOB2" or "TOB3"
+        names: field names
+        dtl: Data Type List; "ASCII" instead of "ASCII(#)"
+        bl: Byte Length of each value in a record
+        trs: Table Record Size; number of Bytes per record
+        formatters: format string of each value, from data_type_dict
+        rfs: Record Format String; the string to use with .format()
+        structs: struct.Struct of each value, from data_type_dict
+        rec_dtype: numpy structured dtype of a record, from record_dtype()
+      TOB2 & TOB3 only:
+        fs: data Frame Size
+        tbl: Intended Table Size
+        fhs, ffs: frame header & footer size
+        interval: non-timestamped record interval, in seconds
+        interval_ns: the same, in integer nanoseconds
+        ts_resolution: multiplier of the frame header's sub-seconds
+      TOB1 only:
+        timestamp: record starts with SECONDS & NANOSECONDS
+
+    Notes
+    -----
+    Values which change from file to file, such as the Validation Stamp,
+        are not part of the schema.
+    """
+    file_type = header[0][0]
+    if file_type == "TOB1":
+        names, field_types = header[1], header[4]
+    else:
+        names, field_types = header[2], header[5]
+    # remove trailing spaces from last data type definition from header,
+    # which may be padded with spaces, so that the table header ends as
+    # a sector boundary.
+    dtypes = [ss.replace(" ", "") for ss in field_types]
+    dtl = [xx.split("(")[0] for xx in dtypes]
+    bl = [
+        int(xx.split("(")[1][:-1])
+        if ("ASCII" in xx)
+        else data_type_dict[xx]["size"]
+        for xx in dtypes
+    ]
+    formatters = [data_type_dict[xx]["refmt"] for xx in dtl]
+    schema = {
+        "header": [list(hh) for hh in header],
+        "file_type": file_type,
+        "names": list(names),
+        "dtl": dtl,
+        "bl": bl,
+        "trs": sum(bl),
+        "formatters": formatters,
+        "rfs": ",".join(formatters) + "\n",
+        "structs": [
+            struct.Struct(
+                "{}s".format(size)
+                if dtype == "ASCII"
+                else data_type_dict[dtype]["fmt"]
+            )
+            for size, dtype in zip(bl, dtl)
+        ],
+        "rec_dtype": record_dtype(names, dtl, bl),
+    }
+    if file_type == "TOB1":
+        schema["timestamp"] = (
+            names[0] == "SECONDS"
+            and names[1] == "NANOSECONDS"
+            and dtypes[0] == "ULONG"
+            and dtypes[1] == "ULONG"
+        )
+        if schema["timestamp"]:
+            schema["rfs"] = '"{}",' + schema["rfs"].split(",", 2)[-1]
+    else:
+        interval_str = header[1][1].split(" ")
+        schema.update(
+            {
+                "fs": int(header[1][2]),
+                "tbl": int(header[1][3]),
+                "fhs": FILE_TYPE_DICT[file_type]["fhs"],
+                "ffs": FILE_TYPE_DICT[file_type]["ffs"],
+                "interval": (
+                    int(interval_str[0]) * INTERVAL_DICT[interval_str[1]]
+                ),
+                "interval_ns": (
+                    int(interval_str[0])
+                    * round(INTERVAL_DICT[interval_str[1]] * 1e9)
+                ),
+                "ts_resolution": resolution_dict[header[1][5]],
+            }
+        )
+    return schema
+
+
+# compiled schemas, keyed by schema_key(); see get_schema()
+SCHEMA_CACHE = {}
+
+
+def get_schema(header):
+    """
+    Look up the compiled schema of a file's header, compiling it only the
+    first time a logger program's table is seen.
+
+    Parameters
+    ----------
+    header: list of lists of strings
+        the file's header lines, from read_header()
+
+    Returns
+    -------
+    schema: dictionary
+        see compile_schema()
+    """
+    key = schema_key(header)
+    schema = SCHEMA_CACHE.get(key)
+    if schema is None:
+        logger = logging.getLogger(__name__)
+        logger.debug("compiling schema: %s", key)
+        schema = compile_schema(header)
+        SCHEMA_CACHE[key] = schema
+    return schema
+
+
+def project_schema(schema, columns):
+    """
+    Restrict a schema to some of its fields, so that only those are decoded.
+
+    Parameters
+    ----------
+    schema: dictionary
+        from get_schema()
+    columns: list of strings, or None
+        field names to decode; "TIMESTAMP" & "RECORD" are always decoded.
+        None keeps all fields.
+
+    Returns
+    -------
+    schema: dictionary
+        a copy, whose names, dtl, bl, formatters, structs & rec_dtype only
+        hold the selected fields, in the order of the file.  rec_dtype keeps
+        each field's offset, and an itemsize of the Table Record Size, so
+        np.frombuffer() steps over whole records, but only the selected
+        bytes of each are converted.  TOB2 & TOB3 frames are not contiguous
+        records, so gather_records() only copies the bytes of
+        record_ranges().
+    """
+    if columns is None:
+        return schema
+    unknown = set(columns) - set(schema["names"]) - {"TIMESTAMP", "RECORD"}
+    if unknown:
+        raise Exception("unknown field(s): %s" % (sorted(unknown),))
+    keep = set(columns)
+    if schema["file_type"] == "TOB1" and schema["timestamp"]:
+        # needed for TIMESTAMP
+        keep.update(["SECONDS", "NANOSECONDS"])
+    sel = [ii for ii, name in enumerate(schema["names"]) if name in keep]
+    projected = dict(schema)
+    for key in ("names", "dtl", "bl", "formatters", "structs"):
+        projected[key] = [schema[key][ii] for ii in sel]
+    fields = schema["rec_dtype"].fields
+    projected["rec_dtype"] = np.dtype(
+        {
+            "names": projected["names"],
+            "formats": [fields[name][0] for name in projected["names"]],
+            "offsets": [fields[name][1] for name in projected["names"]],
+            "itemsize": schema["rec_dtype"].itemsize,
+        }
+    )
+    return projected
+
+
+def save_schema_cache(ffn):
+    """
+    Save the schema cache to disk, as the header lines of each schema.
+
+    Parameters
+    ----------
+    ffn: string
+        full file name of the JSON cache file
+    """
+    with open(ffn + ".tmp", "w") as fh:
+        json.dump(
+            {key: schema["header"] for key, schema in SCHEMA_CACHE.items()},
+            fh,
+        )
+    os.rename(ffn + ".tmp", ffn)
+
+
+def load_schema_cache(ffn):
+    """
+    Warm the schema cache, from a file written by save_schema_cache().
+
+    Parameters
+    ----------
+    ffn: string
+        full file name of the JSON cache file
+
+    Returns
+    -------
+    integer
+        number of schemas loaded; a missing or unreadable file loads none.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        with open(ffn, "r") as fh:
+            headers = json.load(fh)
+        for key, header in headers.items():
+            SCHEMA_CACHE[key] = compile_schema(header)
+    except (OSError, ValueError, KeyError, IndexError) as exp:
+        logger.debug("schema cache not loaded: %s", exp)
+        return 0
+    return len(headers)
+
+
+def decode_TOB3_columns(ffn, columns=None):
+    """
+    Decode TOB3 (or TOB2) binary file into typed numpy columns.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+
+    Returns
+    -------
+    header: list of lists of strings
+        the file's 6 header lines
+    columns: dictionary
+        "TIMESTAMP" (numpy.datetime64), "RECORD", and each field name -->
+        numpy.ndarray, in record order.
+
+    Notes
+    -----
+    Same frame handling as decode_TOB3(), but the frames are located with
+        frame_index(), and all of their data blocks are decoded with one
+        decode_data_np() call, instead of record by record.
+    TOB2 frames only differ by their 8-Byte header, without a record
+        number; RECORD then counts from 0, at the file's first record.
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    logger.info("starting to decode TOB3 file into columns:  %s", fn)
+    with map_file(ffn) as mm:
+        header = read_header(mm, 6)
+        if header[0][0] not in ("TOB2", "TOB3"):
+            logger.critical("File (%s) is not TOB2 nor TOB3 type!", ffn)
+            email_exit()
+        schema = project_schema(get_schema(header), columns)
+        index = frame_index(mm, mm.tell(), schema, int(header[1][4]))
+        columns = decode_frames_np(mm, index, schema)
+    logger.debug("TOB3 file (%s);  rec_cnt = %s", fn, len(columns["RECORD"]))
+    return header, columns
+
+
+def decode_frames_shm(ffn, index, out_pos, shm_name, layout, columns=None):
+    """
+    Decode a range of a TOB3 file's frames into shared memory columns; a
+    decode_TOB3_parallel() worker.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    index: numpy.ndarray of FRAME_INDEX_DTYPE
+        slice of the file's frame_index()
+    out_pos: integer
+        position of the slice's first record, within the columns
+    shm_name: string
+        name of the multiprocessing.shared_memory block
+    layout: list of tuples
+        (column name, numpy dtype string, byte offset, capacity) of each
+        column within the block
+    columns: list of strings [optional]
+        only decode these fields; see project_schema()
+
+    Returns
+    -------
+    integer
+        number of records decoded
+    """
+    with map_file(ffn) as mm:
+        schema = project_schema(get_schema(read_header(mm, 6)), columns)
+        columns = decode_frames_np(mm, index, schema)
+    nrec = len(columns["RECORD"])
+    shm = multiprocessing.shared_memory.SharedMemory(name=shm_name)
+    try:
+        for name, dtype, offset, capacity in layout:
+            out = np.ndarray(capacity, dtype, buffer=shm.buf, offset=offset)
+            out[out_pos : out_pos + nrec] = columns[name]
+            del out
+    finally:
+        shm.close()
+    return nrec
+
+
+def decode_TOB3_parallel(ffn, workers, columns=None):
+    """
+    Decode TOB3 binary file into typed numpy columns, with its frames split
+    over a pool of worker processes.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    workers: integer
+        number of worker processes
+    columns: list of strings [optional]
+        only decode these fields; see project_schema()
+
+    Returns
+    -------
+    header, columns
+        the same as decode_TOB3_columns()
+
+    Notes
+    -----
+    The frame index is built here, and split into one contiguous range of
+        frames per worker, of about equal record counts.  Each worker decodes
+        its range with decode_frames_shm(), into columns preallocated in one
+        multiprocessing.shared_memory block, sized for the Intended Table
+        Size (or the indexed record count, if larger).  The ranges' record
+        positions come from the index, so the columns are in record order
+        once all workers are done.
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    logger.info(
+        "starting to decode TOB3 file with %s workers:  %s", workers, fn
+    )
+    with map_file(ffn) as mm:
+        header = read_header(mm, 6)
+        if header[0][0] not in ("TOB2", "TOB3"):
+            logger.critical("File (%s) is not TOB2 nor TOB3 type!", ffn)
+            email_exit()
+        schema = project_schema(get_schema(header), columns)
+        index = frame_index(mm, mm.tell(), schema, int(header[1][4]))
+        # dtypes of the decoded columns, from zero frames
+        dtypes = {
+            name: column.dtype
+            for name, column in decode_frames_np(mm, index[:0], schema).items()
+        }
+    cum = np.cumsum(index["nrec"], dtype=np.int64)
+    total = int(cum[-1]) if len(cum) else 0
+    capacity = max(schema["tbl"], total)
+    layout, size = [], 0
+    for name, dtype in dtypes.items():
+        layout.append((name, dtype.str, size, capacity))
+        # keep each column 64-Byte aligned
+        size += -(-capacity * dtype.itemsize // 64) * 64
+    bounds = np.searchsorted(cum, np.arange(1, workers) * total // workers)
+    bounds = np.unique(bounds[(bounds > 0) & (bounds < len(index))])
+    shm = multiprocessing.shared_memory.SharedMemory(
+        create=True, size=max(size, 1)
+    )
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(
+                    decode_frames_shm,
+                    ffn,
+                    chunk,
+                    int(cum[start - 1]) if start else 0,
+                    shm.name,
+                    layout,
+                    columns,
+                )
+                for start, chunk in zip(
+                    np.concatenate([[0], bounds]), np.split(index, bounds)
+                )
+            ]
+            rec_cnt = sum(future.result() for future in futures)
+        columns = {
+            name: np.ndarray(capacity, dtype, buffer=shm.buf, offset=offset)[
+                :total
+            ].copy()
+            for name, dtype, offset, capacity in layout
+        }
+    finally:
+        shm.close()
+        shm.unlink()
+    logger.debug("TOB3 file (%s);  rec_cnt = %s", fn, rec_cnt)
+    return header, columns
+
+
+def decode_frames_np(buf, index, schema):
+    """
+    Decode indexed TOB3 frames into typed numpy columns.
+
+    Parameters
+    ----------
+    buf: bytes-like
+        the whole file, e.g. from map_file()
+    index: numpy.ndarray of FRAME_INDEX_DTYPE
+        from frame_index(), or any slice of it
+    schema: dictionary
+        from get_schema()
+
+    Returns
+    -------
+    columns: dictionary
+        "TIMESTAMP" (numpy.datetime64), "RECORD", and each field name -->
+        numpy.ndarray, in record order.
+    """
+    data = gather_records(buf, index, schema)
+    columns = {}
+    columns["TIMESTAMP"], columns["RECORD"] = record_timestamps(
+        index["ts"], index["rec"], index["nrec"], schema["interval_ns"]
+    )
+    _, packed = record_ranges(schema)
+    columns.update(decode_data_np(data, packed, schema["dtl"]))
+    return columns
+
+
+def decode_records_TOB1(buf, pos, count, schema):
+    """
+    Decode consecutive TOB1 records into typed numpy columns.
+
+    Parameters
+    ----------
+    buf: bytes-like
+        the whole file, e.g. from map_file()
+    pos: integer
+        offset of the first record
+    count: integer
+        number of records
+    schema: dictionary
+        from get_schema()
+
+    Returns
+    -------
+    columns: dictionary
+        each field name --> numpy.ndarray; when the records start with
+        SECONDS & NANOSECONDS, those are replaced by "TIMESTAMP"
+        (numpy.datetime64[ns]).
+    """
+    # a zero-copy window, viewed as structured records by decode_data_np()
+    data = memoryview(buf)[pos : pos + count * schema["trs"]]
+    fields = decode_data_np(data, schema["rec_dtype"], schema["dtl"])
+    data.release()
+    if not schema["timestamp"]:
+        return fields
+    seconds = fields.pop("SECONDS").astype(np.int64)
+    nanoseconds = fields.pop("NANOSECONDS").astype(np.int64)
+    columns = {
+        "TIMESTAMP": CSI_EPOCH64
+        + (seconds * 1000000000 + nanoseconds).astype("timedelta64[ns]")
+    }
+    columns.update(fields)
+    return columns
+
+
+def decode_TOB1_columns(ffn, columns=None):
+    """
+    Decode TOB1 binary file into typed numpy columns.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+
+    Returns
+    -------
+    header: list of lists of strings
+        the file's 5 header lines
+    columns: dictionary
+        "TIMESTAMP" (numpy.datetime64[ns]), when the records start with
+        SECONDS & NANOSECONDS, and each other field name --> numpy.ndarray.
+
+    Notes
+    -----
+    The counterpart of decode_TOB1(): the whole body after the header is
+        viewed as one array of structured records, and the SECONDS &
+        NANOSECONDS pair become TIMESTAMP in one operation, by
+        decode_records_TOB1().  A trailing partial record is ignored, as
+        by decode_TOB1().
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    logger.info("starting to decode TOB1 file into columns:  %s", fn)
+    with map_file(ffn) as mm:
+        header = read_header(mm, 5)
+        if header[0][0] != "TOB1":
+            logger.critical("File (%s) is not TOB1 type!", ffn)
+            email_exit()
+        schema = project_schema(get_schema(header), columns)
+        pos = mm.tell()
+        count = (len(mm) - pos) // schema["trs"]
+        columns = decode_records_TOB1(mm, pos, count, schema)
+    logger.debug("TOB1 file (%s); rec_cnt = %s", fn, count)
+    return header, columns
+
+
+def read_file_header(ffn):
+    """
+    Read the ASCII header lines of a TOB1, TOB2 or TOB3 file.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+
+    Returns
+    -------
+    header: list of lists of strings
+        5 lines for TOB1, else 6 lines.
+    """
+    with open(ffn, "rb") as rf:
+        nlines = 5 if rf.read(6) == b'"TOB1"' else 6
+        rf.seek(0)
+        return read_header(rf, nlines)
+
+
+def iter_batches(ffn, batch_size=None, columns=None, start=None, end=None):
+    """
+    Decode a TOB1, TOB2 or TOB3 binary file, as a stream of typed column
+    batches.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    batch_size: integer, optional
+        maximum number of records per batch; frames are never split, so a
+        single frame holding more records is yielded whole.  Default is
+        BATCH_SIZE.
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+    start, end: datetime.datetime, numpy.datetime64 or string [optional]
+        only the records with start <= TIMESTAMP < end, selected as in
+        extract_window().  Default is all records.
+
+    Yields
+    ------
+    columns: dictionary
+        "TIMESTAMP" (numpy.datetime64[ns]), "RECORD", and each field name
+        --> numpy.ndarray, in record order; see decode_frames_np() and
+        decode_records_TOB1().
+
+    Notes
+    -----
+    The file is memory-mapped, and only the frame index (TOB3) plus one
+        batch are held in memory.  Minor frames are put into record order
+        by frame_index().  Use read_file_header() for the header lines.
+    Batches are not one per Major frame, since a frame may hold as little
+        as one record (e.g. the sonic tables).
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    logger.info("starting to decode into batches:  %s", fn)
+    with map_file(ffn) as mm:
+        header = read_header(mm, 5 if mm[:6] == b'"TOB1"' else 6)
+        schema = project_schema(get_schema(header), columns)
+        pos = mm.tell()
+        batch_size = batch_size or BATCH_SIZE
+        window = start is not None
+        if window:
+            start, end = to_datetime64(start), to_datetime64(end)
+        if schema["file_type"] == "TOB1":
+            trs = schema["trs"]
+            first, last = 0, (len(mm) - pos) // trs
+            if window:
+                if not schema["timestamp"]:
+                    raise Exception("%s has no timestamps" % (ffn,))
+                first, last = (
+                    first_record_TOB1(mm, pos, trs, last, when)
+                    for when in (start, end)
+                )
+            for rec0 in range(first, last, batch_size):
+                count = min(batch_size, last - rec0)
+                yield decode_records_TOB1(mm, pos + rec0 * trs, count, schema)
+            return
+        if schema["file_type"] not in ("TOB2", "TOB3"):
+            logger.critical("File (%s) is not a TOB file type!", ffn)
+            email_exit()
+        if window:
+            index = load_frame_index(ffn, mm, pos, schema, int(header[1][4]))
+            frame_end = index["ts"] + (
+                index["nrec"].astype(np.int64) * schema["interval_ns"]
+            ).astype("timedelta64[ns]")
+            index = index[(index["ts"] < end) & (frame_end > start)]
+        else:
+            index = frame_index(mm, pos, schema, int(header[1][4]))
+        cum = np.cumsum(index["nrec"], dtype=np.int64)
+        bounds, done = [], 0
+        while True:
+            ii = int(np.searchsorted(cum, done + batch_size, "right"))
+            if ii >= len(index):
+                break
+            ii = max(ii, (bounds[-1] if bounds else 0) + 1)
+            if ii >= len(index):
+                break
+            bounds.append(ii)
+            done = int(cum[ii - 1])
+        for batch in np.split(index, bounds):
+            if not len(batch):
+                continue
+            decoded = decode_frames_np(mm, batch, schema)
+            if window:
+                within = (decoded["TIMESTAMP"] >= start) & (
+                    decoded["TIMESTAMP"] < end
+                )
+                decoded = {
+                    name: value[within] for name, value in decoded.items()
+                }
+            yield decoded
+
+
+def decode_TOB1(ffn, toa5_file):
+    """
+    Decode TOB1 binary file to TOA5 formatted ASCII
+    (the standard CSI file type).
+
+    Parameters
+    ----------
+    ffn : string
+             full file name, including path and extention.
+    toa5_file: string
+        full file name of output file.
+
+    Returns
+    -------
+    none
+        this just writes a new file.
+
+    Notes
+    -----
+    TOB1 files are written from top to bottom, without frames; each row is
+        self containted.  This function calls many other supporting functions.
+    This function was written as the main(), but has since been incorporated as
+        a function of its own.
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    logger.info("starting to decode TOB1 file %s", fn)
+    rec_cnt = 0
+    with open(ffn, "rb") as rf:
+        # read the 5 header lines into variable and then parse it.
+        header = read_header(rf, 5)
+        # extract header information, compiled once per logger program
+        #  bl := Byte Length; list of bytes length per measurment for each
+        #        record.
+        # dtl := Data Type List; datatypes, but with "ASCII" instead of
+        #        "ASCII(?+)", necessicary for dictionary lookup
+        # rfs := Record Format String; the string to use with .format(),
+        #        for each record; when the record's first value is
+        #        TIMESTAMP, it already has the SECONDS & NANOSECONDS merged
+        # trs := Table Record Size; number of Bytes per record
+        schema = get_schema(header)
+        dtl, bl, rfs, trs = (schema[xx] for xx in ("dtl", "bl", "rfs", "trs"))
+        TIMESTAMP = schema["timestamp"]
+        if TIMESTAMP:
+            logger.debug("file has 'TIMESTAMP'")
+        # write to output file
+        # format output file's header
+        ho = toa5_header(header, fn)
+        # write output
+        with open(toa5_file, "w") as outfile:
+            for hh in ho:
+                outfile.write('"' + '","'.join(hh) + '"\n')
+            logger.debug("header written")
+            # -----------------------------------
+            # increment though file one record at a time, write each to file
+            rec = rf.read(trs)
+            while len(rec) == trs:
+                values = decode_data_bin(rec, dtl, bl)
+                if TIMESTAMP:
+                    # remove the first two ULONG values from list, and
+                    # convert to timestamp
+                    ts_list = values[:2]
+                    values = values[2:]
+                    ts = CSI_EPOCH + datetime.timedelta(
+                        0, ts_list[0], ts_list[1] / 1000
+                    )
+                    values.insert(0, ts_formatter(ts))
+                values = ['"NAN"' if xx == "nan" else xx for xx in values]
+                outfile.write(rfs.format(*values))
+                rec = rf.read(trs)
+                rec_cnt += 1
+    logger.debug("TOB1 file (%s); rec_cnt = %s", fn, rec_cnt)
+    return rec_cnt
+
+
+def decode_columns(ffn, columns=None, workers=1):
+    """
+    Decode a TOB1, TOB2 or TOB3 binary file into typed numpy columns.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+    workers: integer [optional]
+        number of processes decoding a TOB2 or TOB3 file, with
+        decode_TOB3_parallel()
+
+    Returns
+    -------
+    header, columns
+        from decode_TOB1_columns(), decode_TOB3_columns() or
+        decode_TOB3_parallel(), by the file's type.
+    """
+    with open(ffn, "rb") as rf:
+        file_type = rf.read(6)
+    if file_type == b'"TOB1"':
+        return decode_TOB1_columns(ffn, columns)
+    if workers > 1:
+        return decode_TOB3_parallel(ffn, workers, columns)
+    return decode_TOB3_columns(ffn, columns)
+
+
+# tail_ingest()'s checkpoint of each growing file, by file name; see
+# decode_tail()
+TAIL_CHECKPOINTS = {}
+
+
+def decode_tail(ffn, checkpoint=None, columns=None):
+    """
+    Decode the records of a growing TOB1, TOB2 or TOB3 file, which were
+    appended since a checkpoint.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    checkpoint: dictionary [optional]
+        from a previous call, for the same file; None decodes from the
+        first frame.
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+
+    Returns
+    -------
+    header: list of lists of strings
+    columns: dictionary
+        as from decode_columns(), for the new records only
+    checkpoint: dictionary
+        header: crc32 of the header lines, which identifies the file
+        offset: file offset of the first frame (or record) not decoded yet
+        rec: RECORD of the last record decoded, -1 before any
+
+    Notes
+    -----
+    Only whole frames (or records) are decoded; a partly written one, at
+        the end of the file, is left for the next call.  The next call starts
+        after the last valid frame, so the invalid frames following it, e.g.
+        those not written yet, are read again.  TOB3 frames whose records do
+        not follow the checkpoint's RECORD, e.g. left from the ring's
+        previous pass, are skipped.  A checkpoint of another header, or
+        beyond the end of the file, starts over.
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    with map_file(ffn) as mm:
+        header = read_header(mm, 5 if mm[:6] == b'"TOB1"' else 6)
+        schema = project_schema(get_schema(header), columns)
+        pos = mm.tell()
+        signature = zlib.crc32(
+            "\n".join(",".join(hh) for hh in header).encode("ascii")
+        )
+        if (
+            checkpoint is None
+            or checkpoint["header"] != signature
+            or checkpoint["offset"] > len(mm)
+        ):
+            checkpoint = {"header": signature, "offset": pos, "rec": -1}
+        start, rec = checkpoint["offset"], checkpoint["rec"]
+        if schema["file_type"] == "TOB1":
+            count = (len(mm) - start) // schema["trs"]
+            columns = decode_records_TOB1(mm, start, count, schema)
+            offset = start + count * schema["trs"]
+            if count and "RECORD" in columns:
+                rec = int(columns["RECORD"][-1])
+        else:
+            index = frame_index(mm, start, schema, int(header[1][4]))
+            if schema["fhs"] == 8:
+                # TOB2 records are counted from the checkpoint
+                index["rec"] += rec + 1
+            index = index[index["rec"] > rec]
+            columns = decode_frames_np(mm, index, schema)
+            offset = start
+            if len(index):
+                fs = schema["fs"]
+                offset += ((int(index["offset"][-1]) - start) // fs + 1) * fs
+                rec = int(index["rec"][-1]) + int(index["nrec"][-1]) - 1
+    logger.debug(
+        "tail of %s;  offset: %s --> %s;  RECORD: %s",
+        fn,
+        start,
+        offset,
+        rec,
+    )
+    return header, columns, {"header": signature, "offset": offset, "rec": rec}
+
+
+def save_tail_checkpoints(ffn):
+    """
+    Save tail_ingest()'s checkpoints to disk.
+
+    Parameters
+    ----------
+    ffn: string
+        full file name of the JSON checkpoint file
+    """
+    with open(ffn + ".tmp", "w") as fh:
+        json.dump(TAIL_CHECKPOINTS, fh)
+    os.rename(ffn + ".tmp", ffn)
+
+
+def load_tail_checkpoints(ffn):
+    """
+    Load tail_ingest()'s checkpoints, from a file written by
+    save_tail_checkpoints().
+
+    Parameters
+    ----------
+    ffn: string
+        full file name of the JSON checkpoint file
+
+    Returns
+    -------
+    integer
+        number of checkpoints loaded; a missing or unreadable file loads none.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        with open(ffn, "r") as fh:
+            checkpoints = json.load(fh)
+    except (OSError, ValueError) as exp:
+        logger.debug("tail checkpoints not loaded: %s", exp)
+        return 0
+    TAIL_CHECKPOINTS.update(checkpoints)
+    return len(checkpoints)
+
+
+# the newest TIMESTAMP & RECORD COPYed, by logger & table; see decode_new()
+HIGH_WATER = {}
+
+# bin2pg_file()'s result for a file without records above the mark
+HIGH_WATER_SKIPPED = "No records above the high-water mark."
+
+
+def high_water_key(header):
+    """
+    Identify the logger & table of a file, for its high-water mark.
+
+    Parameters
+    ----------
+    header: list of lists of strings
+        the file's header lines, from read_header()
+
+    Returns
+    -------
+    key: string
+        "station name:table name"; unlike schema_key(), it is kept when the
+        logger's program changes.
+    """
+    table = header[0][7] if header[0][0] == "TOB1" else header[1][0]
+    return ":".join([header[0][1], table])
+
+
+def raise_high_water(key, mark):
+    """
+    Raise a logger & table's high-water mark; it never goes down.
+
+    Parameters
+    ----------
+    key: string
+        from high_water_key()
+    mark: dictionary
+        from decode_new()
+    """
+    old = HIGH_WATER.get(key)
+    if old is not None:
+        mark = {
+            "ts": str(
+                max(np.datetime64(old["ts"]), np.datetime64(mark["ts"]))
+            ),
+            "rec": max(old["rec"], mark["rec"]),
+        }
+    HIGH_WATER[key] = mark
+
+
+def decode_new(ffn, mark=None, columns=None):
+    """
+    Decode the records of a TOB1, TOB2 or TOB3 file, which are above the
+    high-water mark of its logger & table.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    mark: dictionary [optional]
+        the high-water mark, e.g. HIGH_WATER[high_water_key(header)]; None
+        decodes the whole file.
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+
+    Returns
+    -------
+    header: list of lists of strings
+    columns: dictionary
+        as from decode_columns(), for the new records only
+    mark: dictionary
+        ts: newest TIMESTAMP, as an ISO 8601 string
+        rec: highest RECORD, -1 before any
+        the mark raised by the new records, for raise_high_water() once they
+        are COPYed.
+
+    Notes
+    -----
+    A record is new if its TIMESTAMP or its RECORD is above the mark, so the
+        records following a restarted RECORD count (e.g. a new program), or
+        a clock set back, are still kept.  A logger re-sending its ring,
+        after a card swap or a missed upload, repeats the old records with
+        their own TIMESTAMPs & RECORDs; the header's Ring Record Number &
+        Card Removal Time are not needed.
+    TOB2 & TOB3 frames entirely below the mark are dropped from frame_index()
+        before anything is decoded; only a frame straddling the mark is
+        filtered record by record.  TOB2 frames have no RECORD, and TOB1
+        records are found by a binary search of their timestamps, so only
+        their TIMESTAMP is compared; as for a mark without a RECORD.
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    if mark is None:
+        mark = {"ts": str(CSI_EPOCH64), "rec": -1}
+    mark_ts, mark_rec = np.datetime64(mark["ts"], "ns"), mark["rec"]
+    with map_file(ffn) as mm:
+        header = read_header(mm, 5 if mm[:6] == b'"TOB1"' else 6)
+        schema = project_schema(get_schema(header), columns)
+        pos = mm.tell()
+        if schema["file_type"] == "TOB1":
+            trs = schema["trs"]
+            nrec = (len(mm) - pos) // trs
+            first = 0
+            if schema["timestamp"]:
+                first = first_record_TOB1(
+                    mm, pos, trs, nrec, mark_ts + np.timedelta64(1, "ns")
+                )
+            columns = decode_records_TOB1(
+                mm, pos + first * trs, nrec - first, schema
+            )
+            logger.debug("%s: %s of %s records skipped", fn, first, nrec)
+        else:
+            index = frame_index(mm, pos, schema, int(header[1][4]))
+            last = index["nrec"].astype(np.int64) - 1
+            new = (
+                index["ts"]
+                + (last * schema["interval_ns"]).astype("timedelta64[ns]")
+                > mark_ts
+            )
+            if schema["fhs"] == 12 and mark_rec >= 0:
+                new |= index["rec"] + last > mark_rec
+            columns = decode_frames_np(mm, index[new], schema)
+            logger.debug(
+                "%s: %s of %s frames skipped",
+                fn,
+                len(index) - np.count_nonzero(new),
+                len(index),
+            )
+    if "TIMESTAMP" not in columns:
+        # TOB1 records without timestamps cannot be compared
+        return header, columns, mark
+    if len(columns["TIMESTAMP"]):
+        if (
+            schema["file_type"] == "TOB3"
+            and "RECORD" in columns
+            and mark_rec >= 0
+        ):
+            new = (columns["TIMESTAMP"] > mark_ts) | (
+                columns["RECORD"] > mark_rec
+            )
+        else:
+            new = columns["TIMESTAMP"] > mark_ts
+        if not new.all():
+            columns = {name: value[new] for name, value in columns.items()}
+    if len(columns["TIMESTAMP"]):
+        mark_ts = max(mark_ts, columns["TIMESTAMP"].max())
+        if schema["file_type"] != "TOB2" and "RECORD" in columns:
+            mark_rec = max(mark_rec, int(columns["RECORD"].max()))
+    return header, columns, {"ts": str(mark_ts), "rec": mark_rec}
+
+
+def save_high_water(ffn):
+    """
+    Save the high-water marks to disk.
+
+    Parameters
+    ----------
+    ffn: string
+        full file name of the JSON file
+    """
+    with open(ffn + ".tmp", "w") as fh:
+        json.dump(HIGH_WATER, fh, indent=1, sort_keys=True)
+    os.rename(ffn + ".tmp", ffn)
+
+
+def load_high_water(ffn):
+    """
+    Load the high-water marks, from a file written by save_high_water().
+
+    Parameters
+    ----------
+    ffn: string
+        full file name of the JSON file
+
+    Returns
+    -------
+    integer
+        number of marks loaded; a missing or unreadable file loads none.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        with open(ffn, "r") as fh:
+            marks = json.load(fh)
+    except (OSError, ValueError) as exp:
+        logger.debug("high-water marks not loaded: %s", exp)
+        return 0
+    for key, mark in marks.items():
+        raise_high_water(key, mark)
+    return len(marks)
+
+
+# file name suffix of a .bdat file's sidecar frame index, and its
+# fields stored as differences
+FRAME_INDEX_SUFFIX = ".idx"
+FRAME_INDEX_DELTAS = ("offset", "ts", "rec")
+
+
+def save_frame_index(ffn):
+    """
+    Write the sidecar frame index of a TOB2 or TOB3 file, next to it.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+
+    Returns
+    -------
+    idx_ffn: string
+        full file name of the sidecar, ffn + FRAME_INDEX_SUFFIX
+
+    Notes
+    -----
+    The sidecar is a compressed .npz of the frame_index() entries, i.e.
+        byte offset, flags, record count, and first TIMESTAMP & RECORD of
+        each frame, plus the size of the file it indexes.  Offsets,
+        TIMESTAMPs & RECORDs are stored as differences from the previous
+        frame, which are nearly constant, so the sidecar is a few kB.
+    """
+    with map_file(ffn) as mm:
+        header = read_header(mm, 6)
+        index = frame_index(
+            mm, mm.tell(), get_schema(header), int(header[1][4])
+        )
+        size = len(mm)
+    idx_ffn = ffn + FRAME_INDEX_SUFFIX
+    deltas = {
+        name: np.diff(index[name].view(np.int64), prepend=0)
+        for name in FRAME_INDEX_DELTAS
+    }
+    with open(idx_ffn + ".tmp", "wb") as fh:
+        np.savez_compressed(
+            fh,
+            flags=index["flags"],
+            nrec=index["nrec"],
+            size=np.int64(size),
+            **deltas,
+        )
+    os.rename(idx_ffn + ".tmp", idx_ffn)
+    return idx_ffn
+
+
+def load_frame_index(ffn, buf, pos, schema, validation_int):
+    """
+    The frame index of a TOB2 or TOB3 file, from its sidecar if it has one.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    buf: bytes-like
+        the whole file, e.g. from map_file()
+    pos: integer
+        offset of the first Major frame, i.e. the end of the ASCII header
+    schema: dictionary
+        from get_schema()
+    validation_int: integer
+        the validation code from header[1][4]
+
+    Returns
+    -------
+    index: numpy.ndarray of FRAME_INDEX_DTYPE
+        see frame_index(); it is rebuilt from the file when the sidecar is
+        missing, unreadable, or was written for a different file size.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        with np.load(ffn + FRAME_INDEX_SUFFIX) as sidecar:
+            if int(sidecar["size"]) == len(buf):
+                index = np.empty(len(sidecar["nrec"]), FRAME_INDEX_DTYPE)
+                index["flags"] = sidecar["flags"]
+                index["nrec"] = sidecar["nrec"]
+                for name in FRAME_INDEX_DELTAS:
+                    index[name] = np.cumsum(sidecar[name]).view(
+                        index[name].dtype
+                    )
+                return index
+        logger.debug("sidecar frame index of %s is stale", ffn)
+    except (OSError, ValueError, KeyError) as exp:
+        logger.debug("sidecar frame index not loaded: %s", exp)
+    return frame_index(buf, pos, schema, validation_int)
+
+
+def to_datetime64(value):
+    """
+    Convert a timestamp into numpy.datetime64[ns], in UTC.
+
+    Parameters
+    ----------
+    value: datetime.datetime, numpy.datetime64 or string
+        timezone-aware datetimes are converted to UTC; others are assumed
+        to be UTC already, like the datalogger clocks.
+    """
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.astimezone(pytz.utc).replace(tzinfo=None)
+    return np.datetime64(value, "ns")
+
+
+def first_record_TOB1(buf, pos, trs, nrec, when):
+    """
+    Binary search of TOB1 records, by their leading SECONDS & NANOSECONDS.
+
+    Parameters
+    ----------
+    buf: bytes-like
+        the whole file, e.g. from map_file()
+    pos: integer
+        offset of the first record
+    trs: integer
+        Table Record Size
+    nrec: integer
+        number of records
+    when: numpy.datetime64[ns]
+
+    Returns
+    -------
+    integer
+        index of the first record at or after when; nrec if there is none.
+    """
+    when_ns = int((when - CSI_EPOCH64) // np.timedelta64(1, "ns"))
+    lo, hi = 0, nrec
+    while lo < hi:
+        mid = (lo + hi) // 2
+        seconds, nanoseconds = struct.unpack_from("<2L", buf, pos + mid * trs)
+        if seconds * 1000000000 + nanoseconds < when_ns:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def extract_window(ffn, start, end, columns=None):
+    """
+    Decode only the records of a time window, from a TOB1, TOB2 or TOB3
+    file.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    start, end: datetime.datetime, numpy.datetime64 or string
+        window of TIMESTAMPs, start <= TIMESTAMP < end; see to_datetime64()
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+
+    Returns
+    -------
+    header: list of lists of strings
+        the file's header lines
+    columns: dictionary
+        the same as decode_TOB3_columns() or decode_TOB1_columns(), for the
+        records within the window only.
+
+    Notes
+    -----
+    TOB2 & TOB3 frames are selected with the sidecar frame index, from
+        save_frame_index(), by their first TIMESTAMP & record count; only
+        those frames are read from the memory-mapped file and decoded.
+        TOB1 records have a fixed size, so the window is found with a
+        binary search over the records' SECONDS & NANOSECONDS.
+    """
+    start, end = to_datetime64(start), to_datetime64(end)
+    with map_file(ffn) as mm:
+        header = read_header(mm, 5 if mm[:6] == b'"TOB1"' else 6)
+        schema = project_schema(get_schema(header), columns)
+        if schema["file_type"] == "TOB1":
+            pos, trs = mm.tell(), schema["trs"]
+            nrec = (len(mm) - pos) // trs
+            if not schema["timestamp"]:
+                raise Exception("%s has no timestamps" % (ffn,))
+            first = first_record_TOB1(mm, pos, trs, nrec, start)
+            last = first_record_TOB1(mm, pos, trs, nrec, end)
+            return header, decode_records_TOB1(
+                mm, pos + first * trs, max(last - first, 0), schema
+            )
+        index = load_frame_index(ffn, mm, mm.tell(), schema, int(header[1][4]))
+        frame_end = index["ts"] + (
+            index["nrec"].astype(np.int64) * schema["interval_ns"]
+        ).astype("timedelta64[ns]")
+        selected = decode_frames_np(
+            mm, index[(index["ts"] < end) & (frame_end > start)], schema
+        )
+    within = (selected["TIMESTAMP"] >= start) & (selected["TIMESTAMP"] < end)
+    return header, {name: value[within] for name, value in selected.items()}
+
+
+# consumed file name; decode_filename()'s valid time, then the FTP name
+ARCHIVE_FN_RE = re.compile(r"^(\d{12})_(ham|sto)([SAM])[0-9a-z-_]{5}\.bdat$")
+# the valid time of a file name is its last record's, in whole minutes
+ARCHIVE_NAME_RESOLUTION = datetime.timedelta(minutes=1)
+# the longest a file's first record may precede its valid time, e.g. the
+# backlog uploaded after an outage; archive_files() looks no further ahead
+ARCHIVE_MAX_DELAY = datetime.timedelta(
+    days=CONFIG.get("archive_max_delay_days", 7)
+)
+
+# first & last TIMESTAMP of consumed files, by full file name & size; see
+# archive_span()
+ARCHIVE_SPANS = {}
+
+
+def archive_span(ffn):
+    """
+    The first & last TIMESTAMP of a file's records.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+
+    Returns
+    -------
+    (numpy.datetime64, numpy.datetime64) or None
+        None for a file without records, or a TOB1 file without timestamps
+
+    Notes
+    -----
+    TOB2 & TOB3 files are read from their sidecar frame index, see
+        load_frame_index(); TOB1 files from their first & last record.
+        Spans are cached in ARCHIVE_SPANS, so a query only reads each file
+        once per process.
+    """
+    key = (ffn, os.path.getsize(ffn))
+    if key in ARCHIVE_SPANS:
+        return ARCHIVE_SPANS[key]
+    span = None
+    with map_file(ffn) as mm:
+        header = read_header(mm, 5 if mm[:6] == b'"TOB1"' else 6)
+        schema = get_schema(header)
+        pos = mm.tell()
+        if schema["file_type"] == "TOB1":
+            trs = schema["trs"]
+            nrec = (len(mm) - pos) // trs
+            if nrec and schema["timestamp"]:
+                ends = [
+                    struct.unpack_from("<2L", mm, pos + ii * trs)
+                    for ii in (0, nrec - 1)
+                ]
+                ends = [
+                    CSI_EPOCH64 + np.timedelta64(sec * 1000000000 + ns, "ns")
+                    for sec, ns in ends
+                ]
+                span = (min(ends), max(ends))
+        else:
+            index = load_frame_index(ffn, mm, pos, schema, int(header[1][4]))
+            if len(index):
+                last = index["ts"] + (
+                    (index["nrec"].astype(np.int64) - 1)
+                    * schema["interval_ns"]
+                ).astype("timedelta64[ns]")
+                span = (index["ts"].min(), last.max())
+    ARCHIVE_SPANS[key] = span
+    return span
+
+
+def archive_files(consumed_dir, site, table, start, end):
+    """
+    Find the consumed .bdat files, which hold records of a time range.
+
+    Parameters
+    ----------
+    consumed_dir: string
+        root of the consumed/YYYY/MM/DD tree
+    site: string
+        "ham" or "sto"
+    table: string
+        "sonic", "analog" or "monitor"
+    start, end: numpy.datetime64
+        time range of the records
+
+    Returns
+    -------
+    list of strings
+        full file names, in order of their valid time
+
+    Notes
+    -----
+    bin2pg() prefixes consumed files with the valid time from
+        decode_filename(), i.e. "YYYYmmddHHMM_".  A file's records end at its
+        valid time, but may start long before it, e.g. the backlog uploaded
+        after an outage; so every file valid from start to ARCHIVE_MAX_DELAY
+        after end is a candidate, and is returned when its archive_span()
+        overlaps the range.
+    """
+    first = start.astype("datetime64[us]").item() - ARCHIVE_NAME_RESOLUTION
+    last = end.astype("datetime64[us]").item() + ARCHIVE_MAX_DELAY
+    found = []
+    pattern = os.path.join(consumed_dir, "[0-9]" * 4, "[0-9]" * 2, "[0-9]" * 2)
+    for daydir in sorted(glob.glob(pattern)):
+        day = datetime.datetime.strptime(
+            os.path.relpath(daydir, consumed_dir),
+            os.path.join("%Y", "%m", "%d"),
+        )
+        if day + datetime.timedelta(days=1) <= first:
+            continue
+        if day > last:
+            break
+        for fn in os.listdir(daydir):
+            match = ARCHIVE_FN_RE.match(fn)
+            if (
+                match is None
+                or match.group(2) != site
+                or table_code[match.group(3)] != table
+            ):
+                continue
+            valid = datetime.datetime.strptime(match.group(1), "%Y%m%d%H%M")
+            if valid < first or valid > last:
+                continue
+            ffn = os.path.join(daydir, fn)
+            span = archive_span(ffn)
+            if span is not None and span[0] < end and span[1] >= start:
+                found.append((valid, ffn))
+    return [ffn for _, ffn in sorted(found)]
+
+
+def query_archive(
+    site, table, start, end, columns=None, consumed_dir=None, workers=1
+):
+    """
+    Read a time range of records straight from the consumed .bdat archive.
+
+    Parameters
+    ----------
+    site: string
+        "ham" or "sto"
+    table: string
+        "sonic", "analog" or "monitor"
+    start, end: datetime.datetime, numpy.datetime64 or string
+        start <= TIMESTAMP < end; see to_datetime64()
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+    consumed_dir: string [optional]
+        root of the consumed/YYYY/MM/DD tree; default is dataroot/consumed
+    workers: integer [optional]
+        number of processes decoding files at once
+
+    Returns
+    -------
+    columns: dictionary
+        "TIMESTAMP", "RECORD" and field name --> numpy.ndarray, sorted by
+        TIMESTAMP, and with one record per TIMESTAMP.
+
+    Notes
+    -----
+    Each file found by archive_files() is decoded with extract_window(),
+        i.e. only its frames within the range.  Records of overlapping files
+        are de-duplicated by TIMESTAMP, keeping those of the earlier file.
+        Fields missing from any of the files are left out.
+    """
+    logger = logging.getLogger(__name__)
+    if consumed_dir is None:
+        consumed_dir = os.path.join(CONFIG["dataroot"], "consumed")
+    start, end = to_datetime64(start), to_datetime64(end)
+    ffns = archive_files(consumed_dir, site, table, start, end)
+    logger.info(
+        "querying %s %s from %s to %s; %s files",
+        site,
+        table,
+        start,
+        end,
+        len(ffns),
+    )
+    args = (ffns, [start] * len(ffns), [end] * len(ffns))
+    args += ([columns] * len(ffns),)
+    if workers > 1 and len(ffns) > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(extract_window, *args))
+    else:
+        results = list(map(extract_window, *args))
+    results = [cols for _, cols in results if len(cols["TIMESTAMP"])]
+    if not results:
+        return {
+            "TIMESTAMP": np.array([], dtype="datetime64[ns]"),
+            "RECORD": np.array([], dtype=np.int64),
+        }
+    names = [
+        name for name in results[0] if all(name in cols for cols in results)
+    ]
+    merged = {
+        name: np.concatenate([cols[name] for cols in results])
+        for name in names
+    }
+    # sorted, and the first of each TIMESTAMP
+    _, first = np.unique(merged["TIMESTAMP"], return_index=True)
+    logger.debug(
+        "query records: %s; unique: %s", len(merged["RECORD"]), len(first)
+    )
+    return {name: column[first] for name, column in merged.items()}
+
+
+def window_batches(ffn, start, end, columns=None):
+    """
+    All batches of iter_batches() for a time window, as one list; the task
+        of archive_batches() for a process pool.
+    """
+    return list(iter_batches(ffn, columns=columns, start=start, end=end))
+
+
+def archive_batches(ffns, start, end, columns=None, executor=None, ahead=1):
+    """
+    Stream the records of a time range from archived files, in batches.
+
+    Parameters
+    ----------
+    ffns: list of strings
+        full file names, in order of their valid time; see archive_files()
+    start, end: numpy.datetime64
+        start <= TIMESTAMP < end
+    columns: list of strings [optional]
+        only decode these fields; see project_schema().  Default is all.
+    executor: concurrent.futures.Executor [optional]
+        decode files with window_batches() in its processes; default is
+        iter_batches() in this process.
+    ahead: integer [optional]
+        number of files the executor decodes ahead of the consumer
+
+    Yields
+    ------
+    columns: dictionary
+        "TIMESTAMP", "RECORD" and field name --> numpy.ndarray; one record
+        per TIMESTAMP, over all batches.
+
+    Notes
+    -----
+    Records of overlapping files are de-duplicated by TIMESTAMP, keeping
+        those of the earlier file, like query_archive(); only the TIMESTAMPs
+        already yielded are kept, not their fields.  In this process one
+        batch is decoded at a time; an executor holds whole windows of up to
+        ahead + 1 files.
+    """
+    if executor is None:
+        decoded = (
+            batch
+            for ffn in ffns
+            for batch in iter_batches(
+                ffn, columns=columns, start=start, end=end
+            )
+        )
+    else:
+        decoded = prefetch_batches(executor, ffns, start, end, columns, ahead)
+    seen = np.array([], dtype="datetime64[ns]")
+    for batch in decoded:
+        # the first of each TIMESTAMP, which was not yielded before
+        _, first = np.unique(batch["TIMESTAMP"], return_index=True)
+        first = first[
+            ~np.isin(batch["TIMESTAMP"][first], seen, assume_unique=True)
+        ]
+        if len(first):
+            seen = np.union1d(seen, batch["TIMESTAMP"][first])
+            yield {name: value[first] for name, value in batch.items()}
+
+
+def prefetch_batches(executor, ffns, start, end, columns, ahead):
+    """
+    Yield the batches of window_batches() for each file, in order, while an
+        executor decodes the next files; see archive_batches().
+    """
+    pending = collections.deque()
+    for ffn in ffns:
+        pending.append(
+            executor.submit(window_batches, ffn, start, end, columns)
+        )
+        if len(pending) > ahead:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def toa5_header(header, fn):
+    """
+    Reformat a TOB file's header into the 4 header lines of a TOA5 file.
+
+    Parameters
+    ----------
+    header: list of lists of strings
+        the file's header lines, from read_header()
+    fn: string
+        file name, added to the end of the first line
+
+    Returns
+    -------
+    ho: list of lists of strings
+        Environment, Field Names, Units & Processing lines, with TIMESTAMP
+        (and RECORD, for TOB2 & TOB3) in front.
+    """
+    if header[0][0] == "TOB1":
+        if get_schema(header)["timestamp"]:
+            # SECONDS & NANOSECONDS become TIMESTAMP
+            ho = [xx[1:] for xx in header[:4]]
+            ho[0].insert(0, "TOA5")
+            ho[1][0] = "TIMESTAMP"
+            ho[2][0] = "TS"
+        else:
+            ho = [list(xx) for xx in header[:4]]
+            ho[0][0] = "TOA5"
+    else:
+        ho = [list(header[xx]) for xx in [0, 2, 3, 4]]
+        ho[0][0] = "TOA5"
+        ho[0][-1] = header[1][0]
+        ho[1] = ["TIMESTAMP", "RECORD"] + ho[1]
+        ho[2] = ["TS", "RN"] + ho[2]
+        ho[3] = ["", ""] + ho[3]
+    ho[0].append(fn)  # add origional file name to header.
+    return ho
+
+
+class TOA5Token(str):
+    """TOA5 text for a non-finite value, whatever its field's format."""
+
+    def __format__(self, format_spec):
+        return str(self)
+
+
+# non-finite values, as written by CardConvert
+TOA5_NAN = TOA5Token('"NAN"')
+TOA5_INF = TOA5Token('"INF"')
+TOA5_NEG_INF = TOA5Token('"-INF"')
+
+# BOOL8 text of each Byte value; the bit order is reversed, as in
+# decode_data_bin()
+BOOL8_STRINGS = np.array(
+    ["{0:08b}".format(ii)[::-1] for ii in range(256)], dtype=object
+)
+
+# records formatted at once by write_TOA5(), and its write buffer size
+TOA5_BLOCK_SIZE = 8192
+TOA5_BUFFER_SIZE = 1 << 20
+
+
+def toa5_timestamps(values):
+    """
+    Format timestamps like ts_formatter(ts, "csi"), i.e. with as few
+    sub-second digits as needed.
+
+    Parameters
+    ----------
+    values: numpy.ndarray of datetime64
+
+    Returns
+    -------
+    numpy.ndarray of strings (object)
+
+    Notes
+    -----
+    The date & time is formatted once per distinct second, and the
+        sub-seconds once per distinct microsecond value, rather than per
+        record.
+    """
+    ns = values.astype("datetime64[ns]").view(np.int64)
+    seconds, usec = np.divmod(ns, 1000000000)
+    usec //= 1000
+    uniq, inverse = np.unique(seconds, return_inverse=True)
+    prefixes = np.char.replace(
+        np.datetime_as_string(uniq.astype("datetime64[s]")), "T", " "
+    ).astype(object)
+    uniq_usec, inverse_usec = np.unique(usec, return_inverse=True)
+    fractions = np.array(
+        [".{:06d}".format(xx).rstrip("0").rstrip(".") for xx in uniq_usec],
+        dtype=object,
+    )
+    return prefixes[inverse] + fractions[inverse_usec]
+
+
+def format_TOA5(columns, data_types):
+    """
+    Format a block of records as TOA5 rows.
+
+    Parameters
+    ----------
+    columns: dictionary
+        field name --> numpy.ndarray, in output order; e.g. a batch from
+        iter_batches()
+    data_types: dictionary
+        field name --> datatype from data_type_dict, "ASCII" instead of
+        "ASCII(#)"
+
+    Returns
+    -------
+    string
+        the rows, as written by decode_TOB3() & decode_TOB1()
+
+    Notes
+    -----
+    Each column is converted at once, with non-finite values swapped for
+        TOA5 tokens by masks, and then all rows are formatted with one
+        .format() call of the Record Format String repeated per row.
+    """
+    names = list(columns)
+    nrows = len(columns[names[0]]) if names else 0
+    table = np.empty((nrows, len(names)), dtype=object)
+    for jj, name in enumerate(names):
+        column, dtype = columns[name], data_types[name]
+        if column.dtype.kind == "M":
+            table[:, jj] = toa5_timestamps(column)
+        elif dtype == "BOOL8":
+            table[:, jj] = BOOL8_STRINGS[column]
+        elif dtype == "ASCII":
+            table[:, jj] = [
+                xx.decode("ascii", "ignore") for xx in column.tolist()
+            ]
+        else:
+            values = column.astype(object)
+            if column.dtype.kind == "f":
+                values[np.isnan(column)] = TOA5_NAN
+                values[np.isposinf(column)] = TOA5_INF
+                values[np.isneginf(column)] = TOA5_NEG_INF
+            table[:, jj] = values
+    rfs = ",".join(data_type_dict[data_types[name]]["refmt"] for name in names)
+    return ((rfs + "\n") * nrows).format(*table.ravel())
+
+
+def write_TOA5(ffn, toa5_file, columns=None):
+    """
+    Decode a TOB1, TOB2 or TOB3 binary file to TOA5 formatted ASCII, in
+    blocks of records.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name, including path and extention.
+    toa5_file: string
+        full file name of output file.
+    columns: dictionary [optional]
+        the file's records, already decoded by decode_columns(); the file is
+        then not decoded again.
+
+    Returns
+    -------
+    rec_cnt: integer
+        number of records written
+
+    Notes
+    -----
+    Same output as decode_TOB3() & decode_TOB1(), except that "-INF" is
+        written as CardConvert does, rather than as -"INF", and that TOB1
+        NaN values are written as "NAN" too.  Records come from
+        iter_batches(), and are formatted by format_TOA5().
+    """
+    logger = logging.getLogger(__name__)
+    fn = os.path.basename(ffn)
+    logger.info("starting to write TOA5 file from:  %s", fn)
+    header = read_file_header(ffn)
+    schema = get_schema(header)
+    data_types = dict(zip(schema["names"], schema["dtl"]))
+    data_types.update({"TIMESTAMP": "NSec", "RECORD": "ULONG"})
+    rec_cnt = 0
+    with open(toa5_file, "w", buffering=TOA5_BUFFER_SIZE) as outfile:
+        for hh in toa5_header(header, fn):
+            outfile.write('"' + '","'.join(hh) + '"\n')
+        if columns is None:
+            batches = iter_batches(ffn, TOA5_BLOCK_SIZE)
+        else:
+            nrec = len(next(iter(columns.values())))
+            batches = (
+                {
+                    name: value[ii : ii + TOA5_BLOCK_SIZE]
+                    for name, value in columns.items()
+                }
+                for ii in range(0, nrec, TOA5_BLOCK_SIZE)
+            )
+        for batch in batches:
+            outfile.write(format_TOA5(batch, data_types))
+            rec_cnt += len(next(iter(batch.values())))
+    logger.debug("TOA5 file (%s); rec_cnt = %s", fn, rec_cnt)
+    return rec_cnt
+
+
+def arrow_table(columns, ho):
+    """
+    Build a pyarrow.Table of decoded columns, typed & described by the file.
+
+    Parameters
+    ----------
+    columns: dictionary
+        field name --> numpy.ndarray, e.g. from decode_columns()
+    ho: list of lists of strings
+        the 4 TOA5 header lines, from toa5_header()
+
+    Returns
+    -------
+    pyarrow.Table
+        floats as float32, TIMESTAMP as timestamp[ns], ASCII as strings;
+        each field has its "units" & "processing" as metadata, and the
+        table has the TOA5 header lines, as JSON, in "csi2pg.toa5_header".
+    """
+    if pyarrow is None:
+        raise Exception("pyarrow is not installed; no columnar output")
+    meta = {
+        name: {"units": units, "processing": processing}
+        for name, units, processing in zip(ho[1], ho[2], ho[3])
+    }
+    fields, arrays = [], []
+    for name, column in columns.items():
+        if column.dtype.kind == "f":
+            column = column.astype(np.float32)
+        elif column.dtype.kind == "S":
+            column = np.char.decode(column, "ascii", "ignore")
+        array = pyarrow.array(column)
+        fields.append(pyarrow.field(name, array.type, metadata=meta.get(name)))
+        arrays.append(array)
+    schema = pyarrow.schema(
+        fields, metadata={"csi2pg.toa5_header": json.dumps(ho)}
+    )
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(parquet_file, columns, ho):
+    """
+    Write decoded columns to a Parquet file, see arrow_table().
+
+    Parameters
+    ----------
+    parquet_file: string
+        full file name of output file, i.e. from decode_filename(), plus
+        ".parquet"
+    columns: dictionary
+        field name --> numpy.ndarray, e.g. from decode_columns()
+    ho: list of lists of strings
+        the 4 TOA5 header lines, from toa5_header()
+
+    Notes
+    -----
+    zstd compressed; written to a temporary name, and then renamed, so a
+        partial file is never left under the final name.
+    """
+    table = arrow_table(columns, ho)
+    pyarrow.parquet.write_table(
+        table, parquet_file + ".tmp", compression="zstd"
+    )
+    os.rename(parquet_file + ".tmp", parquet_file)
+
+
+def encode_fp2(values):
+    """
+    Encode values into raw FP2 integers; the inverse of decode_fp2().
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        floats
+
+    Returns
+    -------
+    numpy.ndarray
+        uint16 raw FP2 values, same shape as values
+
+    Notes
+    -----
+    The largest decimal exponent (0-3), which keeps the mantissa within its
+        13 bits, is used; so every FP2 value is encoded to one which decodes
+        to the same float.  Larger magnitudes are clipped to +/-8189, since
+        a mantissa of 8190 or 8191 with exponent 0 is NaN or +/-Inf.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    mag = np.where(finite, np.minimum(np.abs(values), 8189), 0)
+    exp = np.zeros(values.shape, np.uint16)
+    for ee in (1, 2, 3):
+        exp[np.round(mag * 10.0**ee) <= 0x1FFF] = ee
+    exp[~finite] = 0
+    mant = np.round(mag * 10.0 ** exp.astype(np.float64)).astype(np.uint16)
+    mant[np.isnan(values)] = 8190
+    mant[np.isinf(values)] = 8191
+    sign = (np.signbit(values) & ~np.isnan(values)).astype(np.uint16)
+    return sign << 15 | exp << 13 | mant
+
+
+def encode_column_np(values, dtype):
+    """
+    Convert one column into the raw values of its datatype; the inverse of
+        decode_column_np().
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        decoded values of one field, e.g. from decode_column_np()
+    dtype: string
+        datatype from data_type_dict, "ASCII" instead of "ASCII(#)"
+
+    Returns
+    -------
+    numpy.ndarray
+        ready to assign to the field of a record_dtype() array, which also
+        sets the byte order.
+    """
+    values = np.asarray(values)
+    if dtype == "FP2":
+        return encode_fp2(values)
+    if dtype == "ASCII":
+        return values.astype(np.bytes_)
+    if dtype in ("SecNano", "NSec"):
+        # [seconds since CSI epoch, NANOseconds into second]
+        nsec = (values.astype("datetime64[ns]") - CSI_EPOCH64).astype(np.int64)
+        return np.stack([nsec // 1000000000, nsec % 1000000000], axis=1)
+    if dtype == "BOOL":
+        return np.where(values != 0, 0xFF, 0).astype(np.uint8)
+    if dtype in ("BOOL2", "BOOL4"):
+        return (values != 0).astype(np.uint8)
+    return values
+
+
+def encode_data_np(columns, rec_dtype, dtl):
+    """
+    Encode columns into a block of binary records; the inverse of
+        decode_data_np().
+
+    Parameters
+    ----------
+    columns: dictionary
+        field name --> numpy.ndarray, for each field of rec_dtype
+    rec_dtype: numpy.dtype
+        from record_dtype()
+    dtl: list of strings
+        Data Type List, in the same order as rec_dtype's fields
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 array of shape (number of records, Table Record Size)
+    """
+    nrec = len(columns[rec_dtype.names[0]])
+    # zeros, so unused Bytes (e.g. BOOL4's last 3, and ASCII's null
+    # terminator) are nulls
+    raw = np.zeros(nrec, rec_dtype)
+    for name, dtype in zip(rec_dtype.names, dtl):
+        raw[name] = encode_column_np(columns[name], dtype)
+    return raw.view(np.uint8).reshape(nrec, rec_dtype.itemsize)
+
+
+def encode_header(header):
+    """
+    Encode the ASCII header lines of a TOB file; the inverse of
+        read_header().
+
+    Parameters
+    ----------
+    header: list of lists of strings
+        5 lines for TOB1, else 6 lines.
+
+    Returns
+    -------
+    bytes
+        TOB2 & TOB3 headers are padded with spaces, so that the binary
+        frames start at a 512 Byte sector boundary, as written by the
+        datalogger.
+    """
+    lines = [list(hh) for hh in header]
+    lines[-1][-1] = lines[-1][-1].rstrip(" ")
+    text = "".join('"' + '","'.join(hh) + '"\r\n' for hh in lines)
+    if header[0][0] != "TOB1":
+        text = text[:-2] + " " * (-len(text) % 512) + "\r\n"
+    return text.encode("ascii")
+
+
+# kinds of Major frames, written by write_TOB3()
+FRAME_MAJOR, FRAME_MINOR, FRAME_EMPTY, FRAME_INVALID = range(4)
+
+# number of Major frames write_TOB3() encodes at once
+FRAME_BLOCK = 65536
+
+
+def footer_bytes(validation, flags, size):
+    """Encode a TOB2/TOB3 frame footer; the inverse of footer_parse()."""
+    return struct.pack("<I", validation << 16 | flags << 12 | size)
+
+
+def minor_layout(count, schema):
+    """
+    Lay out records as the minor frames of one Major frame.
+
+    Parameters
+    ----------
+    count: integer
+        number of records
+    schema: dictionary
+        from get_schema()
+
+    Returns
+    -------
+    list of tuples, or None
+        (size, nrec) of each minor frame, from the front of the Major frame;
+        an nrec of 0 is the empty minor frame, which fills the space left.
+        None, when the records do not fit.
+
+    Notes
+    -----
+    Two minor frames, when they can hold all records, else one.  Sizes are
+        limited to the footer's 12 bits.
+    """
+    fs, fhs, ffs, trs = (schema[xx] for xx in ("fs", "fhs", "ffs", "trs"))
+    if count >= 2 and 2 * (fhs + ffs) + count * trs <= fs:
+        split = [count - count // 2, count // 2]
+    else:
+        split = [count]
+    layout = [(fhs + nn * trs + ffs, nn) for nn in split]
+    leftover = fs - sum(size for size, _ in layout)
+    if leftover < 0 or 0 < leftover < ffs:
+        return None
+    if leftover:
+        layout.insert(0, (leftover, 0))
+    if max(size for size, _ in layout) > 0xFFF:
+        return None
+    return layout
+
+
+def frame_plan(nrec, schema, minor_every=0, empty_every=0, invalid_every=0):
+    """
+    Decide the kind & number of records of each Major frame of a TOB3 file.
+
+    Parameters
+    ----------
+    nrec: integer
+        number of records to write
+    schema: dictionary
+        from get_schema()
+    minor_every, empty_every, invalid_every: integers [optional]
+        every n-th Major frame holds minor frames, is empty, or is invalid;
+        0 for never.  Later ones win, where they coincide.
+
+    Returns
+    -------
+    kinds: numpy.ndarray
+        FRAME_MAJOR, FRAME_MINOR, FRAME_EMPTY or FRAME_INVALID
+    counts: numpy.ndarray
+        number of records in each Major frame
+
+    Notes
+    -----
+    The last Major frame, when not full, always holds minor frames.
+    """
+    fs, fhs, ffs, trs = (schema[xx] for xx in ("fs", "fhs", "ffs", "trs"))
+    if empty_every == 1 or invalid_every == 1:
+        raise Exception("every Major frame can not be empty or invalid")
+    if nrec == 0:
+        return np.empty(0, np.uint8), np.empty(0, np.int64)
+    per_major = (fs - fhs - ffs) // trs
+    # two minor frames, where possible
+    per_minor = (fs - 2 * (fhs + ffs)) // trs
+    if per_minor < 2:
+        per_minor = per_major
+    while per_minor > 0 and minor_layout(per_minor, schema) is None:
+        per_minor -= 1
+    if minor_every and per_minor == 0:
+        raise Exception("records do not fit minor frames of %s Bytes" % fs)
+    nframes = nrec // max(min(per_major, per_minor), 1) + 16
+    while True:
+        kinds = np.full(nframes, FRAME_MAJOR, np.uint8)
+        for every, kind in (
+            (minor_every, FRAME_MINOR),
+            (empty_every, FRAME_EMPTY),
+            (invalid_every, FRAME_INVALID),
+        ):
+            if every:
+                kinds[every - 1 :: every] = kind
+        counts = np.array([per_major, per_minor, 0, 0], np.int64)[kinds]
+        cum = np.cumsum(counts)
+        if cum[-1] >= nrec:
+            break
+        nframes *= 2
+    last = int(np.searchsorted(cum, nrec))
+    kinds, counts = kinds[: last + 1], counts[: last + 1]
+    counts[last] -= cum[last] - nrec
+    if counts[last] < per_major:
+        kinds[last] = FRAME_MINOR
+    return kinds, counts
+
+
+def write_TOB3(
+    ffn,
+    header,
+    columns,
+    minor_every=0,
+    empty_every=0,
+    invalid_every=0,
+    complement=False,
+):
+    """
+    Encode columns into a TOB3 (or TOB2) binary file, as the decoders read
+        them.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name of output file
+    header: list of lists of strings
+        the 6 header lines, e.g. from read_file_header(); the field names &
+        types, frame size, interval, resolution & validation stamp are used.
+    columns: dictionary
+        "TIMESTAMP" (numpy.datetime64), "RECORD" and each field name -->
+        numpy.ndarray, in record order; e.g. from decode_TOB3_columns()
+    minor_every, empty_every, invalid_every: integers [optional]
+        every n-th Major frame holds minor frames, is empty, or is invalid;
+        see frame_plan().  The decoders stop at the 6th invalid frame.
+    complement: boolean [optional]
+        stamp the frames with the ones' complement of the header's
+        validation stamp, like a ring's next pass.
+
+    Returns
+    -------
+    rec_cnt: integer
+        number of records written
+
+    Notes
+    -----
+    Only each frame's first TIMESTAMP & RECORD are written, in its header;
+        the others follow from the record interval, as for the datalogger.
+    Major frames are encoded in blocks of FRAME_BLOCK, with one 2-D
+        assignment per block for the standard ones.
+    """
+    logger = logging.getLogger(__name__)
+    logger.info("starting to write TOB3 file:  %s", os.path.basename(ffn))
+    schema = get_schema(header)
+    fs, fhs, ffs, trs = (schema[xx] for xx in ("fs", "fhs", "ffs", "trs"))
+    rec_dtype, dtl = schema["rec_dtype"], schema["dtl"]
+    stamp = int(header[1][4]) ^ (0xFFFF if complement else 0)
+    nrec = len(columns["TIMESTAMP"])
+    kinds, counts = frame_plan(
+        nrec, schema, minor_every, empty_every, invalid_every
+    )
+    starts = np.cumsum(counts) - counts
+    per_major = (fs - fhs - ffs) // trs
+    nsec = (
+        columns["TIMESTAMP"].astype("datetime64[ns]") - CSI_EPOCH64
+    ).astype(np.int64)
+    res_ns = schema["ts_resolution"] * 1000
+
+    def frame_heads(first):
+        # seconds, sub-seconds & (TOB3 only) record number of each frame's
+        # first record
+        heads = np.zeros((len(first), fhs // 4), "<u4")
+        heads[:, 0] = nsec[first] // 1000000000
+        heads[:, 1] = nsec[first] % 1000000000 // res_ns
+        if fhs == 12:
+            heads[:, 2] = columns["RECORD"][first]
+        return heads.view(np.uint8)
+
+    with open(ffn, "wb") as outfile:
+        outfile.write(encode_header(header))
+        for lo in range(0, len(kinds), FRAME_BLOCK):
+            sel = slice(lo, lo + FRAME_BLOCK)
+            block_kinds, block_counts = kinds[sel], counts[sel]
+            block_starts = starts[sel]
+            first = int(block_starts[0])
+            last = int(block_starts[-1] + block_counts[-1])
+            data = encode_data_np(
+                {name: columns[name][first:last] for name in rec_dtype.names},
+                rec_dtype,
+                dtl,
+            )
+            frames = np.zeros((len(block_kinds), fs), np.uint8)
+            major = np.flatnonzero(block_kinds == FRAME_MAJOR)
+            rows = block_starts[major] - first
+            frames[major, :fhs] = frame_heads(block_starts[major])
+            frames[major, fhs : fhs + per_major * trs] = data[
+                rows[:, None] + np.arange(per_major)
+            ].reshape(len(major), per_major * trs)
+            frames[major, fs - ffs :] = np.frombuffer(
+                footer_bytes(stamp, 0, 0), np.uint8
+            )
+            for ii in np.flatnonzero(block_kinds != FRAME_MAJOR):
+                kind, frame = block_kinds[ii], frames[ii]
+                if kind == FRAME_EMPTY:
+                    frame[fs - ffs :] = np.frombuffer(
+                        footer_bytes(stamp, 0b0100, fs), np.uint8
+                    )
+                    continue
+                if kind == FRAME_INVALID:
+                    frame[fs - ffs :] = np.frombuffer(
+                        footer_bytes(stamp ^ 0x00FF, 0, 0), np.uint8
+                    )
+                    continue
+                layout = minor_layout(int(block_counts[ii]), schema)
+                if layout is None:
+                    raise Exception(
+                        "%s records do not fit minor frames of %s Bytes"
+                        % (block_counts[ii], fs)
+                    )
+                offset, rec = 0, int(block_starts[ii])
+                for size, nn in layout:
+                    if nn:
+                        frame[offset : offset + fhs] = frame_heads([rec])[0]
+                        frame[offset + fhs : offset + fhs + nn * trs] = data[
+                            rec - first : rec - first + nn
+                        ].ravel()
+                    # M flag, plus E for the filler
+                    flags = 0b1000 if nn else 0b1100
+                    frame[offset + size - ffs : offset + size] = np.frombuffer(
+                        footer_bytes(stamp, flags, size), np.uint8
+                    )
+                    offset += size
+                    rec += nn
+            outfile.write(frames.tobytes())
+    logger.debug("TOB3 file (%s); rec_cnt = %s", ffn, nrec)
+    return nrec
+
+
+def write_TOB1(ffn, header, columns):
+    """
+    Encode columns into a TOB1 binary file, as the decoders read them.
+
+    Parameters
+    ----------
+    ffn : string
+        full file name of output file
+    header: list of lists of strings
+        the 5 header lines, e.g. from read_file_header()
+    columns: dictionary
+        each field name --> numpy.ndarray, in record order; "TIMESTAMP"
+        (numpy.datetime64) instead of SECONDS & NANOSECONDS, when the
+        records start with those.  E.g. from decode_TOB1_columns().
+
+    Returns
+    -------
+    rec_cnt: integer
+        number of records written
+    """
+    logger = logging.getLogger(__name__)
+    logger.info("starting to write TOB1 file:  %s", os.path.basename(ffn))
+    schema = get_schema(header)
+    fields = dict(columns)
+    if schema["timestamp"]:
+        nsec = (
+            fields.pop("TIMESTAMP").astype("datetime64[ns]") - CSI_EPOCH64
+        ).astype(np.int64)
+        fields["SECONDS"] = nsec // 1000000000
+        fields["NANOSECONDS"] = nsec % 1000000000
+    nrec = len(fields[schema["names"][0]])
+    with open(ffn, "wb") as outfile:
+        outfile.write(encode_header(header))
+        for lo in range(0, nrec, BATCH_SIZE):
+            data = encode_data_np(
+                {
+                    name: fields[name][lo : lo + BATCH_SIZE]
+                    for name in schema["names"]
+                },
+                schema["rec_dtype"],
+                schema["dtl"],
+            )
+            outfile.write(data.tobytes())
+    logger.debug("TOB1 file (%s); rec_cnt = %s", ffn, nrec)
+    return nrec
+
+
+def b38(xx):
+    """
+    convert base 38 character into its equavalent decimal value.
+
+    Parameters
+    ----------
+    xx: string
+        lenght must be 1!!
+
+    Returns
+    -------
+    yy: integer
+        number in decimal
+
+    Notes
+    -----
+    This is a custom code for CSI dataloggers, and is probably not used
+    anywhere else.
+    """
+    logger = logging.getLogger(__name__)
+    value = ord(xx)
+    if value == 45:  # - (dash)
+        yy = 36
+    elif value < 58:  # [0-9]
+        yy = value - 48
+    elif value > 96:  # [a-z]
+        yy = value - 87
+    elif value == 95:  # _ (underscore)
+        yy = 37
+    else:
+        logger.error("character is not in custom Base 38 encoding.  Abort!")
+        email_exit()
+    return yy
+
+
+def decode_valid(fn):
+    """
+    Decode the valid time of a datalogger's file name.
+
+    Parameters
+    ----------
+    fn: string
+        filename, e.g. "stoSg8muk.bdat"
+
+    Returns
+    -------
+    valid: datetime
+        the timestamp this file is valid for, in UTC; see decode_filename()
+    """
+    decode = [b38(xx) for xx in fn[4:9]]
+    hours, minutes = divmod(decode[3] * 38 + decode[4], 60)
+    return datetime.datetime(
+        decode[0] + 2000, decode[1], decode[2], hours, minutes, tzinfo=pytz.utc
+    )
+
+
+# the 5 base 38 digits of a datalogger's file name; see decode_valid()
+UPLOAD_FN_RE = re.compile(r"^.{4}[0-9a-z-_]{5}")
+
+
+def upload_order(fn):
+    """
+    Sort key of sort_uploads(); never raises, nor calls email_exit().
+
+    Returns
+    -------
+    tuple
+        (site & table, undecoded, valid, fn); names which do not decode
+        follow those of the same site & table which do, in name order.
+    """
+    valid = None
+    if UPLOAD_FN_RE.match(fn):
+        try:
+            valid = decode_valid(fn)
+        except ValueError:
+            # e.g. a month of 0
+            pass
+    return fn[:4], valid is None, valid, fn
+
+
+def sort_uploads(fnames):
+    """
+    Sort datalogger file names by site & table, then valid time.
+
+    Notes
+    -----
+    The base 38 digits "-" & "_" sort before the digits in ASCII, so the
+        names themselves are not in valid time order.  A badly named file is
+        still returned, see upload_order(), so that bin2pg_file() moves it
+        to quarentine on its own.
+    """
+    return sorted(fnames, key=upload_order)
+
+
+def decode_filename(fn, dirpath):
+    """
+    decodes the file name from the logger
+
+    Parameters
+    ----------
+    fn: string
+        filename
+    dirpath: string
+        directory path to root of storage, in which directories
+            of year/month/day will be built and data stored.
+
+    Returns
+    -------
+    newffn: string
+        new full-filename, without extention (extention added
+        after file closes)
+    valid: datetime
+        the timestamp this file is valid for
+
+    Notes
+    -----
+    the file format is as follows
+        sto|ham :: site name
+        [SAM] :: Sonic, Analog (CR3000), Monitor
+            (CSAT3Bs' health & orientation)
+        [0-9a-z_-]{5} :: YYYY-2000, MM, DD, minutes since midnight --
+            all in base 38 the order is 0-9 a-z - _
+        .bdat :: binary data file
+    this also cals mkdir so that the output path is valid.
+    """
+    logger = logging.getLogger(__name__)
+    valid = decode_valid(fn)
+    yyyy = valid.strftime("%Y")
+    mm = valid.strftime("%m")
+    dd = valid.strftime("%d")
+    hhtt = valid.strftime("%H%M")
+    filepath = os.path.join(dirpath, yyyy, mm, dd)
+    chkmkdir(filepath)
+    newfn = (
+        fn[:3]
+        + "_"
+        + table_code[fn[3]]
+        + "_"
+        + yyyy[2:]
+        + mm
+        + dd
+        + "-"
+        + hhtt
+    )
+    newffn = os.path.join(filepath, newfn)
+    logger.info("filename decoded: %s = %s", fn, newfn)
+    return newffn, valid
+
+
+def directory_traverse(dirpath, dates):
+    """
+    relative directories which contain data within the date range of dates
+        variable. This traverses the driectory tree as built by
+        decode_filename().
+
+    Parameters
+    ----------
+    dirpath: string
+        the root of the ASCII files, i.e. the dirctory containing the YYYY
+            directory(s)
+    dates: datetime.date
+        the object is created based on command line (argparse) input, and is
         validated at that time.
 
     Returns
@@ -1115,7 +3835,8 @@ def chkmkdir(dirpath):
         dirpath = dirpath + "/"
     newdir = os.path.dirname(dirpath)
     if not os.path.exists(newdir):
-        os.makedirs(newdir)
+        # exist_ok, for bin2pg_pool() workers making the same directory
+        os.makedirs(newdir, exist_ok=True)
         logger.info("dirpath made to: %s", newdir)
 
 
@@ -1167,6 +3888,10 @@ def email_exit(msg=""):
     email error log tail, and then exit
     """
     logger = logging.getLogger(__name__)
+    if POOL_WORKER:
+        # bin2pg_pool() emails once, for all of its workers
+        logger.critical("ABORTED! %s", msg)
+        sys.exit(msg)
     if msg:
         msg = msg + "\n"
     email_error(msg + "Fatal error, see error log.")
@@ -1208,6 +3933,46 @@ def ftp_del(fn):
     site.delete(fn_logger)
 
 
+def prepare_sql_df(df, site, table):
+    """
+    Reshape a table of decoded records into the columns of the database.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        "TIMESTAMP", "RECORD", and one column per field
+    site: string
+        site name from the file name, i.e. "ham" or "sto"
+    table: string
+        table name from the file name, i.e. "analog", "sonic" or "monitor"
+
+    Returns
+    -------
+    df: pandas.DataFrame
+        the fields, "tower" and "valid"
+    table: string
+        database table to COPY to
+    """
+    # chn_id encoding
+    site_number = CHN_CODE["sites"][site]
+    # add site
+    df["tower"] = site_number
+    df.drop("RECORD", axis=1, inplace=True)
+    df["valid"] = pd.to_datetime(df["TIMESTAMP"], format="ISO8601")
+    df.drop("TIMESTAMP", axis=1, inplace=True)
+    if table == "sonic":
+        # Convert the diag columns to int
+        for m in [5, 10, 20, 40, 80, 120]:
+            c = "Diag_%sm" % (m,)
+            if df[c].dtype != np.dtype(int):
+                # nullable smallint; missing & out of range values are NULL
+                values = df[c].astype(float)
+                values = values.where((values > -32768) & (values < 32767))
+                df[c] = values.round().astype("Int16")
+    # Database uses partitioned tables, so can insert directly into parent
+    return df, f"data_{table}"
+
+
 def parse_TOA5_sql(ffn, dirpath=None):
     """
     parse the TOA5 formatted .dat file (4 header rows) into a .sql file.
@@ -1244,56 +4009,430 @@ def parse_TOA5_sql(ffn, dirpath=None):
     fn_basename = os.path.splitext(fn)[0]
     site, table, _ = fn_basename.split("_")
     sql_ffn = os.path.join(dirpath, fn_basename + ".sql")
-    # chn_id encoding
-    site_number = CHN_CODE["sites"][site]
 
     df = pd.read_csv(
         ffn, skiprows=[0, 2, 3], header=0, na_values=["NAN", "-INF", "INF"]
     )
     if df.empty:
         raise Exception("0 data rows found in %s" % (fn,))
-    # add site
-    df["tower"] = site_number
-    df.drop("RECORD", axis=1, inplace=True)
-    df["valid"] = pd.to_datetime(df["TIMESTAMP"])
-    df.drop("TIMESTAMP", axis=1, inplace=True)
-    if table == "sonic":
-        # Convert the diag columns to int
-        for m in [5, 10, 20, 40, 80, 120]:
-            c = "Diag_%sm" % (m,)
-            if df[c].dtype != np.dtype(int):
-                # Hack as pandas can't have an int dtype with missing values
-                df[c] = df[c].apply(
-                    lambda x: (
-                        "%.0f" % (x,)
-                        if (pd.notnull(x) and x > -32768 and x < 32767)
-                        else None
-                    )
-                )
-    # Database uses partitioned tables, so can insert directly into parent
-    table = f"data_{table}"
+    df, table = prepare_sql_df(df, site, table)
     df.to_csv(sql_ffn, sep="\t", header=False, index=False, na_rep=r"\N")
     return sql_ffn, table, df.columns
 
 
-def copy2db_execute(sql_ffn, db, table, columns, UTC=True):
+# NULL of PostgreSQL's text COPY format, whatever its column's format
+COPY_NULL = TOA5Token(r"\N")
+
+
+def format_copy_text(df):
+    """
+    Format a table as the rows of PostgreSQL's text COPY format.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        from prepare_sql_df()
+
+    Returns
+    -------
+    string
+        tab separated rows; floats as "%.7g", NaN & missing values as NULL
+
+    Notes
+    -----
+    The same approach as format_TOA5(): each column is converted at once,
+        and all rows are formatted with one .format() call, instead of
+        DataFrame.to_csv()'s float_format per value.
+    """
+    table = np.empty(df.shape, dtype=object)
+    fmts = []
+    for jj, name in enumerate(df.columns):
+        column = df[name]
+        if column.dtype.kind == "M":
+            # one sub-second resolution for the column, as to_csv() does
+            values = column.to_numpy().astype("datetime64[ns]")
+            ns = values.view(np.int64)
+            for unit, div in (("s", 10**9), ("ms", 10**6), ("us", 10**3)):
+                if not (ns % div).any():
+                    break
+            else:
+                unit = "ns"
+            table[:, jj] = np.char.replace(
+                np.datetime_as_string(values, unit=unit), "T", " "
+            ).astype(object)
+            fmts.append("{}")
+        elif column.dtype.kind == "f":
+            values = column.to_numpy()
+            table[:, jj] = values.astype(object)
+            table[np.isnan(values), jj] = COPY_NULL
+            fmts.append("{:.7g}")
+        else:
+            # e.g. the nullable Int16 of the sonic Diag columns
+            table[:, jj] = column.to_numpy(dtype=object, na_value=COPY_NULL)
+            fmts.append("{}")
+    return (("\t".join(fmts) + "\n") * len(df)).format(*table.ravel())
+
+
+def parse_columns_sql(columns, names, ffn):
+    """
+    parse decoded columns into an in-memory COPY stream, without the TOA5
+    file round trip of parse_TOA5_sql().
+
+    Parameters
+    ----------
+    columns: dictionary
+        "TIMESTAMP", "RECORD" and field name --> numpy.ndarray, e.g. from
+        decode_TOB3_columns()
+    names: list of strings
+        field names, in the order of the file
+    ffn: string
+        full-filename from decode_filename(), which holds the site & table
+
+    Returns
+    -------
+    sql_buf: io.StringIO
+        tab separated rows, the same as parse_TOA5_sql()'s .sql file
+    table: string
+        database table to COPY to
+    columns: pandas.Index
+        database columns to COPY to
+
+    Notes
+    -----
+    Values are formatted like the TOA5 file, i.e. "%.7g", and NaN & +/-Inf
+        become NULL, like parse_TOA5_sql(); see format_copy_text().
+    """
+    logger = logging.getLogger(__name__)
+    fn_basename = os.path.splitext(os.path.basename(ffn))[0]
+    logger.info("starting to parse decoded columns of: %s", fn_basename)
+    site, table, _ = fn_basename.split("_")
+    if len(columns["RECORD"]) == 0:
+        raise Exception("0 data rows found in %s" % (fn_basename,))
+    df = pd.DataFrame(
+        {
+            name: (
+                np.where(np.isfinite(columns[name]), columns[name], np.nan)
+                if columns[name].dtype.kind == "f"
+                else columns[name]
+            )
+            for name in ["TIMESTAMP", "RECORD"] + list(names)
+        }
+    )
+    df, table = prepare_sql_df(df, site, table)
+    sql_buf = io.StringIO(format_copy_text(df))
+    return sql_buf, table, df.columns
+
+
+# PostgreSQL's binary COPY file format
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+# PostgreSQL timestamps count microseconds since 2000-01-01 UTC
+PG_EPOCH64 = np.datetime64("2000-01-01", "ns")
+
+
+def pgcopy_encode(values, nulls, outfile):
+    """
+    Encode columns as the tuples of PostgreSQL's binary COPY format.
+
+    Parameters
+    ----------
+    values: list of numpy.ndarray
+        one array per database column, already in its big-endian binary
+        type, e.g. ">f4" for real, ">i2" for smallint, ">i8" for timestamptz
+    nulls: list of numpy.ndarray
+        one boolean array per database column; True is NULL
+    outfile: file object
+        opened in binary mode; PGCOPY_HEADER & PGCOPY_TRAILER are not
+        written.
+
+    Notes
+    -----
+    Each tuple is a 2-Byte field count, then per field a 4-Byte length
+        (-1 for NULL) and the value.  Rows are grouped by which of their
+        fields are NULL, so each group is one fixed-size numpy record,
+        written with one tobytes() call.  Row order is not kept, which COPY
+        does not need.
+    """
+    nrows = len(values[0]) if values else 0
+    if nrows == 0:
+        return
+    null_bits = np.packbits(np.column_stack(nulls), axis=1)
+    patterns, group = np.unique(null_bits, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    for ii, pattern in enumerate(patterns):
+        rows = np.flatnonzero(group == ii)
+        is_null = np.unpackbits(pattern)[: len(values)].astype(bool)
+        fields = [("nfields", ">i2")]
+        for jj, column in enumerate(values):
+            fields.append(("len%s" % (jj,), ">i4"))
+            if not is_null[jj]:
+                fields.append(("val%s" % (jj,), column.dtype))
+        tuples = np.empty(len(rows), dtype=fields)
+        tuples["nfields"] = len(values)
+        for jj, column in enumerate(values):
+            if is_null[jj]:
+                tuples["len%s" % (jj,)] = -1
+            else:
+                tuples["len%s" % (jj,)] = column.dtype.itemsize
+                tuples["val%s" % (jj,)] = column[rows]
+        outfile.write(tuples.tobytes())
+
+
+def parse_columns_pgcopy(columns, names, ffn):
+    """
+    parse decoded columns into an in-memory binary COPY stream.
+
+    Parameters
+    ----------
+    columns: dictionary
+        "TIMESTAMP", "RECORD" and field name --> numpy.ndarray, e.g. from
+        decode_TOB3_columns()
+    names: list of strings
+        field names, in the order of the file
+    ffn: string
+        full-filename from decode_filename(), which holds the site & table
+
+    Returns
+    -------
+    copy_buf: io.BytesIO
+        PGCOPY binary formatted data
+    table: string
+        database table to COPY to
+    db_columns: list of strings
+        database columns to COPY to
+
+    Notes
+    -----
+    Fields are sent as real (float4), the sonic Diag fields as smallint,
+        tower as smallint and valid as timestamptz; with the same NULLs as
+        parse_columns_sql(), but without any text formatting, and without
+        the "%.7g" rounding.
+    """
+    logger = logging.getLogger(__name__)
+    fn_basename = os.path.splitext(os.path.basename(ffn))[0]
+    logger.info("starting to encode decoded columns of: %s", fn_basename)
+    site, table, _ = fn_basename.split("_")
+    nrows = len(columns["RECORD"])
+    if nrows == 0:
+        raise Exception("0 data rows found in %s" % (fn_basename,))
+    values, nulls = [], []
+    for name in names:
+        column = columns[name].astype(np.float64)
+        null = ~np.isfinite(column)
+        if table == "sonic" and name.startswith("Diag_"):
+            # same range as prepare_sql_df()
+            null |= ~((column > -32768) & (column < 32767))
+            column = np.rint(np.where(null, 0, column)).astype(">i2")
+        else:
+            column = column.astype(">f4")
+        values.append(column)
+        nulls.append(null)
+    # tower
+    values.append(np.full(nrows, CHN_CODE["sites"][site], dtype=">i2"))
+    nulls.append(np.zeros(nrows, dtype=bool))
+    # valid
+    valid = columns["TIMESTAMP"].astype("datetime64[ns]") - PG_EPOCH64
+    values.append((valid.astype(np.int64) // 1000).astype(">i8"))
+    nulls.append(np.zeros(nrows, dtype=bool))
+
+    copy_buf = io.BytesIO()
+    copy_buf.write(PGCOPY_HEADER)
+    pgcopy_encode(values, nulls, copy_buf)
+    copy_buf.write(PGCOPY_TRAILER)
+    copy_buf.seek(0)
+    return copy_buf, f"data_{table}", list(names) + ["tower", "valid"]
+
+
+class CopyStream(io.RawIOBase):
+    """
+    A read-only file object, which encodes batches of columns for one COPY
+        as they are read; see reimport().
+
+    Parameters
+    ----------
+    batches: iterable of dictionaries
+        columns with the same fields, e.g. from archive_batches()
+    ffn: string
+        full-filename from decode_filename(), which holds the site & table
+    binary: boolean [optional]
+        encode with parse_columns_pgcopy(), else parse_columns_sql()
+
+    Attributes
+    ----------
+    table, columns:
+        database table & columns, as from parse_columns_sql(); None until a
+        batch was encoded, i.e. for a stream without batches.
+    nrec: integer
+        number of records encoded so far
+
+    Notes
+    -----
+    Only one encoded batch is held at a time.  The first batch is encoded
+        at once, to learn the table & columns.  The PGCOPY header is only
+        written before the first batch, and the trailer after the last.
+        The stream is not seekable, so copy2db_execute() does not retry it.
+    """
+
+    def __init__(self, batches, ffn, binary=False):
+        super().__init__()
+        self.batches = iter(batches)
+        self.ffn, self.binary = ffn, binary
+        self.table, self.columns, self.nrec = None, None, 0
+        self.pending = memoryview(b"")
+        self.next_batch()
+
+    def readable(self):
+        return True
+
+    def next_batch(self):
+        """Encode the next batch into pending; False after the last."""
+        batch = None if self.batches is None else next(self.batches, None)
+        if batch is None:
+            if self.batches is not None and self.binary and self.table:
+                self.pending = memoryview(PGCOPY_TRAILER)
+            self.batches = None
+            return False
+        first = self.table is None
+        names = [name for name in batch if name not in ("TIMESTAMP", "RECORD")]
+        if self.binary:
+            copy_buf, self.table, self.columns = parse_columns_pgcopy(
+                batch, names, self.ffn
+            )
+            payload = copy_buf.getbuffer()[: -len(PGCOPY_TRAILER)]
+            if not first:
+                payload = payload[len(PGCOPY_HEADER) :]
+        else:
+            copy_buf, self.table, self.columns = parse_columns_sql(
+                batch, names, self.ffn
+            )
+            payload = memoryview(copy_buf.getvalue().encode())
+        self.nrec += len(batch["TIMESTAMP"])
+        self.pending = payload
+        return True
+
+    def readinto(self, buf):
+        while not len(self.pending) and self.next_batch():
+            pass
+        size = min(len(buf), len(self.pending))
+        buf[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+# idle database connections, by process id & connection string; see
+# db_getconn()
+DB_POOL = {}
+
+# most idle connections kept, per process & connection string
+DB_POOL_SIZE = 2
+
+
+def db_dsn(db):
+    """libpq connection string of a dbconn dictionary."""
+    return (
+        "host={hostname} dbname={dbname} user={dbuser} password={dbpass}"
+    ).format(**db)
+
+
+def db_getconn(db):
+    """
+    Check out a database connection from this process' pool.
+
+    Parameters
+    ----------
+    db: dictionary
+        holds hostname, dbname, dbuser, & dbpass
+
+    Returns
+    -------
+    conn: psycopg2 connection
+        to give back with db_putconn()
+
+    Notes
+    -----
+    An idle connection is health checked with "SELECT 1", and dropped when
+        that fails, e.g. after a server restart or an idle timeout; a new
+        one is then opened.  A new connection's session is set to UTC once,
+        instead of at every COPY.
+    The pool is by process id, so a process forked by bin2pg_pool() opens
+        its own connections, and never uses its parent's.
+    """
+    logger = logging.getLogger(__name__)
+    dsn = db_dsn(db)
+    idle = DB_POOL.setdefault((os.getpid(), dsn), [])
+    while idle:
+        conn = idle.pop()
+        try:
+            with conn.cursor() as curs:
+                curs.execute("SELECT 1")
+            conn.rollback()
+            return conn
+        except psycopg2.Error as exp:
+            logger.warning("dropping idle database connection: %s", exp)
+            conn.close()
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as curs:
+        curs.execute("SET timezone = 'UTC'")
+    conn.commit()
+    logger.debug("opened database connection")
+    return conn
+
+
+def db_putconn(db, conn):
+    """
+    Give a connection from db_getconn() back to this process' pool.
+
+    Notes
+    -----
+    Its transaction, if any, is rolled back.  A broken connection, or one
+        beyond DB_POOL_SIZE, is closed instead.
+    """
+    idle = DB_POOL.setdefault((os.getpid(), db_dsn(db)), [])
+    if not conn.closed and len(idle) < DB_POOL_SIZE:
+        try:
+            conn.rollback()
+            idle.append(conn)
+            return
+        except psycopg2.Error:
+            pass
+    conn.close()
+
+
+def db_closeall():
+    """Close this process' idle database connections."""
+    pid = os.getpid()
+    for key in [key for key in DB_POOL if key[0] == pid]:
+        for conn in DB_POOL.pop(key):
+            conn.close()
+
+
+def copy2db_execute(
+    sql_ffn, db, table, columns, UTC=True, binary=False, replace=None
+):
     """
     Copy SQL formatted data file to database.  intended for use immedaitly
         after sql_ffn = parse_TOA5_sql(ffn)
 
     Parameters
     ----------
-    sql_ffn : str
+    sql_ffn : str or file object
         full path file name, which contains SQL formatted data to copy to
-        database.
+        database; or an already open stream of it, e.g. from
+        parse_columns_sql().
     db: dictionary
-        holds dbname, dbuser, & dbpass
+        holds dbname, dbuser, & dbpass; see db_getconn()
     table: string [optional]
         table to COPY to, default is 'dat'
     columns : tuple of strings [optional]
         columns to COPY to (note columns must be a TUPLE)
     UTC: boolean [optional]
-        default is False, or else there is an error on the server
+        the pooled sessions are in UTC; False uses the server's default
+        timezone, for this COPY only
+    binary: boolean [optional]
+        sql_ffn holds PGCOPY binary data, e.g. from parse_columns_pgcopy()
+    replace: tuple [optional]
+        (tower, first valid, last valid); DELETE those rows of the table,
+        in the same transaction as the COPY, e.g. for reimport().
 
     Returns
     -------
@@ -1304,37 +4443,78 @@ def copy2db_execute(sql_ffn, db, table, columns, UTC=True):
     -----
     requires psycopg2 version > 2.5, whos cursors are context managers, and
         can be used with "with" blocks.
+    The connection comes from this process' pool, see db_getconn(), and is
+        kept for the next COPY.  When it breaks before the commit, the COPY
+        is retried once on a new connection, if the data can be re-read.
 
     """
     logger = logging.getLogger(__name__)
+    if not isinstance(sql_ffn, str):
+        # in-memory stream; name it after its table in the logs
+        infile, sql_ffn = sql_ffn, "<%s stream>" % (table,)
+    else:
+        infile = None
     logger.info("starting COPY to db for %s", os.path.basename(sql_ffn))
+    close_infile = infile is None
+    conn = None
     try:
-        conn = psycopg2.connect(
-            (
-                "host={hostname} dbname={dbname} "
-                "user={dbuser} password={dbpass}"
-            ).format(**db)
-        )
-        logger.debug("connected to database")
-        curs = conn.cursor()
-        infile = open(sql_ffn, "r")
-        logger.debug("database cursor established")
-        if UTC:
-            curs.execute("set timezone='UTC';")
-        curs.copy_from(
-            infile,
-            table=table,
-            columns=[c.lower() for c in columns],
-        )
-        curs.close()
+        if infile is None:
+            infile = open(sql_ffn, "r")
+        start = infile.tell() if infile.seekable() else None
+        for attempt in range(2):
+            conn = db_getconn(db)
+            logger.debug("connected to database")
+            try:
+                curs = conn.cursor()
+                logger.debug("database cursor established")
+                if not UTC:
+                    curs.execute("SET LOCAL timezone TO DEFAULT;")
+                if replace is not None:
+                    curs.execute(
+                        psycopg2.sql.SQL(
+                            "DELETE FROM {} WHERE tower = %s "
+                            "AND valid >= %s AND valid <= %s"
+                        ).format(psycopg2.sql.Identifier(table)),
+                        replace,
+                    )
+                    logger.info("deleted %s rows of %s", curs.rowcount, table)
+                if binary:
+                    copy_sql = psycopg2.sql.SQL(
+                        "COPY {} ({}) FROM STDIN (FORMAT binary)"
+                    ).format(
+                        psycopg2.sql.Identifier(table),
+                        psycopg2.sql.SQL(",").join(
+                            psycopg2.sql.Identifier(c.lower()) for c in columns
+                        ),
+                    )
+                    curs.copy_expert(copy_sql, infile)
+                else:
+                    curs.copy_from(
+                        infile,
+                        table=table,
+                        columns=[c.lower() for c in columns],
+                    )
+                curs.close()
+                break
+            except psycopg2.Error as exp:
+                if attempt or not conn.closed or not infile.seekable():
+                    raise
+                logger.warning("database connection lost (%s); retry", exp)
+                conn.close()
+                infile.seek(start)
         conn.commit()
-        conn.close()
+        db_putconn(db, conn)
         logger.debug("copyed to database")
         return "COPY Successful."
         # return None
     except Exception as e:
         logger.exception("Failed to execute COPY for %s", sql_ffn)
+        if conn is not None:
+            db_putconn(db, conn)
         return "Failed to execute COPY for " + sql_ffn + "; ErrMsg: " + str(e)
+    finally:
+        if close_infile and infile is not None:
+            infile.close()
 
 
 def arg_parse(argv=None):
@@ -1404,8 +4584,94 @@ def arg_parse(argv=None):
             "(separated by space), as inclusive endpoints "
             "to RE-Import data to database; but can exceed "
             "project data's dates in order to import all.  "
-            "Data is already in ASCII and standard folder "
-            "structure."
+            "Data is read from the consumed .bdat archive, "
+            "and replaces the database rows it covers."
+        ),
+    )
+    parser.add_argument(
+        "--tail",
+        action="store_true",
+        help=(
+            "[optional] only COPY the records appended to the files in "
+            "dataroot since the last --tail run, and leave the files in "
+            "place; see tail_ingest()."
+        ),
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help=(
+            "[optional] keep running, and process each file as soon as "
+            "its upload to dataroot completes; see daemon()."
+        ),
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=5.0,
+        help=(
+            "[optional] with --daemon, seconds between scans of "
+            "dataroot.  Default is 5."
+        ),
+    )
+    parser.add_argument(
+        "--direct",
+        action="store_true",
+        help=(
+            "[optional] decode TOB1, TOB2 & TOB3 files straight into the "
+            "database COPY, without re-reading the TOA5 file."
+        ),
+    )
+    parser.add_argument(
+        "--no-toa5",
+        action="store_true",
+        help=(
+            "[optional] with --direct, do not write the TOA5 "
+            ".dat file to the archive."
+        ),
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help=(
+            "[optional] with --direct, COPY in PostgreSQL's "
+            "binary format instead of text."
+        ),
+    )
+    parser.add_argument(
+        "--high-water",
+        action="store_true",
+        help=(
+            "[optional] with --direct, only COPY the records above "
+            "the newest TIMESTAMP & RECORD already COPYed from the "
+            "same logger & table, e.g. of re-sent ring data."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "[optional] number of files to process at once, "
+            "each in its own process.  Default is 1."
+        ),
+    )
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=1,
+        help=(
+            "[optional] with --direct, number of processes "
+            "decoding the frames of each TOB3 file.  Default is 1."
+        ),
+    )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help=(
+            "[optional] also write each file's decoded columns "
+            "to a .parquet file, next to its TOA5 file; needs "
+            "pyarrow."
         ),
     )
     parser.add_argument(
@@ -1427,6 +4693,29 @@ def glob_re(pattern, strings):
     return filter(re.compile(pattern).match, strings)
 
 
+def lock_files(dirpath, fnames):
+    """
+    Rename files to "fn.lock", for bin2pg_file().
+
+    Returns
+    -------
+    list of strings
+        the file names locked; those gone already, e.g. locked by another
+        run, are left out.
+    """
+    locked = []
+    for fn in fnames:
+        # Move file to a new name to prevent races
+        try:
+            os.rename(
+                os.path.join(dirpath, fn), os.path.join(dirpath, f"{fn}.lock")
+            )
+        except FileNotFoundError:
+            continue
+        locked.append(fn)
+    return locked
+
+
 def arg_check(args):
     """
     check the arguments for validtity and set other variables as necessicary.
@@ -1443,8 +4732,30 @@ def arg_check(args):
     logger = logging.getLogger(__name__)
     # dirpath
     dirpath = args.dataroot
+    # dates
+    dates = None
+    if args.dates:
+        try:
+            dates = [
+                datetime.datetime.strptime(xx, "%Y-%m-%d").date()
+                for xx in args.dates
+            ]
+        except ValueError:
+            logger.error("dates must be 'YYYY-MM-DD':  %s\nABORT!", args.dates)
+            email_exit()
     # fnames
-    if args.filename:
+    if dates:
+        # re-importing from the archive; leave new files alone
+        fnames = []
+    elif args.daemon:
+        # daemon() finds & locks the files itself
+        fnames = []
+    elif args.tail:
+        # files may still grow; leave them unlocked
+        fnames = glob_re(
+            r"^(ham|sto)[SAM]{1}[0-9a-z-_]{5}\.bdat$", os.listdir(dirpath)
+        )
+    elif args.filename:
         # because of the "nargs='+'" this args.filename is a list already
         fnames = args.filename
         checkpath = [
@@ -1461,15 +4772,12 @@ def arg_check(args):
             logger.error("filename does not exist:\n%s\nABORT!", msg)
             email_exit()
     else:
-        fnames = []
-        for fn in glob_re(
-            r"^(ham|sto)[SAM]{1}[0-9a-z-_]{5}\.bdat$", os.listdir(dirpath)
-        ):
-            # Move file to a new name to prevent races
-            os.rename(
-                os.path.join(dirpath, fn), os.path.join(dirpath, f"{fn}.lock")
-            )
-            fnames.append(fn)
+        fnames = lock_files(
+            dirpath,
+            glob_re(
+                r"^(ham|sto)[SAM]{1}[0-9a-z-_]{5}\.bdat$", os.listdir(dirpath)
+            ),
+        )
     # dbconn
     dbconn = CONFIG["dbconn"]
     if args.database:
@@ -1482,91 +4790,849 @@ def arg_check(args):
         for key in argdict.keys():
             logstr += "\t{:<15} - {}".format(key, argdict[key]) + "\n"
         logger.debug("\nOptional Arguments: \n%s", logstr)
-    return dirpath, fnames, dbconn
+    return dirpath, fnames, dbconn, dates
 
 
-def bin2pg(dirpath, fnames, consumed_dir, dbconn):
+def bin2pg_file(
+    dirpath,
+    fn,
+    consumed_dir,
+    dbconn,
+    direct=False,
+    toa5=True,
+    binary=False,
+    decode_workers=1,
+    parquet=False,
+    high_water=False,
+):
     """
-    Convert Binary CSI file and Copy to postgres.
+    Convert one Binary CSI file and Copy to postgres.
+
+    Parameters
+    ----------
+    fn: string
+        file name, as on the datalogger's FTP server; the file itself is
+        "fn.lock", in dirpath.
+
+    Notes
+    -----
+    See bin2pg() for the other parameters.  On success the file is moved to
+        consumed_dir, on failure to dirpath/quarentine.
+    A file with a tail_ingest() checkpoint only has the records after it
+        COPYed, by tail_copy(); the TOA5 (and Parquet) file is still whole.
+    With high_water, only the records above the HIGH_WATER mark of the
+        file's logger & table are decoded, COPYed (and written to Parquet),
+        by decode_new(); the mark is raised after the COPY.  A file without
+        any record above the mark, e.g. a re-send, is moved to
+        dirpath/skipped, apart from the failures in quarentine.
     """
     logger = logging.getLogger(__name__)
-    for fn in fnames:
-        logger.info("%s%s%s", "=" * 10, "{:^20}".format(fn), "=" * 10)
-        # set input and output file names
-        ffn = os.path.join(dirpath, fn) + ".lock"
-        try:
-            # decode filename and create output full-filename
-            toa5_file, valid = decode_filename(fn, dirpath)
-            # just check header for file type
-            with open(ffn, "rb") as rf:
-                file_type = rf.read(6).decode("ascii", "ignore")
-            logger.debug(
-                "file: %s; type: %s; TOA5: %s", fn, file_type, toa5_file
+    logger.info("%s%s%s", "=" * 10, "{:^20}".format(fn), "=" * 10)
+    # set input and output file names
+    ffn = os.path.join(dirpath, fn) + ".lock"
+    result = ""
+    try:
+        # decode filename and create output full-filename
+        toa5_file, valid = decode_filename(fn, dirpath)
+        # just check header for file type
+        with open(ffn, "rb") as rf:
+            file_type = rf.read(6).decode("ascii", "ignore")
+        logger.debug("file: %s; type: %s; TOA5: %s", fn, file_type, toa5_file)
+        sql_ffn = None
+        columns = None
+        tob = file_type in ('"TOB1"', '"TOB2"', '"TOB3"')
+        # records up to a checkpoint were COPYed by tail_ingest()
+        checkpoint = TAIL_CHECKPOINTS.get(fn) if tob else None
+        key = mark = None
+        if direct and tob and high_water:
+            key = high_water_key(read_file_header(ffn))
+            header, columns, mark = decode_new(ffn, HIGH_WATER.get(key))
+        elif direct and tob:
+            header, columns = decode_columns(ffn, workers=decode_workers)
+        if parquet and tob:
+            # before any COPY, so a failure leaves the database untouched
+            if columns is None:
+                header, columns = decode_columns(ffn)
+            write_parquet(
+                toa5_file + ".parquet", columns, toa5_header(header, fn)
             )
-            # call appropriate function
-            if file_type == '"TOB1"':
-                rec_cnt = decode_TOB1(ffn, toa5_file)
-                logger.info("file: %s; records written: %s", fn, rec_cnt)
-            elif file_type == '"TOB3"':
-                rec_cnt = decode_TOB3(ffn, toa5_file)
-                logger.info(
-                    "file: %s; records written: %s; header expected: %s",
-                    fn,
-                    *rec_cnt,
+        # call appropriate function
+        if direct and tob:
+            names = [
+                name for name in columns if name not in ("TIMESTAMP", "RECORD")
+            ]
+            logger.info(
+                "file: %s; records decoded: %s",
+                fn,
+                len(columns["TIMESTAMP"]),
+            )
+            if toa5:
+                # the records above the high-water mark are not the file
+                write_TOA5(ffn, toa5_file, None if high_water else columns)
+                os.rename(toa5_file, toa5_file + ".dat")
+            if (
+                high_water
+                and checkpoint is None
+                and len(columns["TIMESTAMP"]) == 0
+            ):
+                # all below the high-water mark, e.g. a re-sent ring, or an
+                # older file processed after a newer one
+                result = HIGH_WATER_SKIPPED
+                logger.warning("%s: %s %s", fn, result, HIGH_WATER.get(key))
+            elif checkpoint is None:
+                parse_columns = (
+                    parse_columns_pgcopy if binary else parse_columns_sql
                 )
-            elif file_type == '"TOB2"':
-                logger.critical('No script to decode "TOB2" file types')
-            else:
-                logger.error(" unrecognized file type '%s'", file_type)
+                copy_buf, table, db_columns = parse_columns(
+                    columns, names, toa5_file
+                )
+                result = copy2db_execute(
+                    copy_buf, dbconn, table, db_columns, binary=binary
+                )
+                logger.info(result)
+        elif file_type == '"TOB1"':
+            rec_cnt = decode_TOB1(ffn, toa5_file)
+            logger.info("file: %s; records written: %s", fn, rec_cnt)
+        elif file_type == '"TOB3"':
+            rec_cnt = decode_TOB3(ffn, toa5_file)
+            logger.info(
+                "file: %s; records written: %s; header expected: %s",
+                fn,
+                *rec_cnt,
+            )
+        elif file_type == '"TOB2"':
+            # no per-record decoder; TOB2 only uses the frame index
+            rec_cnt = write_TOA5(ffn, toa5_file)
+            logger.info("file: %s; records written: %s", fn, rec_cnt)
+        else:
+            logger.error(" unrecognized file type '%s'", file_type)
 
-            result = ""
-            if os.path.isfile(toa5_file):
-                # rename file, as an atomic action,
-                # after file writing is complete
-                os.rename(toa5_file, toa5_file + ".dat")
+        if os.path.isfile(toa5_file):
+            # rename file, as an atomic action,
+            # after file writing is complete
+            os.rename(toa5_file, toa5_file + ".dat")
 
+            if checkpoint is None:
                 # parse resultant TOA5 file to SQL file
                 sql_ffn, table, columns = parse_TOA5_sql(toa5_file + ".dat")
                 # copy SQL file to database
                 result = copy2db_execute(sql_ffn, dbconn, table, columns)
                 logger.info(result)
-            if result == "COPY Successful.":
-                # Copy the .bdat file to consumed/YYYY/mm/dd/
-                restingplace = "%s/%s" % (
-                    consumed_dir,
-                    valid.strftime("%Y/%m/%d"),
-                )
-                chkmkdir(restingplace)
-                restingfn = "%s/%s_%s" % (
-                    restingplace,
-                    valid.strftime("%Y%m%d%H%M"),
-                    fn,
-                )
-                logger.debug("moving %s to %s", fn, restingfn)
-                os.rename(ffn, restingfn)
+        if checkpoint is not None:
+            result, _, rec_cnt = tail_copy(
+                ffn, fn, dbconn, checkpoint, binary=binary
+            )
+            logger.info(
+                "%s; records after the tail checkpoint: %s", result, rec_cnt
+            )
+        if result == HIGH_WATER_SKIPPED:
+            # not a failure; kept apart from quarentine
+            skipped_path = os.path.join(dirpath, "skipped")
+            chkmkdir(skipped_path)
+            logger.debug("moving %s to %s", fn, skipped_path)
+            os.rename(ffn, os.path.join(skipped_path, fn))
+        elif result == "COPY Successful.":
+            TAIL_CHECKPOINTS.pop(fn, None)
+            if mark is not None:
+                raise_high_water(key, mark)
+            # Copy the .bdat file to consumed/YYYY/mm/dd/
+            restingplace = "%s/%s" % (
+                consumed_dir,
+                valid.strftime("%Y/%m/%d"),
+            )
+            chkmkdir(restingplace)
+            restingfn = "%s/%s_%s" % (
+                restingplace,
+                valid.strftime("%Y%m%d%H%M"),
+                fn,
+            )
+            logger.debug("moving %s to %s", fn, restingfn)
+            os.rename(ffn, restingfn)
+            if file_type in ('"TOB2"', '"TOB3"'):
+                # for extract_window(); the file is consumed either way
+                try:
+                    save_frame_index(restingfn)
+                except Exception as exp:
+                    logger.warning("%s frame index not saved: %s", fn, exp)
+            if sql_ffn is not None:
                 logger.debug("deleteing SQL formated file: %s", sql_ffn)
                 os.remove(sql_ffn)
-            else:
-                raise Exception("DBCopy failed")
-        except ftplib.error_perm as exp:
-            logger.debug(exp)
+        else:
+            raise Exception("DBCopy failed")
+    except ftplib.error_perm as exp:
+        logger.debug(exp)
+    except Exception as exp:
+        logger.debug(exp)
+        quarentine_path = os.path.join(dirpath, "quarentine")
+        chkmkdir(quarentine_path)
+        func = logger.exception if fn[3] != "M" else logger.warning
+        func("%s FAILED. Moved to '%s'", fn, quarentine_path)
+        # move file
+        try:
+            os.rename(ffn, os.path.join(quarentine_path, fn))
+        except Exception:
+            pass
+    finally:
+        try:
+            ftp_del(fn)
         except Exception as exp:
             logger.debug(exp)
-            quarentine_path = os.path.join(dirpath, "quarentine")
-            chkmkdir(quarentine_path)
-            func = logger.exception if fn[3] != "M" else logger.warning
-            func("%s FAILED. Moved to '%s'", fn, quarentine_path)
-            # move file
-            try:
-                os.rename(ffn, os.path.join(quarentine_path, fn))
-            except Exception:
-                pass
-        finally:
-            try:
-                ftp_del(fn)
-            except Exception as exp:
-                logger.debug(exp)
-                logger.warning(exp)
+            logger.warning(exp)
+
+
+def bin2pg(
+    dirpath,
+    fnames,
+    consumed_dir,
+    dbconn,
+    direct=False,
+    toa5=True,
+    binary=False,
+    workers=1,
+    decode_workers=1,
+    parquet=False,
+    high_water=False,
+):
+    """
+    Convert Binary CSI file and Copy to postgres.
+
+    Parameters
+    ----------
+    direct: boolean [optional]
+        decode TOB files straight into an in-memory COPY stream, with
+        parse_columns_sql(), instead of re-reading the TOA5 file.
+    toa5: boolean [optional]
+        with direct, also write the TOA5 .dat file for the archive.
+    binary: boolean [optional]
+        with direct, COPY in PostgreSQL's binary format, with
+        parse_columns_pgcopy().
+    workers: integer [optional]
+        number of files processed at once, by bin2pg_pool(); default is
+        one at a time, in this process.
+    decode_workers: integer [optional]
+        with direct, number of processes decoding each TOB3 file, with
+        decode_TOB3_parallel().
+    parquet: boolean [optional]
+        also write the decoded columns to a Parquet file, next to the TOA5
+        file, with write_parquet().
+    high_water: boolean [optional]
+        with direct, skip the records at or below the HIGH_WATER mark of
+        each file's logger & table, with decode_new().
+
+    Notes
+    -----
+    The files are processed by site & table, in valid time order; see
+        sort_uploads().
+    """
+    fnames = sort_uploads(fnames)
+    if workers > 1 and len(fnames) > 1:
+        bin2pg_pool(
+            dirpath,
+            fnames,
+            consumed_dir,
+            dbconn,
+            workers,
+            direct=direct,
+            toa5=toa5,
+            binary=binary,
+            decode_workers=decode_workers,
+            parquet=parquet,
+            high_water=high_water,
+        )
+        return
+    for fn in fnames:
+        bin2pg_file(
+            dirpath,
+            fn,
+            consumed_dir,
+            dbconn,
+            direct=direct,
+            toa5=toa5,
+            binary=binary,
+            decode_workers=decode_workers,
+            parquet=parquet,
+            high_water=high_water,
+        )
+
+
+# state of a bin2pg_pool() worker process; empty in the main process
+POOL_WORKER = {}
+
+
+def pool_log_filter(record):
+    """Prefix a worker's log messages with the file it is processing."""
+    record.msg = "{}: {}".format(POOL_WORKER["fn"], record.msg)
+    return True
+
+
+def bin2pg_worker_init(log_queue, level):
+    """
+    Initialize a bin2pg_pool() worker process.
+
+    Parameters
+    ----------
+    log_queue: multiprocessing.Queue
+        log records are sent to the main process, whose handlers write them;
+        the log files are not written by several processes at once.
+    level: integer
+        level of this module's logger, e.g. DEBUG from --debug
+    """
+    POOL_WORKER["fn"] = ""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(pool_log_filter)
+    root.addHandler(handler)
+    logging.getLogger(__name__).setLevel(level)
+    # the worker's pooled connections are closed when the pool shuts down
+    multiprocessing.util.Finalize(None, db_closeall, exitpriority=10)
+
+
+def bin2pg_worker(dirpath, fnames, consumed_dir, dbconn, kwargs):
+    """
+    Run bin2pg_file() in a bin2pg_pool() worker process, for each file in
+    order.
+
+    Returns
+    -------
+    aborted: boolean
+        email_exit() was called
+    msg: string
+        message given to email_exit()
+    headers: list
+        header lines of the schemas compiled by this worker, for the main
+        process' schema cache
+    marks: dictionary
+        this worker's HIGH_WATER marks, raised in the main process
+    """
+    aborted, msg = False, ""
+    for fn in fnames:
+        POOL_WORKER["fn"] = fn
+        try:
+            bin2pg_file(dirpath, fn, consumed_dir, dbconn, **kwargs)
+        except SystemExit as exp:
+            aborted, msg = True, str(exp.code or "")
+            break
+    headers = [schema["header"] for schema in SCHEMA_CACHE.values()]
+    return aborted, msg, headers, HIGH_WATER
+
+
+def bin2pg_pool(dirpath, fnames, consumed_dir, dbconn, workers, **kwargs):
+    """
+    Process files with bin2pg_file(), in a pool of worker processes.
+
+    Parameters
+    ----------
+    workers: integer
+        number of worker processes
+    kwargs:
+        passed to bin2pg_file()
+
+    Notes
+    -----
+    Each file keeps its own lock, consumed & quarentine handling, in its
+        worker.  A worker's email_exit() only stops that worker; the files not
+        yet started are then left locked, as in a serial run, and the email
+        is sent once, by this process, after the pool is done and the
+        workers' log records are written.
+    With high_water, the files of each site & table are processed in order
+        by one worker, so that its HIGH_WATER mark is raised file by file;
+        see bin2pg().
+    """
+    logger = logging.getLogger(__name__)
+    logger.info("processing %s files with %s workers", len(fnames), workers)
+    if kwargs.get("high_water"):
+        by_table = {}
+        for fn in fnames:
+            by_table.setdefault(fn[:4], []).append(fn)
+        groups = list(by_table.values())
+    else:
+        groups = [[fn] for fn in fnames]
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *logging.getLogger().handlers, respect_handler_level=True
+    )
+    listener.start()
+    abort_msgs = []
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=bin2pg_worker_init,
+            initargs=(log_queue, logging.getLogger(__name__).level),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    bin2pg_worker, dirpath, group, consumed_dir, dbconn, kwargs
+                ): group[0]
+                for group in groups
+            }
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    aborted, msg, headers, marks = future.result()
+                except Exception:
+                    logger.exception("%s worker FAILED", futures[future])
+                    continue
+                for header in headers:
+                    get_schema(header)
+                for key, mark in marks.items():
+                    raise_high_water(key, mark)
+                if aborted:
+                    abort_msgs.append(msg)
+                    for pending in futures:
+                        pending.cancel()
+    finally:
+        listener.stop()
+    if abort_msgs:
+        email_exit(abort_msgs[0])
+
+
+def tail_copy(ffn, fn, dbconn, checkpoint, binary=False):
+    """
+    COPY the records of a growing file, which follow its checkpoint.
+
+    Parameters
+    ----------
+    ffn: string
+        full file name
+    fn: string
+        file name, as on the datalogger's FTP server; for the site & table
+    dbconn: dictionary
+        database connection, see copy2db_execute()
+    checkpoint: dictionary or None
+        from decode_tail()
+    binary: boolean [optional]
+        COPY in PostgreSQL's binary format, with parse_columns_pgcopy()
+
+    Returns
+    -------
+    result: string
+        from copy2db_execute(); "COPY Successful." when there is nothing new
+    checkpoint: dictionary
+        the new checkpoint, valid only if the COPY succeeded
+    rec_cnt: integer
+        number of records COPYed
+    """
+    header, columns, checkpoint = decode_tail(ffn, checkpoint)
+    rec_cnt = len(columns["TIMESTAMP"])
+    if rec_cnt == 0:
+        return "COPY Successful.", checkpoint, 0
+    names = [name for name in columns if name not in ("TIMESTAMP", "RECORD")]
+    parse_columns = parse_columns_pgcopy if binary else parse_columns_sql
+    copy_buf, table, db_columns = parse_columns(
+        columns, names, "{}_{}_tail".format(fn[:3], table_code[fn[3]])
+    )
+    result = copy2db_execute(
+        copy_buf, dbconn, table, db_columns, binary=binary
+    )
+    return result, checkpoint, rec_cnt
+
+
+def tail_ingest(dirpath, fnames, dbconn, binary=False):
+    """
+    COPY the records appended to files, which are still being written or
+    transferred, since the last run.
+
+    Parameters
+    ----------
+    dirpath: string
+        directory of the files
+    fnames: list of strings
+        file names, as on the datalogger's FTP server
+    dbconn: dictionary
+        database connection, see copy2db_execute()
+    binary: boolean [optional]
+        COPY in PostgreSQL's binary format, with parse_columns_pgcopy()
+
+    Returns
+    -------
+    rec_cnt: integer
+        number of records COPYed
+
+    Notes
+    -----
+    The files are left in place, and their checkpoints are kept in
+        TAIL_CHECKPOINTS; a checkpoint only moves after a successful COPY.
+        When the whole file is processed by bin2pg_file(), only the records
+        after its checkpoint are COPYed.
+    """
+    logger = logging.getLogger(__name__)
+    rec_total = 0
+    for fn in fnames:
+        try:
+            result, checkpoint, rec_cnt = tail_copy(
+                os.path.join(dirpath, fn),
+                fn,
+                dbconn,
+                TAIL_CHECKPOINTS.get(fn),
+                binary=binary,
+            )
+        except Exception as exp:
+            # e.g. an empty file, or a header not written whole yet
+            logger.warning("%s tail not decoded: %s", fn, exp)
+            continue
+        if result == "COPY Successful.":
+            TAIL_CHECKPOINTS[fn] = checkpoint
+            rec_total += rec_cnt
+            logger.info("file: %s; new records: %s", fn, rec_cnt)
+        else:
+            logger.error("%s tail COPY failed: %s", fn, result)
+    return rec_total
+
+
+def reimport_plan(consumed_dir, dates):
+    """
+    List the site & table combinations archived within a date range.
+
+    Parameters
+    ----------
+    consumed_dir: string
+        root of the consumed/YYYY/MM/DD tree
+    dates: list of datetime.date
+        first & last date, inclusive
+
+    Returns
+    -------
+    list of tuples
+        (site, table), e.g. ("ham", "sonic"), sorted.
+    """
+    found = set()
+    for dir_rel in directory_traverse(consumed_dir, dates):
+        for fn in os.listdir(os.path.join(consumed_dir, dir_rel)):
+            match = ARCHIVE_FN_RE.match(fn)
+            if match is not None:
+                found.add((match.group(2), table_code[match.group(3)]))
+    return sorted(found)
+
+
+def reimport(consumed_dir, dates, dbconn, workers=1, binary=False):
+    """
+    Re-load the database from the consumed .bdat archive, for a date range.
+
+    Parameters
+    ----------
+    consumed_dir: string
+        root of the consumed/YYYY/MM/DD tree
+    dates: list of datetime.date
+        first & last date, inclusive, in UTC
+    dbconn: dictionary
+        database connection, see copy2db_execute()
+    workers: integer [optional]
+        number of processes decoding files at once
+    binary: boolean [optional]
+        COPY in PostgreSQL's binary format, with parse_columns_pgcopy()
+
+    Returns
+    -------
+    rec_cnt: integer
+        number of records COPYed
+    failed: integer
+        number of (day, site, table) chunks, whose COPY failed
+
+    Notes
+    -----
+    Each day of each site & table is one chunk: its files are found with
+        archive_files(), and only the fields all of them hold are decoded.
+        The rows of that tower within the files' archive_span(), clipped to
+        the day, are deleted, and replaced with one COPY, in one
+        transaction.  The COPY is streamed from archive_batches() by a
+        CopyStream, so a chunk never holds the whole day.  Days without
+        archived records are left untouched.
+    One process pool, of workers processes, decodes the files of all
+        chunks.
+    """
+    logger = logging.getLogger(__name__)
+    plan = reimport_plan(consumed_dir, dates)
+    days = [
+        dates[0] + datetime.timedelta(days=ii)
+        for ii in range((dates[1] - dates[0]).days + 1)
+    ]
+    nchunks = len(days) * len(plan)
+    logger.info(
+        "reimporting %s to %s; %s site/tables; %s chunks",
+        dates[0],
+        dates[1],
+        len(plan),
+        nchunks,
+    )
+    rec_cnt, failed, chunk = 0, 0, 0
+    time_start = datetime.datetime.now()
+    with contextlib.ExitStack() as stack:
+        executor = None
+        if workers > 1:
+            executor = stack.enter_context(
+                concurrent.futures.ProcessPoolExecutor(workers)
+            )
+        for day in days:
+            start = np.datetime64(day, "ns")
+            end = start + np.timedelta64(1, "D")
+            for site, table in plan:
+                chunk += 1
+                ffns = archive_files(consumed_dir, site, table, start, end)
+                nrec = 0
+                if ffns:
+                    nrec, ok = reimport_chunk(
+                        ffns,
+                        start,
+                        end,
+                        dbconn,
+                        "{}_{}_{:%y%m%d}".format(site, table, day),
+                        executor=executor,
+                        ahead=workers,
+                        binary=binary,
+                    )
+                    if ok:
+                        rec_cnt += nrec
+                    else:
+                        failed += 1
+                elapsed = (
+                    datetime.datetime.now() - time_start
+                ).total_seconds()
+                logger.info(
+                    "chunk %s/%s; %s %s %s; records: %s; total: %s; "
+                    "%.0f records/s",
+                    chunk,
+                    nchunks,
+                    day,
+                    site,
+                    table,
+                    nrec,
+                    rec_cnt,
+                    rec_cnt / max(elapsed, 1e-6),
+                )
+    return rec_cnt, failed
+
+
+def reimport_chunk(
+    ffns, start, end, dbconn, label, executor=None, ahead=1, binary=False
+):
+    """
+    Replace one tower's rows of a time range, with the records of archived
+        files; see reimport().
+
+    Parameters
+    ----------
+    ffns: list of strings
+        full file names of one site & table, from archive_files()
+    start, end: numpy.datetime64
+        start <= TIMESTAMP < end
+    dbconn: dictionary
+        database connection, see copy2db_execute()
+    label: string
+        "site_table_yymmdd", the name of the COPY stream; see
+        parse_columns_sql()
+    executor, ahead: [optional]
+        see archive_batches()
+    binary: boolean [optional]
+        COPY in PostgreSQL's binary format
+
+    Returns
+    -------
+    nrec: integer
+        number of records in the COPY
+    ok: boolean
+        False when the COPY failed
+    """
+    logger = logging.getLogger(__name__)
+    names = None
+    for ffn in ffns:
+        fields = get_schema(read_file_header(ffn))["names"]
+        names = fields if names is None else [n for n in names if n in fields]
+    spans = [archive_span(ffn) for ffn in ffns]
+    span = [
+        value.astype("datetime64[us]").item().replace(tzinfo=pytz.utc)
+        for value in (
+            max(start, min(first for first, _ in spans)),
+            min(end - np.timedelta64(1, "us"), max(last for _, last in spans)),
+        )
+    ]
+    stream = CopyStream(
+        archive_batches(
+            ffns, start, end, names, executor=executor, ahead=ahead
+        ),
+        label,
+        binary=binary,
+    )
+    if stream.table is None:
+        return 0, True
+    site = label.split("_")[0]
+    result = copy2db_execute(
+        stream,
+        dbconn,
+        stream.table,
+        stream.columns,
+        binary=binary,
+        replace=(CHN_CODE["sites"][site], span[0], span[1]),
+    )
+    if result != "COPY Successful.":
+        logger.error("%s: %s", label, result)
+        return stream.nrec, False
+    return stream.nrec, True
+
+
+# state of daemon(); "stop" is set by SIGTERM & SIGINT
+DAEMON = {"stop": False}
+
+
+def daemon_stop(signum, frame):
+    """Signal handler; daemon() stops after the files it is processing."""
+    logging.getLogger(__name__).info("signal %s; stopping", signum)
+    DAEMON["stop"] = True
+
+
+def watch_dataroot(dirpath):
+    """
+    Watch a directory for files closed after writing, or moved into it.
+
+    Returns
+    -------
+    inotify_simple.INotify or None
+        None without inotify_simple, or when the watch cannot be added, e.g.
+        on a network file system; daemon() then polls.
+    """
+    logger = logging.getLogger(__name__)
+    if inotify_simple is None:
+        logger.info("inotify_simple not installed; polling %s", dirpath)
+        return None
+    try:
+        inotify = inotify_simple.INotify()
+        inotify.add_watch(
+            dirpath,
+            inotify_simple.flags.CLOSE_WRITE | inotify_simple.flags.MOVED_TO,
+        )
+    except OSError as exp:
+        logger.warning("no inotify watch (%s); polling %s", exp, dirpath)
+        return None
+    return inotify
+
+
+def wait_uploads(inotify, timeout):
+    """
+    Wait for files to be closed in, or moved into, the watched directory.
+
+    Parameters
+    ----------
+    inotify: inotify_simple.INotify or None
+        from watch_dataroot(); None only sleeps
+    timeout: float
+        seconds
+
+    Returns
+    -------
+    set of strings
+        names of the files closed or moved in
+    """
+    if inotify is None:
+        time.sleep(timeout)
+        return set()
+    # a short read delay gathers the events of a burst of uploads
+    events = inotify.read(timeout=int(timeout * 1000), read_delay=200)
+    return {event.name for event in events}
+
+
+def ready_uploads(dirpath, seen, closed=(), settle=10.0):
+    """
+    Find the completely uploaded files in a directory.
+
+    Parameters
+    ----------
+    dirpath: string
+        directory of the uploads, i.e. dataroot
+    seen: dictionary
+        file name --> (size, mtime) of the previous call; updated in place
+    closed: set of strings [optional]
+        file names closed after writing, from wait_uploads()
+    settle: float [optional]
+        seconds a file must be unchanged, when it was not seen closed
+
+    Returns
+    -------
+    list of strings
+        file names, by site & table, then valid time; see sort_uploads()
+    """
+    now = time.time()
+    current = {}
+    ready = []
+    for fn in glob_re(
+        r"^(ham|sto)[SAM]{1}[0-9a-z-_]{5}\.bdat$", os.listdir(dirpath)
+    ):
+        try:
+            stat = os.stat(os.path.join(dirpath, fn))
+        except FileNotFoundError:
+            continue
+        current[fn] = (stat.st_size, stat.st_mtime)
+        if fn in closed or (
+            seen.get(fn) == current[fn] and now - stat.st_mtime >= settle
+        ):
+            ready.append(fn)
+    seen.clear()
+    seen.update(current)
+    return sort_uploads(ready)
+
+
+def daemon(dirpath, consumed_dir, dbconn, poll=5.0, settle=10.0, **kwargs):
+    """
+    Process the uploads to dataroot as they complete, until SIGTERM.
+
+    Parameters
+    ----------
+    dirpath: string
+        directory of the uploads, i.e. dataroot
+    consumed_dir: string
+        see bin2pg()
+    dbconn: dictionary
+        database connection
+    poll: float [optional]
+        seconds between scans of dirpath; with inotify, the longest wait
+        between them
+    settle: float [optional]
+        seconds a file must be unchanged, to be complete, when its closing
+        was not seen by inotify
+    kwargs:
+        passed to bin2pg()
+
+    Notes
+    -----
+    The one process keeps the imports, SCHEMA_CACHE, HIGH_WATER and
+        the pooled database connections between files, instead of a run
+        every 10 minutes by cron.  Files are locked like arg_check() does, so
+        a cron run alongside does not process them twice.  The schema cache
+        (and high-water marks) are saved after each batch of files.  An
+        email_exit() still ends the daemon, as it ends a cron run.
+    """
+    logger = logging.getLogger(__name__)
+    DAEMON["stop"] = False
+    handlers = {
+        signum: signal.signal(signum, daemon_stop)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    inotify = watch_dataroot(dirpath)
+    schema_cache_fn = os.path.join(dirpath, "schema_cache.json")
+    seen = {}
+    closed = set()
+    logger.info("daemon watching %s", dirpath)
+    while not DAEMON["stop"]:
+        fnames = lock_files(
+            dirpath, ready_uploads(dirpath, seen, closed, settle)
+        )
+        if fnames:
+            schema_cnt = len(SCHEMA_CACHE)
+            bin2pg(dirpath, fnames, consumed_dir, dbconn, **kwargs)
+            if len(SCHEMA_CACHE) != schema_cnt:
+                save_schema_cache(schema_cache_fn)
+            if kwargs.get("high_water"):
+                save_high_water(os.path.join(dirpath, "high_water.json"))
+            logger.info("daemon processed %s files", len(fnames))
+        if not DAEMON["stop"]:
+            closed = wait_uploads(inotify, poll)
+    if inotify is not None:
+        inotify.close()
+    db_closeall()
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+    logger.info("daemon stopped")
 
 
 def main(argv):
@@ -1578,13 +5644,77 @@ def main(argv):
     # parse the args, from Command Line
     args = arg_parse(argv)
     # check the args
-    (dirpath, fnames, dbconn) = arg_check(args)
+    (dirpath, fnames, dbconn, dates) = arg_check(args)
+
+    # warm the decoders' schema cache
+    schema_cache_fn = os.path.join(dirpath, "schema_cache.json")
+    schema_cnt = load_schema_cache(schema_cache_fn)
+
+    # checkpoints of growing files
+    tail_fn = os.path.join(dirpath, "tail_checkpoints.json")
+    load_tail_checkpoints(tail_fn)
+    # newest records COPYed, by logger & table
+    high_water_fn = os.path.join(dirpath, "high_water.json")
+    if args.high_water:
+        load_high_water(high_water_fn)
 
     # set consumed directory
     consumed_dir = os.path.join(dirpath, "consumed")
     chkmkdir(consumed_dir)
-    # CSI binary
-    bin2pg(dirpath, fnames, consumed_dir, dbconn)
+    if dates:
+        reimport(
+            consumed_dir,
+            dates,
+            dbconn,
+            workers=args.workers,
+            binary=args.binary,
+        )
+    elif args.tail:
+        tail_ingest(dirpath, fnames, dbconn, binary=args.binary)
+    elif args.daemon:
+        daemon(
+            dirpath,
+            consumed_dir,
+            dbconn,
+            poll=args.poll,
+            direct=args.direct,
+            toa5=not args.no_toa5,
+            binary=args.binary,
+            workers=args.workers,
+            decode_workers=args.decode_workers,
+            parquet=args.parquet,
+            high_water=args.high_water,
+        )
+    else:
+        # CSI binary
+        bin2pg(
+            dirpath,
+            fnames,
+            consumed_dir,
+            dbconn,
+            direct=args.direct,
+            toa5=not args.no_toa5,
+            binary=args.binary,
+            workers=args.workers,
+            decode_workers=args.decode_workers,
+            parquet=args.parquet,
+            high_water=args.high_water,
+        )
+        if args.high_water:
+            save_high_water(high_water_fn)
+
+    if len(SCHEMA_CACHE) != schema_cnt:
+        save_schema_cache(schema_cache_fn)
+    # forget the checkpoints of files no longer in dataroot; the pool's
+    # workers do not report theirs
+    for fn in list(TAIL_CHECKPOINTS):
+        if not any(
+            os.path.isfile(os.path.join(dirpath, fn + ext))
+            for ext in ("", ".lock")
+        ):
+            del TAIL_CHECKPOINTS[fn]
+    save_tail_checkpoints(tail_fn)
+    db_closeall()
 
 
 if __name__ == "__main__":
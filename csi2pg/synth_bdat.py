@@ -0,0 +1,202 @@
+"""Write synthetic .bdat files, for load & scale testing
+
+Every template file (default examples/*.bdat) is repeated for each site,
+as files of --file-minutes, over --hours from --start; named like the
+datalogger's uploads, so bin2pg can ingest them.  One template is used per
+site & table, preferably the site's own.  The values are the
+template's own records, tiled; TIMESTAMP & RECORD continue from file to
+file.
+
+Run from this directory, like csi2pg.py:
+
+    python synth_bdat.py OUTDIR [files ...] [--hours 24] [--sites ham sto]
+"""
+
+import argparse
+import datetime
+import glob
+import logging
+import os
+import sys
+
+import numpy as np
+
+import csi2pg
+
+EXAMPLES = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "examples"
+)
+
+# custom base 38 digits of the datalogger's file names, see csi2pg.b38()
+B38_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz-_"
+
+
+def encode_filename(site, table_letter, valid):
+    """
+    Name a file like the datalogger; the inverse of csi2pg.decode_filename().
+
+    Parameters
+    ----------
+    site: string
+        "ham" or "sto"
+    table_letter: string
+        "S", "A" or "M"; see csi2pg.table_code
+    valid: datetime.datetime
+        the end of the file's records, in whole minutes
+
+    Returns
+    -------
+    fn: string
+        e.g. "stoSg8muk.bdat"
+    """
+    minutes = valid.hour * 60 + valid.minute
+    digits = [valid.year - 2000, valid.month, valid.day]
+    digits += divmod(minutes, 38)
+    return "%s%s%s.bdat" % (
+        site,
+        table_letter,
+        "".join(B38_DIGITS[xx] for xx in digits),
+    )
+
+
+def record_interval(header, columns):
+    """Record interval of a template file, as numpy.timedelta64[ns]."""
+    if header[0][0] != "TOB1":
+        return np.timedelta64(csi2pg.get_schema(header)["interval_ns"], "ns")
+    return np.median(np.diff(columns["TIMESTAMP"])).astype("timedelta64[ns]")
+
+
+def synth_files(ffn, outdir, sites, start, hours, file_minutes, **kwargs):
+    """
+    Write the synthetic files of one template.
+
+    Parameters
+    ----------
+    ffn: string
+        template TOB1 or TOB3 file, named like the datalogger's uploads
+    outdir: string
+        directory to write to
+    sites: list of strings
+        e.g. ["ham", "sto"]
+    start: datetime.datetime
+        first TIMESTAMP
+    hours, file_minutes: float
+        total span, and span of each file
+    kwargs:
+        passed on to csi2pg.write_TOB3()
+
+    Returns
+    -------
+    list of strings
+        full file names written
+    """
+    header, template = csi2pg.decode_columns(ffn)
+    interval = record_interval(header, template)
+    per_file = int(np.timedelta64(int(file_minutes * 60), "s") / interval)
+    nfiles = int(round(hours * 60 / file_minutes))
+    letter = os.path.basename(ffn)[3]
+    written = []
+    for site in sites:
+        for ii in range(nfiles):
+            rec = np.arange(ii * per_file, (ii + 1) * per_file)
+            columns = {
+                name: column[rec % len(column)]
+                for name, column in template.items()
+            }
+            columns["TIMESTAMP"] = np.datetime64(start, "ns") + rec * interval
+            columns["RECORD"] = rec
+            valid = start + datetime.timedelta(minutes=(ii + 1) * file_minutes)
+            out_ffn = os.path.join(
+                outdir, encode_filename(site, letter, valid)
+            )
+            if header[0][0] == "TOB1":
+                csi2pg.write_TOB1(out_ffn, header, columns)
+            else:
+                csi2pg.write_TOB3(out_ffn, header, columns, **kwargs)
+            written.append(out_ffn)
+    return written
+
+
+def plan_templates(fnames, sites):
+    """
+    Choose one template per site & table letter; the output file names
+    only hold those, so a second template would overwrite the first's files.
+
+    Parameters
+    ----------
+    fnames: list of strings
+        template files, named like the datalogger's uploads
+    sites: list of strings
+        e.g. ["ham", "sto"]
+
+    Returns
+    -------
+    list of (string, string)
+        (template, site), in order; a site's own template is preferred,
+        else the first one of the table letter.
+    """
+    chosen = {}
+    # the sites' own templates first
+    for own in (True, False):
+        for ffn in fnames:
+            fn = os.path.basename(ffn)
+            for site in sites:
+                if (fn[:3] == site) == own:
+                    chosen.setdefault((site, fn[3]), ffn)
+    return [(ffn, site) for (site, _), ffn in sorted(chosen.items())]
+
+
+def main(argv):
+    """Write synthetic files of the templates into OUTDIR."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("outdir", help="directory to write to")
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="template TOB1 & TOB3 files.  Default examples/*.bdat",
+    )
+    parser.add_argument(
+        "--start",
+        default="2016-08-22 00:00",
+        help="first TIMESTAMP, 'YYYY-MM-DD HH:MM'",
+    )
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--file-minutes", type=float, default=10.0)
+    parser.add_argument("--sites", nargs="+", default=["ham", "sto"])
+    parser.add_argument(
+        "--minor-every",
+        type=int,
+        default=0,
+        help="every n-th TOB3 Major frame holds minor frames",
+    )
+    parser.add_argument(
+        "--empty-every",
+        type=int,
+        default=0,
+        help="every n-th TOB3 Major frame is empty",
+    )
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    start = datetime.datetime.strptime(args.start, "%Y-%m-%d %H:%M")
+    fnames = args.files or sorted(glob.glob(os.path.join(EXAMPLES, "*.bdat")))
+    if not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    total = 0
+    for ffn, site in plan_templates(fnames, args.sites):
+        for out_ffn in synth_files(
+            ffn,
+            args.outdir,
+            [site],
+            start,
+            args.hours,
+            args.file_minutes,
+            minor_every=args.minor_every,
+            empty_every=args.empty_every,
+        ):
+            total += os.path.getsize(out_ffn)
+            print("%s -> %s" % (os.path.basename(ffn), out_ffn))
+    print("%.1f MB written" % (total / 1e6,))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
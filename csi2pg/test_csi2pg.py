@@ -1,8 +1,14 @@
 """Test csi2pg."""
 
 import datetime
+import io
 import os
+import shutil
+import struct
 
+import numpy as np
+import pandas as pd
+import pytest
 import pytz
 
 import csi2pg
@@ -32,3 +38,764 @@ def test_bin2pg():
                 if os.path.isfile(oldfn):
                     stablefn = "%s/%s" % (DATAROOT, fn)
                     os.rename(oldfn, stablefn)
+
+
+def test_bin2pg_workers(tmp_path, monkeypatch):
+    """Files processed by a pool keep their quarentine handling."""
+    monkeypatch.setitem(csi2pg.CONFIG, "dataroot", str(tmp_path))
+    fns = ["hamSg8muk.bdat", "stoAg8muk.bdat"]
+    for fn in fns:
+        shutil.copy(os.path.join(DATAROOT, fn), tmp_path / (fn + ".lock"))
+    consumed_dir = str(tmp_path / "consumed")
+    # no database here, so both COPYs fail
+    csi2pg.bin2pg(
+        str(tmp_path), fns, consumed_dir, csi2pg.CONFIG["dbconn"], workers=2
+    )
+    assert sorted(os.listdir(tmp_path / "quarentine")) == sorted(fns)
+
+
+def test_decode_TOB3_columns():
+    """Test the numpy decoder against the per-record decoder."""
+    ffn = os.path.join(DATAROOT, "hamSg8muk.bdat")
+    header, columns = csi2pg.decode_TOB3_columns(ffn)
+    assert len(columns["RECORD"]) == 12000
+    assert columns["Ux_120m"].dtype == np.float32
+    # first record of the first frame, the hard way
+    with open(ffn, "rb") as rf:
+        csi2pg.read_header(rf, 6)
+        frame = rf.read(int(header[1][2]))
+    dtl = [xx.replace(" ", "") for xx in header[5]]
+    values = csi2pg.decode_data_bin(frame[12:132], dtl, [4] * len(dtl))
+    for name, value in zip(header[2], values):
+        np.testing.assert_equal(columns[name][0], np.float32(value))
+    ts, rec = csi2pg.header_parse(frame[:12], 100)
+    assert columns["RECORD"][0] == rec
+    assert columns["TIMESTAMP"][0] == np.datetime64(ts)
+
+
+def test_iter_batches():
+    """Test batches against the whole-file decoder."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    header, columns = csi2pg.decode_TOB3_columns(ffn)
+    batches = list(csi2pg.iter_batches(ffn, batch_size=1000))
+    assert len(batches) == 12
+    for name, column in columns.items():
+        joined = np.concatenate([batch[name] for batch in batches])
+        np.testing.assert_array_equal(joined, column)
+    assert len(list(csi2pg.iter_batches(ffn))) == 1
+    # TOB1, with SECONDS & NANOSECONDS merged into TIMESTAMP
+    ffn = os.path.join(DATAROOT, "stoAg8muk.bdat")
+    batches = list(csi2pg.iter_batches(ffn, batch_size=250))
+    assert [len(batch["RECORD"]) for batch in batches] == [250, 250, 100]
+    assert "SECONDS" not in batches[0]
+    assert batches[0]["TIMESTAMP"][0] == np.datetime64("2016-08-22 19:10:01")
+
+
+def test_scale_file(tmp_path):
+    """Test the benchmark's scaled copies of the example files."""
+    import bench_csi2pg  # a script, next to csi2pg.py
+
+    for fn in ["stoSg8muk.bdat", "stoAg8muk.bdat"]:
+        header, columns = csi2pg.decode_columns(os.path.join(DATAROOT, fn))
+        nrec = len(columns["RECORD"])
+        scaled = str(tmp_path / fn)
+        rec_cnt = bench_csi2pg.scale_file(
+            os.path.join(DATAROOT, fn), scaled, 3
+        )
+        assert rec_cnt == 3 * nrec
+        header, columns = csi2pg.decode_columns(scaled)
+        assert len(columns["RECORD"]) == rec_cnt
+        assert np.all(np.diff(columns["RECORD"]) == 1)
+        assert len(np.unique(np.diff(columns["TIMESTAMP"]))) == 1
+
+
+def test_decode_TOB3_parallel():
+    """Test decoding over worker processes against a single process."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    header, columns = csi2pg.decode_TOB3_columns(ffn)
+    header, parallel = csi2pg.decode_TOB3_parallel(ffn, 3)
+    assert list(parallel) == list(columns)
+    for name, column in columns.items():
+        np.testing.assert_array_equal(parallel[name], column)
+
+
+def test_write_TOA5(tmp_path):
+    """Test the batched TOA5 writer against the per-record decoder."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    csi2pg.decode_TOB3(ffn, str(tmp_path / "legacy.dat"))
+    assert csi2pg.write_TOA5(ffn, str(tmp_path / "batched.dat")) == 12000
+    with open(tmp_path / "legacy.dat") as fh:
+        expected = fh.read()
+    with open(tmp_path / "batched.dat") as fh:
+        assert fh.read() == expected
+    # already decoded, e.g. by bin2pg_file(direct=True)
+    _, decoded = csi2pg.decode_columns(ffn)
+    csi2pg.write_TOA5(ffn, str(tmp_path / "decoded.dat"), decoded)
+    with open(tmp_path / "decoded.dat") as fh:
+        assert fh.read() == expected
+    columns = {
+        "TIMESTAMP": np.array(
+            ["2016-08-22 19:10:01", "2016-08-22 19:10:01.05"],
+            dtype="datetime64[ns]",
+        ),
+        "Ux": np.array([np.inf, -np.inf], dtype=np.float32),
+        "Ts": np.array([np.nan, 21.5], dtype=np.float32),
+        "Flags": np.array([1, 128], dtype=np.uint8),
+    }
+    data_types = {
+        "TIMESTAMP": "NSec",
+        "Ux": "IEEE4B",
+        "Ts": "FP2",
+        "Flags": "BOOL8",
+    }
+    assert csi2pg.format_TOA5(columns, data_types) == (
+        '"2016-08-22 19:10:01","INF","NAN","10000000"\n'
+        '"2016-08-22 19:10:01.05","-INF",21.5,"00000001"\n'
+    )
+
+
+def test_decode_TOB2_columns(tmp_path):
+    """Test a TOB2 copy of a TOB3 file, without frame record numbers."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    with open(ffn, "rb") as rf:
+        header = csi2pg.read_header(rf, 6)
+        body = rf.read()
+    fs = int(header[1][2])
+    frames = np.frombuffer(body, np.uint8)[: len(body) // fs * fs]
+    frames = frames.reshape(-1, fs)
+    # drop the beginning record number from each frame header
+    frames = np.delete(frames, np.s_[8:12], axis=1)
+    header[0][0] = "TOB2"
+    header[1] = header[1][:6]
+    header[1][2] = str(fs - 4)
+    tob2_ffn = tmp_path / "stoSg8muk.bdat"
+    with open(tob2_ffn, "wb") as fh:
+        for hh in header:
+            fh.write(('"' + '","'.join(hh) + '"\r\n').encode("ascii"))
+        fh.write(frames.tobytes())
+    header, expected = csi2pg.decode_TOB3_columns(ffn)
+    header, columns = csi2pg.decode_TOB3_columns(str(tob2_ffn))
+    assert columns["RECORD"][0] == 0
+    np.testing.assert_array_equal(
+        columns["RECORD"], expected["RECORD"] - expected["RECORD"][0]
+    )
+    for name in ["TIMESTAMP"] + header[2]:
+        np.testing.assert_array_equal(columns[name], expected[name])
+
+
+def test_project_schema():
+    """Test decoding only some fields."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    header, expected = csi2pg.decode_TOB3_columns(ffn)
+    wanted = ["Ts_5m", "Diag_120m", "Diag_5m"]
+    header, columns = csi2pg.decode_TOB3_columns(ffn, columns=wanted)
+    # in the order of the file
+    order = ["TIMESTAMP", "RECORD", "Diag_120m", "Ts_5m", "Diag_5m"]
+    assert list(columns) == order
+    for name, column in columns.items():
+        np.testing.assert_array_equal(column, expected[name])
+    # only the selected fields' bytes are gathered from the frames
+    schema = csi2pg.get_schema(header)
+    assert csi2pg.record_ranges(schema)[0] == [(0, schema["trs"])]
+    projected = csi2pg.project_schema(schema, wanted)
+    _, packed = csi2pg.record_ranges(projected)
+    assert packed.itemsize == sum(projected["bl"]) < schema["trs"]
+    ffn = os.path.join(DATAROOT, "stoAg8muk.bdat")
+    header, columns = csi2pg.decode_TOB1_columns(ffn, columns=["RECORD"])
+    assert list(columns) == ["TIMESTAMP", "RECORD"]
+    with pytest.raises(Exception):
+        csi2pg.decode_TOB1_columns(ffn, columns=["Ux_5m"])
+
+
+def test_extract_window(tmp_path):
+    """Test time window extraction against whole-file decoding."""
+    ffn = str(tmp_path / "stoSg8muk.bdat")
+    shutil.copy(os.path.join(DATAROOT, "stoSg8muk.bdat"), ffn)
+    assert csi2pg.save_frame_index(ffn) == ffn + ".idx"
+    header, expected = csi2pg.decode_TOB3_columns(ffn)
+    start = datetime.datetime(2016, 8, 22, 19, 12, 30, tzinfo=pytz.utc)
+    end = start + datetime.timedelta(seconds=90)
+    header, columns = csi2pg.extract_window(ffn, start, end, ["Ts_5m"])
+    within = (
+        expected["TIMESTAMP"] >= np.datetime64("2016-08-22 19:12:30")
+    ) & (expected["TIMESTAMP"] < np.datetime64("2016-08-22 19:14:00"))
+    assert len(columns["RECORD"]) == 1800
+    for name, column in columns.items():
+        np.testing.assert_array_equal(column, expected[name][within])
+    # TOB1, without a sidecar
+    ffn = os.path.join(DATAROOT, "stoAg8muk.bdat")
+    header, columns = csi2pg.extract_window(
+        ffn, "2016-08-22 19:11", "2016-08-22 19:12"
+    )
+    assert len(columns["RECORD"]) == 60
+    assert columns["TIMESTAMP"][0] == np.datetime64("2016-08-22 19:11:00")
+
+
+def test_query_archive(tmp_path, monkeypatch):
+    """Test merging overlapping files of the consumed tree."""
+    daydir = tmp_path / "2016" / "08" / "22"
+    daydir.mkdir(parents=True)
+    # the same records, uploaded twice, and another site's file
+    for fn in ["stoSg8muk.bdat", "stoSg8mul.bdat", "hamSg8muk.bdat"]:
+        shutil.copy(
+            os.path.join(DATAROOT, fn[:3] + "Sg8muk.bdat"),
+            daydir / ("201608221920_" + fn),
+        )
+    header, expected = csi2pg.decode_TOB3_columns(
+        os.path.join(DATAROOT, "stoSg8muk.bdat"), ["Ux_5m"]
+    )
+    columns = csi2pg.query_archive(
+        "sto",
+        "sonic",
+        "2016-08-22 19:00",
+        "2016-08-22 20:00",
+        ["Ux_5m"],
+        consumed_dir=str(tmp_path),
+        workers=2,
+    )
+    for name, column in expected.items():
+        np.testing.assert_array_equal(columns[name], column)
+    columns = csi2pg.query_archive(
+        "sto", "analog", "2016-08-22", "2016-08-23", consumed_dir=str(tmp_path)
+    )
+    assert len(columns["TIMESTAMP"]) == 0
+    # a backlog, uploaded days after its records, e.g. after an outage
+    backlog = tmp_path / "backlog"
+    for fn in ["stoSg8muk.bdat", "stoAg8muk.bdat"]:
+        daydir = backlog / "2016" / "08" / "25"
+        daydir.mkdir(parents=True, exist_ok=True)
+        shutil.copy(
+            os.path.join(DATAROOT, fn), daydir / ("201608250600_" + fn)
+        )
+    for table, nrec in (("sonic", 12000), ("analog", 600)):
+        columns = csi2pg.query_archive(
+            "sto",
+            table,
+            "2016-08-22 19:00",
+            "2016-08-22 20:00",
+            consumed_dir=str(backlog),
+        )
+        assert len(columns["TIMESTAMP"]) == nrec
+    assert (
+        csi2pg.archive_files(
+            str(backlog),
+            "sto",
+            "sonic",
+            np.datetime64("2016-08-22 20:00"),
+            np.datetime64("2016-08-26"),
+        )
+        == []
+    )
+    # no further ahead than ARCHIVE_MAX_DELAY
+    monkeypatch.setattr(
+        csi2pg, "ARCHIVE_MAX_DELAY", datetime.timedelta(days=1)
+    )
+    assert (
+        csi2pg.archive_files(
+            str(backlog),
+            "sto",
+            "sonic",
+            np.datetime64("2016-08-22 19:00"),
+            np.datetime64("2016-08-22 20:00"),
+        )
+        == []
+    )
+
+
+def test_reimport(tmp_path, monkeypatch):
+    """Test replacing a day's rows from the consumed tree."""
+    daydir = tmp_path / "2016" / "08" / "22"
+    daydir.mkdir(parents=True)
+    shutil.copy(
+        os.path.join(DATAROOT, "stoSg8muk.bdat"),
+        daydir / "201608221920_stoSg8muk.bdat",
+    )
+    # the same records again, uploaded later under another name
+    shutil.copy(
+        os.path.join(DATAROOT, "stoSg8muk.bdat"),
+        daydir / "201608221921_stoSg8mu-.bdat",
+    )
+    calls = []
+
+    def copy2db_execute(sql_ffn, db, table, columns, **kwargs):
+        # the COPY stream is encoded as it is read
+        calls.append((table, kwargs["replace"], sql_ffn.read()))
+        return "COPY Successful."
+
+    monkeypatch.setattr(csi2pg, "copy2db_execute", copy2db_execute)
+    monkeypatch.setattr(csi2pg, "BATCH_SIZE", 1000)
+    dates = [datetime.date(2016, 8, 21), datetime.date(2016, 8, 22)]
+    assert csi2pg.reimport_plan(str(tmp_path), dates) == [("sto", "sonic")]
+    rec_cnt, failed = csi2pg.reimport(str(tmp_path), dates, {}, workers=2)
+    assert (rec_cnt, failed) == (12000, 0)
+    assert len(calls) == 1
+    table, (tower, first, last), data = calls[0]
+    assert table == "data_sonic"
+    assert data.count(b"\n") == 12000
+    assert tower == csi2pg.CHN_CODE["sites"]["sto"]
+    assert first.tzinfo is not None
+    assert last - first == datetime.timedelta(seconds=599.95)
+    # decoded in this process, in binary
+    rec_cnt, failed = csi2pg.reimport(str(tmp_path), dates, {}, binary=True)
+    assert (rec_cnt, failed) == (12000, 0)
+    data = calls[1][2]
+    assert data.startswith(csi2pg.PGCOPY_HEADER)
+    assert data.count(csi2pg.PGCOPY_HEADER) == 1
+    assert data.endswith(csi2pg.PGCOPY_TRAILER)
+    _, columns = csi2pg.decode_columns(
+        os.path.join(DATAROOT, "stoSg8muk.bdat")
+    )
+    names = [name for name in columns if name not in ("TIMESTAMP", "RECORD")]
+    copy_buf, _, _ = csi2pg.parse_columns_pgcopy(
+        columns, names, "sto_sonic_160822"
+    )
+    assert data == copy_buf.getvalue()
+
+
+def test_tail_ingest(tmp_path, monkeypatch):
+    """Test COPYing a growing file's new records, run after run."""
+    with open(os.path.join(DATAROOT, "stoSg8muk.bdat"), "rb") as fh:
+        data = fh.read()
+    ffn = tmp_path / "stoSg8muk.bdat"
+    calls = []
+
+    def copy2db_execute(sql_ffn, db, table, columns, **kwargs):
+        calls.append(table)
+        return "COPY Successful."
+
+    monkeypatch.setattr(csi2pg, "copy2db_execute", copy2db_execute)
+    monkeypatch.setattr(csi2pg, "TAIL_CHECKPOINTS", {})
+    rec_cnts = []
+    # the header is not written whole yet, then the file grows
+    for size in (1000, 5000, 100000, len(data)):
+        ffn.write_bytes(data[:size])
+        rec_cnts.append(
+            csi2pg.tail_ingest(str(tmp_path), [ffn.name], {}, binary=True)
+        )
+    assert rec_cnts[0] == 0
+    assert sum(rec_cnts) == 12000
+    assert csi2pg.TAIL_CHECKPOINTS[ffn.name]["rec"] == 8157084
+    ckpt_fn = str(tmp_path / "tail_checkpoints.json")
+    csi2pg.save_tail_checkpoints(ckpt_fn)
+    csi2pg.TAIL_CHECKPOINTS.clear()
+    assert csi2pg.load_tail_checkpoints(ckpt_fn) == 1
+    assert csi2pg.tail_ingest(str(tmp_path), [ffn.name], {}) == 0
+    assert len(calls) == 3
+
+
+def test_high_water(tmp_path, monkeypatch, caplog):
+    """Test a re-sent file is not COPYed again."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    header, columns = csi2pg.decode_columns(ffn)
+    mark = {"ts": str(columns["TIMESTAMP"][2999]), "rec": -1}
+    _, new, mark = csi2pg.decode_new(ffn, mark)
+    assert len(new["TIMESTAMP"]) == 9000
+    assert new["RECORD"][0] == columns["RECORD"][3000]
+    assert mark["rec"] == columns["RECORD"][-1]
+    _, new, _ = csi2pg.decode_new(ffn, mark)
+    assert len(new["TIMESTAMP"]) == 0
+    # the same file uploaded twice, under two names; "-" sorts before "k",
+    # but is the later valid time
+    fns = ["stoSg8mu-.bdat", "stoSg8muk.bdat"]
+    assert csi2pg.sort_uploads(fns) == fns[::-1]
+    # badly named files follow, in name order: a month of 0, and "!"
+    bad = ["stoS!8muk.bdat", "stoSg0muk.bdat"]
+    assert csi2pg.sort_uploads(bad + fns) == fns[::-1] + bad
+    calls = []
+
+    def copy2db_execute(sql_ffn, db, table, columns, **kwargs):
+        calls.append(table)
+        return "COPY Successful."
+
+    monkeypatch.setattr(csi2pg, "copy2db_execute", copy2db_execute)
+    for workers in (1, 2):
+        monkeypatch.setattr(csi2pg, "HIGH_WATER", {})
+        dirpath = tmp_path / str(workers)
+        dirpath.mkdir()
+        for fn in fns:
+            shutil.copy(ffn, dirpath / (fn + ".lock"))
+        csi2pg.bin2pg(
+            str(dirpath),
+            fns,
+            str(dirpath / "consumed"),
+            {},
+            direct=True,
+            toa5=False,
+            workers=workers,
+            high_water=True,
+        )
+        consumed = os.listdir(dirpath / "consumed" / "2016" / "08" / "22")
+        assert sorted(consumed) == [
+            "201608221920_stoSg8muk.bdat",
+            "201608221920_stoSg8muk.bdat.idx",
+        ]
+        # the re-sent file is kept, but not as a failure
+        assert os.listdir(dirpath / "skipped") == ["stoSg8mu-.bdat"]
+        assert not os.path.isdir(dirpath / "quarentine")
+        assert csi2pg.HIGH_WATER["CR6_1454:CR6_20Hz"] == mark
+    assert len(calls) == 1
+    high_water_fn = str(tmp_path / "high_water.json")
+    csi2pg.save_high_water(high_water_fn)
+    csi2pg.HIGH_WATER.clear()
+    assert csi2pg.load_high_water(high_water_fn) == 1
+    assert csi2pg.HIGH_WATER["CR6_1454:CR6_20Hz"] == mark
+    # without high_water, a file without records is still a failure
+    with open(ffn, "rb") as fh:
+        csi2pg.read_header(fh, 6)
+        size = fh.tell()
+        fh.seek(0)
+        header_only = fh.read(size)
+    dirpath = tmp_path / "empty"
+    dirpath.mkdir()
+    (dirpath / "stoSg8muk.bdat.lock").write_bytes(header_only)
+    csi2pg.bin2pg(
+        str(dirpath),
+        ["stoSg8muk.bdat"],
+        str(dirpath / "consumed"),
+        {},
+        direct=True,
+        toa5=False,
+    )
+    assert os.listdir(dirpath / "quarentine") == ["stoSg8muk.bdat"]
+    assert "0 data rows found" in caplog.text
+    assert len(calls) == 1
+
+
+def test_daemon(tmp_path, monkeypatch):
+    """Test uploads are processed once complete, until stopped."""
+    fn = "stoSg8muk.bdat"
+    shutil.copy(os.path.join(DATAROOT, fn), tmp_path / fn)
+    # an upload still growing
+    (tmp_path / "stoAg8muk.bdat").write_bytes(b"")
+    seen = {}
+    assert csi2pg.ready_uploads(str(tmp_path), seen, settle=0) == []
+    assert csi2pg.ready_uploads(str(tmp_path), seen, settle=0) == [
+        "stoAg8muk.bdat",
+        fn,
+    ]
+    assert csi2pg.ready_uploads(str(tmp_path), seen, {fn}) == [fn]
+    os.remove(tmp_path / "stoAg8muk.bdat")
+    calls = []
+
+    def copy2db_execute(sql_ffn, db, table, columns, **kwargs):
+        calls.append(table)
+        return "COPY Successful."
+
+    def wait_uploads(inotify, timeout):
+        # stop once the file is consumed
+        csi2pg.DAEMON["stop"] = bool(calls)
+        return set()
+
+    monkeypatch.setattr(csi2pg, "copy2db_execute", copy2db_execute)
+    monkeypatch.setattr(csi2pg, "wait_uploads", wait_uploads)
+    monkeypatch.setattr(csi2pg, "SCHEMA_CACHE", {})
+    csi2pg.daemon(
+        str(tmp_path),
+        str(tmp_path / "consumed"),
+        {},
+        settle=0,
+        direct=True,
+        toa5=False,
+    )
+    assert calls == ["data_sonic"]
+    assert not os.path.exists(tmp_path / fn)
+    assert os.path.isfile(tmp_path / "schema_cache.json")
+
+
+def test_db_pool(monkeypatch):
+    """Test COPYs share a connection, and reconnect when it breaks."""
+    log = []
+
+    class Conn:
+        """Enough of a psycopg2 connection; breaks at the given COPY."""
+
+        def __init__(self, dsn):
+            self.closed = 0
+            log.append("connect")
+
+        def cursor(self):
+            return self
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def execute(self, sql, args=None):
+            if sql == "SELECT 1" and "drop" in log:
+                self.closed = 2
+                raise csi2pg.psycopg2.OperationalError("server closed")
+            log.append(sql)
+
+        def copy_from(self, infile, table, columns):
+            if "break" in log:
+                log.remove("break")
+                infile.read()
+                self.closed = 2
+                raise csi2pg.psycopg2.OperationalError("server closed")
+            log.append(infile.read())
+
+        def commit(self):
+            pass
+
+        rollback = close = commit
+
+    monkeypatch.setattr(csi2pg.psycopg2, "connect", Conn)
+    monkeypatch.setattr(csi2pg, "DB_POOL", {})
+    db = {"hostname": "h", "dbname": "d", "dbuser": "u", "dbpass": "p"}
+    for extra in ([], ["break"], ["drop"]):
+        log.extend(extra)
+        result = csi2pg.copy2db_execute(
+            io.StringIO("rows"), db, "sonic", ("valid",)
+        )
+        assert result == "COPY Successful."
+    assert log.count("connect") == 3
+    assert log.count("SET timezone = 'UTC'") == 3
+    assert log.count("rows") == 3
+    csi2pg.db_closeall()
+    assert csi2pg.DB_POOL == {}
+
+
+def test_write_parquet(tmp_path):
+    """Test the typed columnar output."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    header, columns = csi2pg.decode_columns(ffn)
+    parquet_file = str(tmp_path / "sto_sonic_160822-1920.parquet")
+    csi2pg.write_parquet(
+        parquet_file, columns, csi2pg.toa5_header(header, "stoSg8muk.bdat")
+    )
+    table = pq.read_table(parquet_file)
+    assert table.num_rows == 12000
+    assert str(table.schema.field("Ux_5m").type) == "float"
+    assert table.schema.field("Ux_5m").metadata[b"units"] == b"m/s"
+    np.testing.assert_array_equal(
+        table.column("Ux_5m").to_numpy(), columns["Ux_5m"]
+    )
+
+
+def test_encode_fp2():
+    """Test every FP2 value survives encoding."""
+    values = csi2pg.decode_fp2(np.arange(65536, dtype=np.uint16))
+    np.testing.assert_array_equal(
+        csi2pg.decode_fp2(csi2pg.encode_fp2(values)), values
+    )
+
+
+def test_write_TOB1(tmp_path):
+    """Test the TOB1 writer reproduces the example file."""
+    ffn = os.path.join(DATAROOT, "stoAg8muk.bdat")
+    header, columns = csi2pg.decode_TOB1_columns(ffn)
+    out_ffn = str(tmp_path / "stoAg8muk.bdat")
+    assert csi2pg.write_TOB1(out_ffn, header, columns) == 600
+    with open(ffn, "rb") as fh, open(out_ffn, "rb") as fh2:
+        assert fh.read() == fh2.read()
+
+
+def test_write_TOB3(tmp_path):
+    """Test TOB3 round trips, with minor, empty and invalid frames."""
+    import synth_bdat  # a script, next to csi2pg.py
+
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    valid = datetime.datetime(2016, 8, 22, 19, 20)
+    assert synth_bdat.encode_filename("sto", "S", valid) == "stoSg8muk.bdat"
+    # one template per site & table; the site's own sonic template
+    templates = ["hamSg8muk.bdat", "stoAg8muk.bdat", "stoSg8muk.bdat"]
+    assert synth_bdat.plan_templates(templates, ["ham", "sto"]) == [
+        ("stoAg8muk.bdat", "ham"),
+        ("hamSg8muk.bdat", "ham"),
+        ("stoAg8muk.bdat", "sto"),
+        ("stoSg8muk.bdat", "sto"),
+    ]
+    header, columns = csi2pg.decode_TOB3_columns(ffn)
+    # the example's frames hold one record each
+    out_ffn = str(tmp_path / "stoSg8muk.bdat")
+    csi2pg.write_TOB3(
+        out_ffn, header, columns, minor_every=2, empty_every=5, complement=True
+    )
+    csi2pg.decode_TOB3(out_ffn, str(tmp_path / "legacy.dat"))
+    csi2pg.write_TOA5(out_ffn, str(tmp_path / "batched.dat"))
+    with open(tmp_path / "legacy.dat") as fh:
+        legacy = fh.readlines()
+    with open(tmp_path / "batched.dat") as fh:
+        assert fh.readlines() == legacy
+    assert len(legacy) == 4 + 12000
+    # 8 records per Major frame, 2 minor frames plus an empty one, a partial
+    # last frame, and 5 invalid frames (the decoders stop at the 6th); a new
+    # table CRC, for get_schema()
+    header[1][2], header[1][8] = "976", "1"
+    columns = {name: column[:-3] for name, column in columns.items()}
+    csi2pg.write_TOB3(
+        out_ffn,
+        header,
+        columns,
+        minor_every=3,
+        empty_every=4,
+        invalid_every=400,
+    )
+    header, decoded = csi2pg.decode_TOB3_columns(out_ffn)
+    for name, column in columns.items():
+        np.testing.assert_array_equal(decoded[name], column)
+    schema = csi2pg.get_schema(header)
+    assert csi2pg.minor_layout(7, schema) == [(104, 0), (496, 4), (376, 3)]
+    kinds, counts = csi2pg.frame_plan(11997, schema, 3, 4, 400)
+    assert (kinds == csi2pg.FRAME_INVALID).sum() == 5
+
+
+def test_decode_fp2():
+    """Test the FP2 look-up table against the per-record decoder."""
+    raw = np.arange(65536, dtype=">u2")
+    data = raw.tobytes()
+    expected = [
+        csi2pg.decode_data_bin(data[ii : ii + 2], ["FP2"], [2])[0]
+        for ii in range(0, len(data), 2)
+    ]
+    np.testing.assert_array_equal(
+        csi2pg.decode_fp2(raw), np.array(expected, dtype=np.float32)
+    )
+
+
+def test_schema_cache(tmp_path):
+    """Test that schemas are compiled once, and survive a save & load."""
+    ffn = os.path.join(DATAROOT, "hamSg8muk.bdat")
+    with open(ffn, "rb") as rf:
+        header = csi2pg.read_header(rf, 6)
+    schema = csi2pg.get_schema(header)
+    assert csi2pg.get_schema(header) is schema
+    assert schema["trs"] == 120
+    assert schema["rec_dtype"].itemsize == 120
+    cache_fn = str(tmp_path / "schema_cache.json")
+    csi2pg.save_schema_cache(cache_fn)
+    csi2pg.SCHEMA_CACHE.clear()
+    assert csi2pg.load_schema_cache(cache_fn) >= 1
+    key = csi2pg.schema_key(header)
+    assert csi2pg.SCHEMA_CACHE[key]["names"] == schema["names"]
+
+
+def test_frame_index():
+    """Test indexing all frames of a TOB3 file at once."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    with csi2pg.map_file(ffn) as mm:
+        header = csi2pg.read_header(mm, 6)
+        schema = csi2pg.get_schema(header)
+        index = csi2pg.frame_index(mm, mm.tell(), schema, int(header[1][4]))
+        # the same as parsing each footer
+        frame = mm[index["offset"][0] : index["offset"][0] + schema["fs"]]
+    assert csi2pg.footer_parse(frame[-4:], int(header[1][4]))[0]
+    assert len(index) == 12000
+    assert (index["nrec"] == 1).all()
+    assert (np.diff(index["rec"]) == 1).all()
+    assert (np.diff(index["ts"]) == np.timedelta64(50, "ms")).all()
+
+
+def test_record_timestamps():
+    """Test TIMESTAMP & RECORD synthesis in integer nanoseconds."""
+    frame_ts = np.array(
+        ["2016-08-22T19:10:00", "2016-08-22T19:20:00"], "M8[s]"
+    )
+    ts, rec = csi2pg.record_timestamps(frame_ts, [10, 500], [3, 2], 50000000)
+    assert ts.dtype == np.dtype("datetime64[ns]")
+    assert ts[2] == np.datetime64("2016-08-22T19:10:00.100")
+    assert ts[3] == np.datetime64("2016-08-22T19:20:00")
+    assert list(rec) == [10, 11, 12, 500, 501]
+
+
+def test_parse_columns_sql(tmp_path):
+    """Test the direct COPY stream against the TOA5 round trip."""
+    ffn = os.path.join(DATAROOT, "hamSg8muk.bdat")
+    toa5_file = str(tmp_path / "ham_sonic_160822-1920")
+    csi2pg.decode_TOB3(ffn, toa5_file + ".dat")
+    sql_ffn, table, columns = csi2pg.parse_TOA5_sql(
+        toa5_file + ".dat", str(tmp_path)
+    )
+    header, decoded = csi2pg.decode_TOB3_columns(ffn)
+    sql_buf, table2, columns2 = csi2pg.parse_columns_sql(
+        decoded, header[2], toa5_file
+    )
+    assert table2 == table
+    assert list(columns2) == list(columns)
+    with open(sql_ffn) as fh:
+        expected = pd.read_csv(fh, sep="\t", header=None, na_values=r"\N")
+    result = pd.read_csv(sql_buf, sep="\t", header=None, na_values=r"\N")
+    pd.testing.assert_frame_equal(result, expected)
+    # sonic Diag columns are smallint; missing & out of range are NULL
+    df = pd.DataFrame(
+        {
+            "TIMESTAMP": decoded["TIMESTAMP"][:4],
+            "RECORD": decoded["RECORD"][:4],
+        }
+    )
+    for m in [5, 10, 20, 40, 80, 120]:
+        df["Diag_%sm" % (m,)] = np.array(
+            [np.nan, 40000.0, 3.0, -5.0], dtype=np.float32
+        )
+    df, _ = csi2pg.prepare_sql_df(df, "ham", "sonic")
+    assert str(df["Diag_5m"].dtype) == "Int16"
+    assert csi2pg.format_copy_text(df[["Diag_5m", "tower"]]) == (
+        "\\N\t0\n\\N\t0\n3\t0\n-5\t0\n"
+    )
+
+
+def test_decode_TOB1_columns(tmp_path):
+    """Test the whole-file TOB1 decoder against the TOA5 round trip."""
+    ffn = os.path.join(DATAROOT, "stoAg8muk.bdat")
+    toa5_file = str(tmp_path / "sto_analog_160822-1920")
+    csi2pg.decode_TOB1(ffn, toa5_file + ".dat")
+    sql_ffn, table, columns = csi2pg.parse_TOA5_sql(
+        toa5_file + ".dat", str(tmp_path)
+    )
+    header, decoded = csi2pg.decode_TOB1_columns(ffn)
+    assert decoded["TIMESTAMP"].dtype == np.dtype("datetime64[ns]")
+    batches = list(csi2pg.iter_batches(ffn))
+    np.testing.assert_array_equal(batches[0]["RECORD"], decoded["RECORD"])
+    sql_buf, table2, columns2 = csi2pg.parse_columns_sql(
+        decoded, header[1][3:], toa5_file
+    )
+    assert table2 == table
+    assert list(columns2) == list(columns)
+    with open(sql_ffn) as fh:
+        expected = pd.read_csv(fh, sep="\t", header=None, na_values=r"\N")
+    result = pd.read_csv(sql_buf, sep="\t", header=None, na_values=r"\N")
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_parse_columns_pgcopy():
+    """Test the binary COPY stream by reading it back."""
+    ffn = os.path.join(DATAROOT, "stoSg8muk.bdat")
+    header, decoded = csi2pg.decode_TOB3_columns(ffn)
+    copy_buf, table, db_columns = csi2pg.parse_columns_pgcopy(
+        decoded, header[2], "sto_sonic_160822-1920"
+    )
+    assert table == "data_sonic"
+    assert db_columns[-2:] == ["tower", "valid"]
+    data = copy_buf.getvalue()
+    assert data.startswith(csi2pg.PGCOPY_HEADER)
+    assert data.endswith(csi2pg.PGCOPY_TRAILER)
+    pos = len(csi2pg.PGCOPY_HEADER)
+    rows = {}
+    while pos < len(data) - 2:
+        (nfields,) = struct.unpack(">h", data[pos : pos + 2])
+        assert nfields == len(db_columns)
+        pos += 2
+        row = []
+        for name in db_columns:
+            (size,) = struct.unpack(">i", data[pos : pos + 4])
+            pos += 4
+            if size == -1:
+                row.append(None)
+                continue
+            fmt = {2: ">h", 4: ">f", 8: ">q"}[size]
+            row.append(struct.unpack(fmt, data[pos : pos + size])[0])
+            pos += size
+        rows[row[-1]] = row
+    assert len(rows) == len(decoded["RECORD"])
+    valid = decoded["TIMESTAMP"][-1] - np.datetime64("2000-01-01")
+    row = rows[int(valid // np.timedelta64(1, "us"))]
+    assert row[-2] == 1
+    for name, value in zip(header[2], row):
+        expected = decoded[name][-1]
+        if np.isfinite(expected):
+            assert value == expected
+        else:
+            assert value is None
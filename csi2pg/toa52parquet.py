@@ -0,0 +1,60 @@
+"""Convert the TOA5 .dat files of the YYYY/MM/DD tree into .parquet files
+
+A one time conversion of the archive written before bin2pg's --parquet
+option; files which already have a .parquet file are skipped.
+"""
+
+import csv
+import glob
+import os
+import sys
+
+import pandas as pd
+
+from csi2pg import CONFIG, write_parquet
+
+
+def toa5_columns(ffn):
+    """
+    Read a TOA5 file into columns, for write_parquet().
+
+    Parameters
+    ----------
+    ffn: string
+        full file name of the TOA5 .dat file
+
+    Returns
+    -------
+    columns: dictionary
+        field name --> numpy.ndarray; "TIMESTAMP" as datetime64[ns]
+    ho: list of lists of strings
+        the 4 TOA5 header lines
+    """
+    with open(ffn, "r") as fh:
+        ho = [next(csv.reader([fh.readline()])) for _ in range(4)]
+    # "NAN" is one of pandas' default NA values, and "INF" & "-INF" parse
+    # as +/-inf
+    df = pd.read_csv(ffn, skiprows=[0, 2, 3], header=0)
+    columns = {name: df[name].to_numpy() for name in df.columns}
+    if "TIMESTAMP" in columns:
+        columns["TIMESTAMP"] = pd.to_datetime(
+            df["TIMESTAMP"], format="ISO8601"
+        ).to_numpy(dtype="datetime64[ns]")
+    return columns, ho
+
+
+def main(argv):
+    """Convert all TOA5 files below dataroot, or the directory given."""
+    dataroot = argv[1] if len(argv) > 1 else CONFIG["dataroot"]
+    pattern = os.path.join(dataroot, "[0-9]" * 4, "[0-9]" * 2, "[0-9]" * 2)
+    for ffn in sorted(glob.glob(os.path.join(pattern, "*.dat"))):
+        parquet_file = os.path.splitext(ffn)[0] + ".parquet"
+        if os.path.isfile(parquet_file):
+            continue
+        columns, ho = toa5_columns(ffn)
+        write_parquet(parquet_file, columns, ho)
+        print("%s -> %s" % (ffn, os.path.basename(parquet_file)))
+
+
+if __name__ == "__main__":
+    main(sys.argv)